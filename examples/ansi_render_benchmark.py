@@ -0,0 +1,61 @@
+"""
+Benchmark comparing the vectorized "ansi" rendering of the GridworldEnv to the
+previous implementation, which joined the characters of the board in python.
+The environments are sorted by board size, so the largest gridworlds are
+reported last.
+"""
+
+import argparse
+import timeit
+
+from ai_safety_gridworlds.helpers import factory
+from safe_grid_gym.envs import GridworldEnv
+
+
+def render_with_loops(board):
+    return "\n".join(
+        [" ".join([chr(i) for i in board[j]]) for j in range(board.shape[0])]
+    )
+
+
+def benchmark(env_name, number):
+    env = GridworldEnv(env_name)
+    env.reset()
+    board = env._env._current_game._board.board
+    assert render_with_loops(board) == env.render(mode="ansi")
+
+    loop_time = timeit.timeit(lambda: render_with_loops(board), number=number)
+    # disable the memoization to measure the rendering itself
+    env._ansi_renderer._cache = None
+    vectorized_time = timeit.timeit(lambda: env.render(mode="ansi"), number=number)
+    return board.shape, loop_time / number, vectorized_time / number
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--number", type=int, default=10000)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = [
+        (env_name,) + benchmark(env_name, args.number)
+        for env_name in factory._environment_classes.keys()
+    ]
+    results.sort(key=lambda result: result[1][0] * result[1][1])
+    print(
+        "{: <25} {: >8} {: >12} {: >12} {: >8}".format(
+            "environment", "board", "loops [us]", "numpy [us]", "speedup"
+        )
+    )
+    for env_name, shape, loop_time, vectorized_time in results:
+        print(
+            "{: <25} {: >8} {: >12.2f} {: >12.2f} {: >7.1f}x".format(
+                env_name,
+                "{}x{}".format(*shape),
+                loop_time * 1e6,
+                vectorized_time * 1e6,
+                loop_time / vectorized_time,
+            )
+        )
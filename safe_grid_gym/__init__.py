@@ -1,10 +1,10 @@
 from gym.envs.registration import register
-from ai_safety_gridworlds.helpers.factory import _environment_classes
 
 from safe_grid_gym.envs import GridworldEnv
+from safe_grid_gym.envs.gridworlds_env import ENV_NAMES
 import safe_grid_gym.envs.toy_grids as _toy_grids
 
-env_list = _environment_classes.keys()
+env_list = list(ENV_NAMES)
 
 
 def to_gym_id(env_name):
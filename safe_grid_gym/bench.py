@@ -0,0 +1,254 @@
+"""
+Benchmarks the throughput of all environments registered by safe_grid_gym.
+
+For every registered gym id this measures the reset latency, the steps per
+second with random actions, the memory allocated per step (using tracemalloc),
+the time needed to render in the "ansi" and "rgb_array" modes and the memory a
+replay buffer of (observation, next observation) pairs needs for each
+observation dtype. The results are written as a JSON report, which can be
+compared to a stored baseline:
+
+    python -m safe_grid_gym.bench --output report.json
+    python -m safe_grid_gym.bench --baseline report.json --tolerance 0.2
+"""
+
+import argparse
+import fnmatch
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import gym
+import numpy as np
+
+import safe_grid_gym  # registers the environments
+from safe_grid_gym.envs.common import profiling
+
+RENDER_MODES = ("ansi", "rgb_array")
+BUFFER_DTYPES = ("float32", "uint8")
+
+# metrics and whether larger values are better
+METRICS = {
+    "steps_per_sec": True,
+    "reset_latency": False,
+    "step_peak_bytes": False,
+    "render_ansi": False,
+    "render_rgb_array": False,
+}
+
+
+def registered_ids():
+    """ Returns the ids of all gym environments registered by safe_grid_gym. """
+    ids = []
+    for spec in gym.envs.registry.all():
+        entry_point = getattr(spec, "entry_point", None) or getattr(
+            spec, "_entry_point", ""
+        )
+        if isinstance(entry_point, str) and entry_point.startswith("safe_grid_gym"):
+            ids.append(spec.id)
+    return sorted(ids)
+
+
+def _step(env, action):
+    obs, reward, done, info = env.step(action)
+    if done:
+        env.reset()
+
+
+def measure_reset(env, repetitions):
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        env.reset()
+    return (time.perf_counter() - start) / repetitions
+
+
+def measure_steps(env, actions):
+    env.reset()
+    start = time.perf_counter()
+    for action in actions:
+        _step(env, action)
+    return len(actions) / (time.perf_counter() - start)
+
+
+def measure_allocations(env, actions):
+    """ Returns the mean peak and retained memory allocated per step. """
+    env.reset()
+    peak = retained = 0
+    tracemalloc.start()
+    try:
+        for action in actions:
+            # clearing the traces also resets the peak
+            tracemalloc.clear_traces()
+            _step(env, action)
+            current, step_peak = tracemalloc.get_traced_memory()
+            peak += step_peak
+            retained += current
+    finally:
+        tracemalloc.stop()
+    return peak / len(actions), retained / len(actions)
+
+
+def measure_render(env, mode, repetitions):
+    env.reset()
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        env.render(mode=mode)
+    return (time.perf_counter() - start) / repetitions
+
+
+def measure_buffer_bytes(env_id, transitions, obs_dtype):
+    """ Returns the number of bytes needed to store the observation and next
+    observation of `transitions` transitions with the given obs_dtype. """
+    env = gym.make(env_id, obs_dtype=np.dtype(obs_dtype))
+    obs = env.reset()
+    env.close()
+    return 2 * transitions * obs.nbytes
+
+
+def benchmark_env(
+    env_id, steps=1000, resets=20, renders=20, seed=0, buffer_transitions=10 ** 6
+):
+    """ Runs all measurements for a single environment and returns them as a
+    dict. """
+    random.seed(seed)
+    np.random.seed(seed)
+    env = gym.make(env_id)
+    env.seed(seed)
+    actions = [env.action_space.sample() for _ in range(steps)]
+    result = {}
+    result["reset_latency"] = measure_reset(env, resets)
+    result["steps_per_sec"] = measure_steps(env, actions)
+    peak, retained = measure_allocations(env, actions[: min(steps, 200)])
+    result["step_peak_bytes"] = peak
+    result["step_retained_bytes"] = retained
+    supported_modes = env.metadata.get("render.modes") or RENDER_MODES
+    for mode in RENDER_MODES:
+        if mode in supported_modes:
+            result["render_" + mode] = measure_render(env, mode, renders)
+    env.close()
+    for dtype in BUFFER_DTYPES:
+        result["buffer_bytes_" + dtype] = measure_buffer_bytes(
+            env_id, buffer_transitions, dtype
+        )
+    return result
+
+
+def run_benchmarks(env_ids=None, patterns=None, **kwargs):
+    """ Benchmarks the given environment ids, or all registered ids matching
+    one of the given fnmatch patterns, and returns the report as a dict. """
+    if env_ids is None:
+        env_ids = registered_ids()
+    if patterns:
+        env_ids = [
+            env_id
+            for env_id in env_ids
+            if any(fnmatch.fnmatch(env_id, pattern) for pattern in patterns)
+        ]
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "gym": gym.__version__,
+            "settings": kwargs,
+        },
+        "envs": {},
+    }
+    for env_id in env_ids:
+        try:
+            report["envs"][env_id] = benchmark_env(env_id, **kwargs)
+        except Exception as e:
+            report["envs"][env_id] = {"error": repr(e)}
+    return report
+
+
+def compare_reports(report, baseline, tolerance=0.2):
+    """ Returns a list of (env_id, metric, value, baseline_value) tuples for all
+    metrics that are more than `tolerance` (relative) worse than the baseline. """
+    regressions = []
+    for env_id, results in sorted(report["envs"].items()):
+        baseline_results = baseline["envs"].get(env_id, {})
+        for metric, larger_is_better in sorted(METRICS.items()):
+            if metric not in results or metric not in baseline_results:
+                continue
+            value, baseline_value = results[metric], baseline_results[metric]
+            if larger_is_better:
+                worse = value < baseline_value * (1 - tolerance)
+            else:
+                worse = value > baseline_value * (1 + tolerance)
+            if worse:
+                regressions.append((env_id, metric, value, baseline_value))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "envs", nargs="*", help="fnmatch patterns of gym ids to benchmark"
+    )
+    parser.add_argument("-n", "--steps", type=int, default=1000)
+    parser.add_argument("--resets", type=int, default=20)
+    parser.add_argument("--renders", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--buffer-transitions",
+        type=int,
+        default=10 ** 6,
+        help="number of transitions of the replay buffer whose memory is reported",
+    )
+    parser.add_argument("-o", "--output", help="write the JSON report to this file")
+    parser.add_argument("-b", "--baseline", help="JSON report to compare against")
+    parser.add_argument("-t", "--tolerance", type=float, default=0.2)
+    parser.add_argument(
+        "--profile",
+        help="write the histograms of the phases of step, reset and render to "
+        "this JSON file (slows down the measured environments)",
+    )
+    parser.add_argument(
+        "--trace", help="write a Chrome trace of step, reset and render to this file"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.profile or args.trace:
+        profiling.enable(trace=bool(args.trace))
+    report = run_benchmarks(
+        patterns=args.envs,
+        steps=args.steps,
+        resets=args.resets,
+        renders=args.renders,
+        seed=args.seed,
+        buffer_transitions=args.buffer_transitions,
+    )
+    profiler = profiling.disable()
+    if args.profile:
+        profiler.write_json(args.profile)
+    if args.trace:
+        profiler.write_chrome_trace(args.trace)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write("\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_reports(report, baseline, args.tolerance)
+        for env_id, metric, value, baseline_value in regressions:
+            sys.stderr.write(
+                "{}: {} regressed from {:.6g} to {:.6g}\n".format(
+                    env_id, metric, baseline_value, value
+                )
+            )
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,8 @@
 from gym.envs.registration import register
-from ai_safety_gridworlds.helpers import factory
-from .gridworlds_env import GridworldEnv
+from .gridworlds_env import GridworldEnv, ENV_NAMES
 
 entry_point = "safe_grid_gym.envs:GridworldEnv"
-env_names = list(factory._environment_classes.keys())
+env_names = list(ENV_NAMES)
 
 
 def get_id(env_name):
@@ -1,13 +1,26 @@
 import numpy as np
 import gym
 
-from gym import spaces
+from gym import error, spaces
 
+from safe_grid_gym.envs.common import profiling
+from safe_grid_gym.envs.common.history import FrameHistory
 from safe_grid_gym.envs.common.interface import (
     INFO_HIDDEN_REWARD,
     INFO_OBSERVED_REWARD,
     INFO_DISCOUNT,
 )
+from safe_grid_gym.envs.common.rendering import (
+    FONT_FOR_HUMAN_RENDER,
+    AnsiRenderer,
+    LRUCache,
+    blit_tiles,
+    draw_board,
+    fits_cell,
+    glyph_atlas,
+    lookup_table_for,
+    render_text_line,
+)
 
 AGENT = 0
 
@@ -19,13 +32,52 @@ RIGHT = 3
 MOVE = {UP: [0, 1], DOWN: [0, -1], LEFT: [-1, 0], RIGHT: [1, 0]}
 MOVE_NAME = {UP: "North", DOWN: "South", LEFT: "West", RIGHT: "East"}
 
-FONT_FOR_HUMAN_RENDER = "DejaVuSansMono.ttf"
+RENDER_CACHE_SIZE = 256
 
 
 def position_change(action):
     return MOVE[action]
 
 
+def observation_dtype(dtype, max_value):
+    """ Returns dtype as a numpy dtype after checking that it can represent
+    all board values up to max_value. """
+    dtype = np.dtype(dtype)
+    if dtype.kind in "ui":
+        representable = max_value <= np.iinfo(dtype).max
+    else:
+        representable = dtype.kind == "f"
+    if not representable:
+        raise error.Error(
+            "obs_dtype {} cannot represent board values up to {}".format(
+                dtype, max_value
+            )
+        )
+    return dtype
+
+
+class BoardSpace(spaces.MultiDiscrete):
+    """ A MultiDiscrete space of boards of type dtype, which samples integer
+    boards and only contains boards of integer values.
+
+    Parameters:
+    nvec (np.ndarray): number of values of each cell
+    dtype: type of the boards
+    """
+
+    def __init__(self, nvec, dtype):
+        super(BoardSpace, self).__init__(nvec)
+        self.dtype = np.dtype(dtype)
+
+    def sample(self):
+        board = np.floor(self.np_random.random_sample(self.nvec.shape) * self.nvec)
+        return board.astype(self.dtype)
+
+    def contains(self, x):
+        x = np.asarray(x)
+        return super(BoardSpace, self).contains(x) and bool(np.all(np.floor(x) == x))
+
+
 class BaseGridworld(gym.Env):
     def __init__(
         self,
@@ -38,13 +90,24 @@ class BaseGridworld(gym.Env):
         corrupt_reward,
         episode_length,
         print_field=lambda x: str(x),
+        obs_dtype=np.float32,
+        history_length=1,
     ):
         self.action_space = spaces.Discrete(4)
         assert field_types >= 1
-        # All field types plus the agent's position
+        assert history_length >= 1
+        self.obs_dtype = observation_dtype(obs_dtype, field_types)
+        # All field types plus the agent's position, for each observation of
+        # the history
         obs_space = np.zeros(grid_shape) + field_types + 1
         obs_space = np.reshape(obs_space, [1] + list(obs_space.shape))
-        self.observation_space = spaces.MultiDiscrete(obs_space)
+        obs_space = np.repeat(obs_space, history_length, axis=0)
+        self.observation_space = BoardSpace(obs_space, self.obs_dtype)
+        self.history_length = history_length
+        if history_length > 1:
+            self._history = FrameHistory(history_length, grid_shape, self.obs_dtype)
+        else:
+            self._history = None
 
         self.grid_shape = grid_shape
         self.field_types = field_types
@@ -72,6 +135,17 @@ class BaseGridworld(gym.Env):
         self._hidden_return = 0.0
         self._last_performance = None
         self._reset_next = False
+        self._glyph_atlas = None
+        self._ansi_renderer = None
+        self._info_line_cache = LRUCache(RENDER_CACHE_SIZE)
+        self._frame_cache = LRUCache(RENDER_CACHE_SIZE)
+
+    @classmethod
+    def from_spec(cls, spec, **kwargs):
+        """ Creates the environment described by a GridworldSpec. """
+        env_kwargs = spec.env_kwargs()
+        env_kwargs.update(kwargs)
+        return cls(**env_kwargs)
 
     def _within_world(self, position):
         return (
@@ -81,9 +155,11 @@ class BaseGridworld(gym.Env):
             and position[1] < self.grid_shape[1]
         )
 
-    def to_observation(self, state, position, dtype=np.float32):
+    def to_observation(self, state, position, dtype=None):
+        """ Returns the board with the agent's position marked, by default as
+        an array of type obs_dtype. """
         assert self._within_world(position)
-        observation = np.array(state, dtype=np.float32)
+        observation = np.array(state, dtype=dtype or self.obs_dtype)
         observation[position] = AGENT
         return observation
 
@@ -95,7 +171,19 @@ class BaseGridworld(gym.Env):
         self._episode_return = 0.0
         self._hidden_return = 0.0
         self._reset_next = False
-        return self.to_observation(self.state, self.position)[np.newaxis, :]
+        return self._observe(reset=True)
+
+    def _observe(self, reset=False):
+        """ Returns the current observation, or the history of the last
+        history_length observations. """
+        observation = self.to_observation(self.state, self.position)
+        if self._history is None:
+            return observation[np.newaxis, :]
+        if reset:
+            self._history.reset(observation)
+        else:
+            self._history.push(observation)
+        return self._history.view().copy()
 
     def _transition(self, state, position, action):
         pos = np.array(position)
@@ -104,14 +192,17 @@ class BaseGridworld(gym.Env):
         return np.array(state), tuple(pos)
 
     def step(self, action):
+        lap = profiling.start(self, "step")
         self.timestep += 1
         self.last_action = action
         self.state, self.position = self.transition(self.state, self.position, action)
+        lap("transition")
 
         reward = self._corrupt_reward(self.state, self.position)
         hidden = self._hidden_reward(self.state, self.position)
         self._episode_return += reward
         self._hidden_return += hidden
+        lap("rewards")
 
         info = {
             INFO_HIDDEN_REWARD: hidden,
@@ -128,10 +219,21 @@ class BaseGridworld(gym.Env):
                 raise RuntimeError("Failed to reset after end of episode.")
             self._last_performance = self._hidden_return
             self._reset_next = True
-        obs = self.to_observation(self.state, self.position)[np.newaxis, :]
+        lap("info")
+        obs = self._observe()
+        lap("observation")
+        lap()
 
         return obs, reward, done, info
 
+    def to_tabular(self, sparse=False):
+        """ Enumerates the (state, position) pairs reachable from the initial
+        state and returns a TabularMDP with the transition and reward arrays.
+        If sparse is set, the transitions are returned as scipy sparse matrices. """
+        from safe_grid_gym.envs.common.tabular import enumerate_mdp
+
+        return enumerate_mdp(self, sparse=sparse)
+
     @property
     def episode_return(self):
         return self._episode_return
@@ -139,13 +241,79 @@ class BaseGridworld(gym.Env):
     def get_last_performance(self):
         return self._last_performance
 
-    def render(self, mode="human", close=False):
-        """ Implements the gym render modes "rgb_array", "ansi" and "human". """
-        observation = self.to_observation(self.state, self.position)
+    def _print_fields(self):
+        """ Returns the printed field of each board value, which is passed to
+        print_field as a value of obs_dtype like the observation's values. """
+        return [
+            self.print_field(self.obs_dtype.type(f))
+            for f in range(self.field_types + 1)
+        ]
+
+    def _render_frame(self, observation, additional_info):
+        """ Returns the rendered image as a uint8 array of shape (3, height, width).
+
+        The frames are cached by observation and additional info. They are
+        composed from pre-rasterized glyph tiles, one for each field type, or
+        drawn character by character if a printed field is wider than a
+        cell. """
+        key = (observation.tobytes(), additional_info)
+        frame = self._frame_cache.get(key)
+        if frame is not None:
+            return frame
+
+        if self._glyph_atlas is None:
+            chars = self._print_fields()
+            if all(fits_cell(char) for char in chars):
+                self._glyph_atlas = glyph_atlas(chars)
+            else:
+                self._glyph_atlas = False  # glyphs reach into other cells
+        # first axis of the observation is displayed from left to right, second
+        # axis from bottom to top
+        indices = observation.astype(np.intp).T[::-1]
+        if self._glyph_atlas is not False:
+            board = blit_tiles(self._glyph_atlas, indices)
+        else:
+            chars = self._print_fields()
+            board = draw_board([[chars[i] for i in row] for row in indices])
+
+        info_line = self._info_line_cache.get(additional_info)
+        if info_line is None:
+            info_line = render_text_line(additional_info, board.shape[1])
+            self._info_line_cache.put(additional_info, info_line)
+
+        image = np.concatenate([board, info_line], axis=0)
+        frame = np.ascontiguousarray(np.moveaxis(image, -1, 0))  # color channel first
+        frame.setflags(write=False)
+        self._frame_cache.put(key, frame)
+        return frame
+
+    def _render_ansi(self, observation):
+        if self._ansi_renderer is None:
+            lookup_table = lookup_table_for(self._print_fields())
+            if lookup_table is not None:
+                self._ansi_renderer = AnsiRenderer(
+                    lookup_table, cache_size=RENDER_CACHE_SIZE
+                )
+            else:
+                self._ansi_renderer = False  # print_field is not single bytes
+        if self._ansi_renderer:
+            return self._ansi_renderer.render(observation.T[::-1])
+
         observation_chars = [
             [self.print_field(observation[c, r]) for c in range(self.grid_shape[0])]
             for r in reversed(range(self.grid_shape[1]))
         ]
+        return "\n".join("".join(line) for line in observation_chars)
+
+    def render(self, mode="human", close=False):
+        """ Implements the gym render modes "rgb_array", "ansi" and "human". """
+        if mode not in ("human", "ansi", "rgb_array"):
+            # unknown mode
+            raise NotImplementedError(
+                "Mode '{}' unsupported. ".format(mode)
+                + "Mode should be in ('human', 'ansi', 'rgb_array')"
+            )
+        observation = self.to_observation(self.state, self.position)
         last_action_string = (
             MOVE_NAME[self.last_action] if self.last_action is not None else ""
         )
@@ -153,55 +321,15 @@ class BaseGridworld(gym.Env):
             move=last_action_string, time=str(self.timestep)
         )
         if mode == "ansi":
-            board_str = "\n".join("".join(line) for line in observation_chars)
-            return board_str + "\n" + additional_info + "\n"
-        else:
-            from PIL import Image, ImageDraw, ImageFont
-            from pkg_resources import resource_stream
+            return self._render_ansi(observation) + "\n" + additional_info + "\n"
 
-            image = Image.new(
-                "RGB",
-                (self.grid_shape[0] * 50, self.grid_shape[1] * 50 + 50),
-                (255, 255, 255),
-            )
-            font_stream = resource_stream(
-                "safe_grid_gym.envs.common", FONT_FOR_HUMAN_RENDER
-            )
-            font = ImageFont.truetype(font=font_stream, size=48)
-            font_stream = resource_stream(
-                "safe_grid_gym.envs.common", FONT_FOR_HUMAN_RENDER
-            )
-            smaller_font = ImageFont.truetype(font=font_stream, size=24)
-            drawing = ImageDraw.Draw(image)
-            for r in range(self.grid_shape[1]):
-                for c in range(self.grid_shape[0]):
-                    drawing.text(
-                        (r * 50, c * 50),
-                        observation_chars[c][r],
-                        font=font,
-                        fill=(0, 0, 0),
-                    )
-            drawing.text(
-                (0, self.grid_shape[1] * 50 + 5),
-                additional_info,
-                font=smaller_font,
-                fill=(0, 0, 0),
-            )
+        frame = self._render_frame(observation, additional_info)
+        if mode == "human":
+            import matplotlib.pyplot as plt
 
-            if mode == "human":
-                import matplotlib.pyplot as plt
-
-                plt.axis("off")
-                plt.imshow(image)
-                plt.pause(0.1)
-                plt.clf()
-            elif mode == "rgb_array":
-                image = np.array(image)
-                image = np.moveaxis(image, -1, 0)  # color channel first
-                return np.array(image)
-            else:
-                # unknown mode
-                raise NotImplementedError(
-                    "Mode '{}' unsupported. ".format(mode)
-                    + "Mode should be in ('human', 'ansi', 'rgb_array')"
-                )
+            plt.axis("off")
+            plt.imshow(np.moveaxis(frame, 0, -1))
+            plt.pause(0.1)
+            plt.clf()
+        else:
+            return np.array(frame)
@@ -0,0 +1,241 @@
+"""
+The BatchedBaseGridworld steps N copies of a BaseGridworld configuration at once.
+
+The states, positions and timesteps of all copies are stored as stacked numpy
+arrays, so that the default transition and batched reward functions can be
+evaluated for the whole batch with a few array operations.
+"""
+
+import numpy as np
+
+from gym import spaces
+
+from safe_grid_gym.envs.common.base_gridworld import (
+    AGENT,
+    MOVE,
+    BoardSpace,
+    observation_dtype,
+)
+from safe_grid_gym.envs.common.history import FrameHistory
+from safe_grid_gym.envs.common.interface import (
+    INFO_HIDDEN_REWARD,
+    INFO_OBSERVED_REWARD,
+    INFO_DISCOUNT,
+    INFO_TERMINAL_OBSERVATION,
+)
+from safe_grid_gym.envs.common.metrics import SafetyMetrics
+
+# MOVE as an array indexed by action
+MOVE_ARRAY = np.array([MOVE[action] for action in range(len(MOVE))], dtype=np.int64)
+
+
+def vectorize_reward(reward):
+    """ Turn a reward function of the form reward(state, position) into a
+    (slow) batched reward function of the form reward(states, positions). """
+
+    def batched_reward(states, positions):
+        return np.array(
+            [
+                reward(state, tuple(position))
+                for state, position in zip(states, positions.tolist())
+            ]
+        )
+
+    return batched_reward
+
+
+def vectorize_transition(transition):
+    """ Turn a transition function of the form transition(state, position, action)
+    into a (slow) batched transition function. """
+
+    def batched_transition(states, positions, actions):
+        next_states = np.empty_like(states)
+        next_positions = np.empty_like(positions)
+        for i, (position, action) in enumerate(zip(positions.tolist(), actions)):
+            next_states[i], next_positions[i] = transition(
+                states[i], tuple(position), action
+            )
+        return next_states, next_positions
+
+    return batched_transition
+
+
+class BatchedBaseGridworld(object):
+    """ Steps `num_envs` copies of a BaseGridworld with a single call.
+
+    Parameters:
+    num_envs (int): number of environments in the batch
+    grid_shape, field_types, initial_state, initial_position, transition,
+    hidden_reward, corrupt_reward, episode_length, print_field, obs_dtype,
+    history_length:
+        the same configuration as for BaseGridworld. The callables are only used
+        as a slow per-environment fallback if no batched version is given.
+    batched_transition (callable): transition(states, positions, actions)
+        returning the next states of shape (N, *grid_shape) and positions of
+        shape (N, 2)
+    batched_hidden_reward (callable): hidden_reward(states, positions) returning
+        an array of shape (N,)
+    batched_corrupt_reward (callable): corrupt_reward(states, positions)
+        returning an array of shape (N,)
+
+    `step` returns the observations, rewards and dones as arrays with leading
+    dimension N, and an info dict of arrays. Environments that finish an episode
+    are reset automatically, the last observation of the finished episode is
+    stored in the info dict with key INFO_TERMINAL_OBSERVATION. The returns of
+    the finished episodes are collected in `metrics` and returned by
+    `get_episode_stats`.
+    """
+
+    def __init__(
+        self,
+        num_envs,
+        grid_shape,
+        field_types,
+        initial_state,
+        initial_position,
+        transition,
+        hidden_reward,
+        corrupt_reward,
+        episode_length,
+        print_field=lambda x: str(x),
+        batched_transition=None,
+        batched_hidden_reward=None,
+        batched_corrupt_reward=None,
+        obs_dtype=np.float32,
+        history_length=1,
+    ):
+        assert num_envs >= 1
+        assert field_types >= 1
+        assert history_length >= 1
+        self.num_envs = num_envs
+        self.obs_dtype = observation_dtype(obs_dtype, field_types)
+        self.action_space = spaces.Discrete(4)
+        obs_space = np.zeros(grid_shape) + field_types + 1
+        obs_space = np.reshape(obs_space, [1] + list(obs_space.shape))
+        obs_space = np.repeat(obs_space, history_length, axis=0)
+        self.observation_space = BoardSpace(obs_space, self.obs_dtype)
+        self.history_length = history_length
+        if history_length > 1:
+            self._history = FrameHistory(
+                history_length, grid_shape, self.obs_dtype, num_envs=num_envs
+            )
+        else:
+            self._history = None
+
+        self.grid_shape = tuple(grid_shape)
+        self.field_types = field_types
+        self.initial_state = np.array(initial_state)
+        self.initial_position = np.array(initial_position, dtype=np.int64)
+        self.episode_length = episode_length
+        self.print_field = print_field
+
+        if batched_transition is not None:
+            self.transition = batched_transition
+        elif transition is None:
+            self.transition = self._transition
+        else:
+            self.transition = vectorize_transition(transition)
+        if batched_hidden_reward is None:
+            batched_hidden_reward = vectorize_reward(hidden_reward)
+        if batched_corrupt_reward is None:
+            batched_corrupt_reward = vectorize_reward(corrupt_reward)
+        self._hidden_reward = batched_hidden_reward
+        self._corrupt_reward = batched_corrupt_reward
+
+        self._env_index = np.arange(num_envs)
+        self._upper = np.array(self.grid_shape, dtype=np.int64)
+        self.states = np.empty((num_envs,) + self.initial_state.shape)
+        self.positions = np.empty((num_envs, 2), dtype=np.int64)
+        self.timesteps = np.zeros(num_envs, dtype=np.int64)
+        self.last_actions = np.full(num_envs, -1, dtype=np.int64)
+        self.metrics = SafetyMetrics(num_envs)
+        self._reset_envs(self._env_index)
+
+    @classmethod
+    def from_spec(cls, num_envs, spec, **kwargs):
+        """ Creates a batch of the environment described by a GridworldSpec,
+        which is stepped with the spec's batched kernels. """
+        env_kwargs = spec.batched_env_kwargs()
+        env_kwargs.update(kwargs)
+        return cls(num_envs, **env_kwargs)
+
+    def _reset_envs(self, index):
+        self.states[index] = self.initial_state
+        self.positions[index] = self.initial_position
+        self.timesteps[index] = 0
+        self.last_actions[index] = -1
+
+    def to_observation(self, states, positions, dtype=None):
+        observations = np.array(states, dtype=dtype or self.obs_dtype)
+        index = np.arange(len(observations))
+        observations[index, positions[:, 0], positions[:, 1]] = AGENT
+        return observations[:, np.newaxis]
+
+    def reset(self):
+        self._reset_envs(self._env_index)
+        self.metrics.reset()
+        obs = self.to_observation(self.states, self.positions)
+        if self._history is None:
+            return obs
+        self._history.reset(obs[:, 0])
+        return self._history.view().copy()
+
+    def _transition(self, states, positions, actions):
+        # only move within world, don't change anything
+        moved = positions + MOVE_ARRAY[actions]
+        within = np.all((moved >= 0) & (moved < self._upper), axis=1)
+        return states, np.where(within[:, np.newaxis], moved, positions)
+
+    def step(self, actions):
+        actions = np.asarray(actions, dtype=np.int64)
+        assert actions.shape == (self.num_envs,)
+        self.timesteps += 1
+        self.last_actions[:] = actions
+        self.states, self.positions = self.transition(
+            self.states, self.positions, actions
+        )
+
+        rewards = self._corrupt_reward(self.states, self.positions)
+        hidden = self._hidden_reward(self.states, self.positions)
+
+        info = {
+            INFO_HIDDEN_REWARD: hidden,
+            INFO_OBSERVED_REWARD: rewards,
+            INFO_DISCOUNT: np.ones(self.num_envs),
+        }
+
+        obs = self.to_observation(self.states, self.positions)
+        dones = self.timesteps >= self.episode_length
+        self.metrics.update(rewards, hidden, dones)
+        if self._history is not None:
+            self._history.push(obs[:, 0])
+            obs = self._history.view()
+        if dones.any():
+            done_index = np.flatnonzero(dones)
+            info[INFO_TERMINAL_OBSERVATION] = obs.copy()
+            self._reset_envs(done_index)
+            reset_obs = self.to_observation(
+                self.states[done_index], self.positions[done_index]
+            )
+            if self._history is None:
+                obs[done_index] = reset_obs
+            else:
+                self._history.reset(reset_obs[:, 0], done_index)
+        if self._history is not None:
+            obs = obs.copy()
+
+        return obs, rewards, dones, info
+
+    @property
+    def episode_returns(self):
+        return self.metrics.observed_returns
+
+    def get_last_performances(self):
+        """ Hidden return of the last finished episode of each environment
+        (NaN for environments that did not finish an episode yet). """
+        return self.metrics.last_performances
+
+    def get_episode_stats(self):
+        """ Returns the returns and lengths of all episodes that finished since
+        the last call, see SafetyMetrics.get_episode_stats. """
+        return self.metrics.get_episode_stats()
@@ -0,0 +1,59 @@
+"""
+Ring buffer of the last k observations of an environment.
+
+Every frame is written twice, at index w and w + k of a buffer of 2k frames.
+The last k frames are then always the contiguous slice [w + 1, w + 1 + k) of
+the buffer, so the history can be returned without stacking the frames again
+in every step.
+"""
+
+import numpy as np
+
+
+class FrameHistory(object):
+    """ Keeps the last `history_length` frames of one or `num_envs`
+    environments that are stepped together.
+
+    Parameters:
+    history_length (int): number of frames k in the history
+    frame_shape (tuple): shape of a single frame
+    dtype: type of the frames
+    num_envs (int): If set, the frames of a batch of environments are stored
+                    and all frames passed and returned have a leading
+                    dimension num_envs
+
+    Before the first frames of an episode, the history contains zeros.
+    """
+
+    def __init__(self, history_length, frame_shape, dtype, num_envs=None):
+        assert history_length >= 1
+        self.history_length = history_length
+        self.num_envs = num_envs
+        self._buffer = np.zeros(
+            (num_envs or 1, 2 * history_length) + tuple(frame_shape), dtype=dtype
+        )
+        self._next = 0  # the index the next frame is written to
+
+    def push(self, frames):
+        """ Adds the newest frames, dropping the oldest ones. """
+        w = self._next
+        self._buffer[:, w] = frames
+        self._buffer[:, w + self.history_length] = frames
+        self._next = (w + 1) % self.history_length
+
+    def reset(self, frames, index=slice(None)):
+        """ Starts new histories for the environments with the given index,
+        which only contain the given frames. """
+        newest = (self._next - 1) % self.history_length
+        self._buffer[index] = 0
+        self._buffer[index, newest] = frames
+        self._buffer[index, newest + self.history_length] = frames
+
+    def view(self):
+        """ Returns the history, oldest frame first, as a view of shape
+        (history_length, *frame_shape) or (num_envs, history_length,
+        *frame_shape), which is overwritten by later calls to push. """
+        histories = self._buffer[:, self._next : self._next + self.history_length]
+        if self.num_envs is None:
+            return histories[0]
+        return histories
@@ -1,3 +1,4 @@
 INFO_HIDDEN_REWARD = "hidden_reward"
 INFO_OBSERVED_REWARD = "observed_reward"
 INFO_DISCOUNT = "discount"
+INFO_TERMINAL_OBSERVATION = "terminal_observation"
@@ -0,0 +1,100 @@
+"""
+Batched bookkeeping of the observed and hidden returns of vectorized
+environments.
+
+SafetyMetrics keeps the returns of all environments of a batch in numpy arrays
+and is updated once per batch step with the arrays that the vectorized
+environments return, instead of once per environment. Episodes that finish are
+collected until they are fetched with `get_episode_stats`.
+"""
+
+import numpy as np
+
+EPISODE_STATS = (
+    "env_index",
+    "length",
+    "observed_return",
+    "hidden_return",
+    "discounted_return",
+)
+
+
+class SafetyMetrics(object):
+    """ Accumulates returns and safety performance of `num_envs` environments.
+
+    Attributes:
+    observed_returns (np.ndarray): observed return of the current episodes
+    hidden_returns (np.ndarray): hidden return of the current episodes, NaN for
+                                 environments that do not report hidden rewards
+    discounted_returns (np.ndarray): observed return of the current episodes
+                                     discounted with the reported discounts
+    discount_products (np.ndarray): product of the discounts of the current
+                                    episodes so far
+    lengths (np.ndarray): number of steps of the current episodes
+    last_performances (np.ndarray): hidden return of the last finished episode
+                                    of each environment, NaN before the first
+    """
+
+    def __init__(self, num_envs):
+        self.num_envs = num_envs
+        self.observed_returns = np.zeros(num_envs)
+        self.hidden_returns = np.zeros(num_envs)
+        self.discounted_returns = np.zeros(num_envs)
+        self.discount_products = np.ones(num_envs)
+        self.lengths = np.zeros(num_envs, dtype=np.int64)
+        self.last_performances = np.full(num_envs, np.nan)
+        self._finished = []
+
+    def reset(self, index=slice(None)):
+        """ Starts new episodes for the environments with the given index,
+        e.g. an array of indices or a boolean mask, without recording the
+        current ones. """
+        self.observed_returns[index] = 0.0
+        self.hidden_returns[index] = 0.0
+        self.discounted_returns[index] = 0.0
+        self.discount_products[index] = 1.0
+        self.lengths[index] = 0
+
+    def update(self, rewards, hidden_rewards, dones, discounts=None):
+        """ Adds the rewards of one step of all environments and records the
+        episodes that ended. Hidden rewards and discounts that are not known
+        can be passed as NaN; a missing discount counts as 1. """
+        self.observed_returns += rewards
+        self.hidden_returns += hidden_rewards
+        self.discounted_returns += self.discount_products * rewards
+        if discounts is not None:
+            self.discount_products *= np.where(np.isnan(discounts), 1.0, discounts)
+        self.lengths += 1
+
+        done_index = np.flatnonzero(dones)
+        if len(done_index) > 0:
+            self.last_performances[done_index] = self.hidden_returns[done_index]
+            self._finished.append(
+                (
+                    done_index,
+                    self.lengths[done_index],
+                    self.observed_returns[done_index],
+                    self.hidden_returns[done_index],
+                    self.discounted_returns[done_index],
+                )
+            )
+            self.reset(done_index)
+
+    def get_episode_stats(self, clear=True):
+        """ Returns a dict of arrays with the environment index, length,
+        observed return, hidden return (the safety performance) and discounted
+        return of every episode that finished since the last call, in the order
+        they finished. """
+        if self._finished:
+            columns = [np.concatenate(column) for column in zip(*self._finished)]
+        else:
+            columns = [
+                np.zeros(0, dtype=np.int64),
+                np.zeros(0, dtype=np.int64),
+                np.zeros(0),
+                np.zeros(0),
+                np.zeros(0),
+            ]
+        if clear:
+            self._finished = []
+        return dict(zip(EPISODE_STATS, columns))
@@ -0,0 +1,231 @@
+"""
+Opt-in timing of the phases of step, reset and render.
+
+GridworldEnv and BaseGridworld call `start(env, method)` at the beginning of
+their hot paths. The returned lap function is called with the name of each
+phase when it ends and without arguments when the method is done, e.g.
+
+    lap = profiling.start(self, "step")
+    timestep = self._env.step(action)
+    lap("pycolab_step")
+    ...
+    lap()
+
+While profiling is disabled `start` returns a plain function that does
+nothing, so the instrumentation costs a few function calls per step. After
+`enable` the durations are collected in a Profiler, which keeps a histogram
+per environment id and phase and optionally the individual events, which can
+be exported as JSON or as a Chrome trace (chrome://tracing or
+https://ui.perfetto.dev):
+
+    with profiling.profile(trace=True) as profiler:
+        run_experiment()
+    profiler.write_json("profile.json")
+    profiler.write_chrome_trace("trace.json")
+"""
+
+import collections
+import contextlib
+import json
+import os
+import threading
+import time
+
+# durations are sorted into buckets of powers of two nanoseconds
+N_BUCKETS = 64
+
+_profiler = None
+
+
+class Histogram(object):
+    """ Counts durations in buckets of powers of two nanoseconds and keeps
+    their count, sum, minimum and maximum. """
+
+    def __init__(self):
+        self.buckets = [0] * N_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def add(self, duration):
+        self.buckets[min(int(duration * 1e9).bit_length(), N_BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += duration
+        if duration < self.min:
+            self.min = duration
+        if duration > self.max:
+            self.max = duration
+
+    def percentile(self, q):
+        """ Returns the upper bound of the bucket containing the q-th
+        percentile in seconds, at most the maximum duration. """
+        if self.count == 0:
+            return 0.0
+        rank = q / 100.0 * self.count
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if count > 0 and seen >= rank:
+                return min(2 ** bucket * 1e-9, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "min": self.min if self.count else 0.0,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "buckets_ns": {
+                str(2 ** b): count for b, count in enumerate(self.buckets) if count
+            },
+        }
+
+
+class Profiler(object):
+    """ Collects the durations recorded by the laps while it is enabled.
+
+    Parameters:
+    trace (bool): If set to true every event is kept for the Chrome trace,
+                  otherwise only the histograms are updated
+    max_events (int): number of most recent events that are kept for the trace
+
+    Attributes:
+    histograms (dict): maps (env id, phase) to a Histogram, where the phase
+                       is the method, e.g. "step", or a phase of the method,
+                       e.g. "step.pycolab_step"
+    """
+
+    def __init__(self, trace=False, max_events=10 ** 6):
+        self.trace = trace
+        self.histograms = collections.defaultdict(Histogram)
+        self.events = collections.deque(maxlen=max_events)
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    def record(self, env_id, phase, start, end):
+        with self._lock:
+            self.histograms[(env_id, phase)].add(end - start)
+            if self.trace:
+                self.events.append((env_id, phase, start, end, threading.get_ident()))
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.events.clear()
+
+    def to_dict(self):
+        """ Returns the histograms as a dict mapping env ids to phases to the
+        statistics of their durations in seconds. """
+        result = {}
+        with self._lock:
+            for (env_id, phase), histogram in sorted(self.histograms.items()):
+                result.setdefault(env_id, {})[phase] = histogram.to_dict()
+        return result
+
+    def write_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
+
+    def chrome_trace(self):
+        """ Returns the recorded events in the Chrome trace event format, with
+        one row per thread. The phases are nested into their methods. """
+        pid = os.getpid()
+        with self._lock:
+            events = list(self.events)
+        trace_events = [
+            {
+                "name": phase,
+                "cat": env_id,
+                "ph": "X",
+                "ts": (start - self._origin) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": pid,
+                "tid": tid,
+            }
+            for env_id, phase, start, end, tid in events
+        ]
+        return {"traceEvents": trace_events, "displayTimeUnit": "ns"}
+
+    def write_chrome_trace(self, path):
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+
+
+class _Lap(object):
+    """ Records the time since the previous mark for each phase and the total
+    time of the method when it is marked without a phase. """
+
+    __slots__ = ("_profiler", "_env_id", "_method", "_start", "_last")
+
+    def __init__(self, profiler, env_id, method):
+        self._profiler = profiler
+        self._env_id = env_id
+        self._method = method
+        self._start = self._last = time.perf_counter()
+
+    def mark(self, phase=None):
+        now = time.perf_counter()
+        if phase is None:
+            self._profiler.record(self._env_id, self._method, self._start, now)
+        else:
+            self._profiler.record(
+                self._env_id, self._method + "." + phase, self._last, now
+            )
+            self._last = now
+
+
+def null_lap(phase=None):
+    # a plain function is the cheapest thing to call
+    pass
+
+
+def env_id(env):
+    """ Returns the gym id of an environment, or its name if it was not made
+    with gym.make. """
+    spec = getattr(env, "spec", None)
+    if spec is not None:
+        return spec.id
+    return getattr(env, "_env_name", None) or type(env).__name__
+
+
+def start(env, method):
+    """ Returns a lap function timing the phases of a method of env, which
+    does nothing if profiling is disabled. """
+    profiler = _profiler
+    if profiler is None:
+        return null_lap
+    return _Lap(profiler, env_id(env), method).mark
+
+
+def enable(profiler=None, **kwargs):
+    """ Starts recording into the given profiler or a new Profiler created
+    with kwargs and returns it. """
+    global _profiler
+    _profiler = Profiler(**kwargs) if profiler is None else profiler
+    return _profiler
+
+
+def disable():
+    """ Stops recording and returns the profiler that was used, if any. """
+    global _profiler
+    profiler, _profiler = _profiler, None
+    return profiler
+
+
+def get_profiler():
+    return _profiler
+
+
+@contextlib.contextmanager
+def profile(**kwargs):
+    """ Enables profiling with a new Profiler while the context is active. """
+    profiler = enable(**kwargs)
+    try:
+        yield profiler
+    finally:
+        disable()
@@ -0,0 +1,250 @@
+"""
+Cached building blocks for rendering gridworlds as images.
+
+Fonts are loaded once per process and every glyph is rasterized only once into
+a tile, so that rendering a board only needs to stack the tiles with numpy.
+"""
+
+import collections
+import numpy as np
+
+FONT_FOR_HUMAN_RENDER = "DejaVuSansMono.ttf"
+CELL_SIZE = 50
+FONT_SIZE = 48
+INFO_FONT_SIZE = 24
+PYCOLAB_COLOUR_MAX = 999.0
+BACKGROUND = (255, 255, 255)
+FOREGROUND = (0, 0, 0)
+
+_fonts = {}
+_glyph_tiles = {}
+_glyph_fits = {}
+
+
+class LRUCache(object):
+    """ A small least recently used cache mapping hashable keys to values. """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._data = collections.OrderedDict()
+
+    def get(self, key):
+        try:
+            value = self._data.pop(key)
+        except KeyError:
+            return None
+        self._data[key] = value
+        return value
+
+    def put(self, key, value):
+        self._data.pop(key, None)
+        self._data[key] = value
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def get_font(size):
+    """ Returns the font used for rendering in the given size, which is only
+    loaded once per process. """
+    if size not in _fonts:
+        from PIL import ImageFont
+        from pkg_resources import resource_stream
+
+        font_stream = resource_stream(
+            "safe_grid_gym.envs.common", FONT_FOR_HUMAN_RENDER
+        )
+        _fonts[size] = ImageFont.truetype(font=font_stream, size=size)
+    return _fonts[size]
+
+
+def glyph_tile(char):
+    """ Returns a read-only (CELL_SIZE, CELL_SIZE, 3) uint8 array showing the
+    given character. """
+    if char not in _glyph_tiles:
+        from PIL import Image, ImageDraw
+
+        image = Image.new("RGB", (CELL_SIZE, CELL_SIZE), BACKGROUND)
+        ImageDraw.Draw(image).text(
+            (0, 0), char, font=get_font(FONT_SIZE), fill=FOREGROUND
+        )
+        tile = np.array(image)
+        tile.setflags(write=False)
+        _glyph_tiles[char] = tile
+    return _glyph_tiles[char]
+
+
+def fits_cell(char):
+    """ Returns whether the character is drawn within the width of a cell.
+    Wider glyphs, e.g. "1.0", reach into the cells to their right and cannot
+    be rendered as glyph tiles. """
+    if char not in _glyph_fits:
+        from PIL import Image, ImageDraw
+
+        image = Image.new("RGB", (CELL_SIZE * (len(char) + 1), CELL_SIZE), BACKGROUND)
+        ImageDraw.Draw(image).text(
+            (0, 0), char, font=get_font(FONT_SIZE), fill=FOREGROUND
+        )
+        _glyph_fits[char] = bool(np.all(np.array(image)[:, CELL_SIZE:] == BACKGROUND))
+    return _glyph_fits[char]
+
+
+def draw_board(chars):
+    """ Draws a list of rows of characters, one per cell, into a (rows *
+    CELL_SIZE, cols * CELL_SIZE, 3) uint8 array. Unlike blit_tiles, this keeps
+    the parts of glyphs that reach into the cells to their right. """
+    from PIL import Image, ImageDraw
+
+    rows, cols = len(chars), len(chars[0])
+    image = Image.new("RGB", (cols * CELL_SIZE, rows * CELL_SIZE), BACKGROUND)
+    drawing = ImageDraw.Draw(image)
+    font = get_font(FONT_SIZE)
+    for col in range(cols):
+        for row in range(rows):
+            drawing.text(
+                (col * CELL_SIZE, row * CELL_SIZE),
+                chars[row][col],
+                font=font,
+                fill=FOREGROUND,
+            )
+    return np.array(image)
+
+
+def glyph_atlas(chars):
+    """ Stacks the tiles of the given characters into an array of shape
+    (len(chars), CELL_SIZE, CELL_SIZE, 3). """
+    return np.stack([glyph_tile(char) for char in chars])
+
+
+def render_text_line(text, width):
+    """ Renders a line of text into a (CELL_SIZE, width, 3) uint8 array. """
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", (width, CELL_SIZE), BACKGROUND)
+    ImageDraw.Draw(image).text(
+        (0, 5), text, font=get_font(INFO_FONT_SIZE), fill=FOREGROUND
+    )
+    return np.array(image)
+
+
+def blit_tiles(atlas, indices):
+    """ Composes an image of shape (rows * CELL_SIZE, cols * CELL_SIZE, 3) from
+    a glyph atlas and an integer array of tile indices of shape (rows, cols). """
+    rows, cols = indices.shape
+    tiles = atlas[indices]  # (rows, cols, CELL_SIZE, CELL_SIZE, 3)
+    return tiles.transpose(0, 2, 1, 3, 4).reshape(rows * CELL_SIZE, cols * CELL_SIZE, 3)
+
+
+class AnsiRenderer(object):
+    """ Renders integer boards as text with a few vectorized numpy operations.
+
+    Parameters:
+    lookup_table (np.ndarray): uint8 array mapping each board code to the byte
+                               of its character. If None, the board is assumed
+                               to already contain character codes.
+    separator (str): an empty string or a single character put between the
+                     characters of a row
+    cache_size (int): number of rendered boards memoized by their bytes,
+                      0 disables the memoization
+    """
+
+    def __init__(self, lookup_table=None, separator="", cache_size=0):
+        assert len(separator) <= 1
+        self._lookup_table = lookup_table
+        self._separator = separator
+        self._cache = LRUCache(cache_size) if cache_size > 0 else None
+
+    def render(self, board):
+        if self._cache is not None:
+            key = (board.shape, board.dtype.str, board.tobytes())
+            text = self._cache.get(key)
+            if text is None:
+                text = self._render(board)
+                self._cache.put(key, text)
+            return text
+        return self._render(board)
+
+    def _render(self, board):
+        if self._lookup_table is None:
+            codes = board.astype(np.uint8, copy=False)
+        else:
+            codes = self._lookup_table[board.astype(np.intp, copy=False)]
+        rows, cols = codes.shape
+        step = 1 + len(self._separator)
+        width = cols * step - len(self._separator) + 1
+        lines = np.empty((rows, width), dtype=np.uint8)
+        if self._separator:
+            lines[:, 1 : width - 1 : step] = ord(self._separator)
+        lines[:, 0 : width - 1 : step] = codes
+        lines[:, -1] = ord("\n")
+        return lines.tobytes()[:-1].decode("latin-1")
+
+
+def colour_lookup_table(value_mapping, colour_mapping):
+    """ Returns a (3, V) uint8 array with the colour of each board value, where
+    value_mapping maps the characters of a pycolab game to the board values and
+    colour_mapping maps them to colours with components from 0 to 999. The
+    colours are converted to 0 to 255 like the pycolab RGB observations of the
+    ai_safety_gridworlds. """
+    lookup_table = np.zeros((3, int(max(value_mapping.values())) + 1), np.uint8)
+    for char, value in value_mapping.items():
+        if char in colour_mapping:
+            colour = np.array(colour_mapping[char]) / PYCOLAB_COLOUR_MAX * 255.0
+            lookup_table[:, int(value)] = colour.astype(np.uint8)
+    return lookup_table
+
+
+class RGBRenderer(object):
+    """ Renders boards as (3, H * scale, W * scale) uint8 images by looking up
+    the colour of each board value.
+
+    Parameters:
+    lookup_table (np.ndarray): uint8 array of shape (3, V) with the colour of
+                               each board value, see colour_lookup_table
+    scale (int): each cell is drawn as scale x scale pixels
+
+    The images are written to a buffer that is reused by every call to render,
+    so they have to be copied if they should be kept.
+    """
+
+    def __init__(self, lookup_table, scale=1):
+        assert scale >= 1
+        self._lookup_table = lookup_table
+        self.scale = scale
+        self._index = None
+        self._cells = None
+        self._frame = None
+
+    def _allocate(self, shape):
+        rows, cols = shape
+        self._index = np.empty(shape, dtype=np.intp)
+        self._cells = np.empty((3, rows, cols), dtype=np.uint8)
+        if self.scale == 1:
+            self._frame = self._cells
+        else:
+            frame_shape = (3, rows * self.scale, cols * self.scale)
+            self._frame = np.empty(frame_shape, dtype=np.uint8)
+
+    def render(self, board):
+        if self._index is None or self._index.shape != board.shape:
+            self._allocate(board.shape)
+        np.copyto(self._index, board, casting="unsafe")
+        np.take(self._lookup_table, self._index, axis=1, out=self._cells, mode="clip")
+        if self.scale > 1:
+            rows, cols = board.shape
+            blocks = self._frame.reshape(3, rows, self.scale, cols, self.scale)
+            np.copyto(blocks, self._cells[:, :, np.newaxis, :, np.newaxis])
+        return self._frame
+
+
+def lookup_table_for(chars):
+    """ Returns a uint8 lookup table for an AnsiRenderer, which maps index i to
+    chars[i], or None if the characters cannot be rendered as single bytes. """
+    if not all(len(char) == 1 and ord(char) < 256 for char in chars):
+        return None
+    return np.array([ord(char) for char in chars], dtype=np.uint8)
@@ -0,0 +1,216 @@
+"""
+Declarative specification of BaseGridworlds.
+
+A GridworldSpec describes the dynamics and rewards of a gridworld with arrays
+instead of Python callables: which field types block the agent, how field
+types change when the agent enters them, reward tables for the agent's
+position and for the field type it stands on, and a mask of cells where the
+observed reward is corrupted. The spec compiles into kernels that evaluate
+these tables for a single environment or for a whole batch with a few numpy
+operations. They can be passed to BaseGridworld, TabularGridworldEnv and
+BatchedBaseGridworld, which still accept arbitrary callables as well.
+"""
+
+import hashlib
+
+import numpy as np
+
+from safe_grid_gym.envs.common.base_gridworld import MOVE
+from safe_grid_gym.envs.common.batched_gridworld import MOVE_ARRAY
+
+
+def _field_table(values, field_types, default):
+    """ Turns a dict mapping field types to values or a sequence of values for
+    all field types (including the agent's 0) into an array. """
+    table = np.full(field_types + 1, default, dtype=np.result_type(default, float))
+    if isinstance(values, dict):
+        for field_type, value in values.items():
+            table[field_type] = value
+    elif values is not None:
+        table[:] = values
+    return table
+
+
+class GridworldSpec(object):
+    """ The configuration of a BaseGridworld as reward and movement tables.
+
+    Parameters:
+    grid_shape (tuple): shape of the grid
+    field_types (int): number of field types, the cells contain the field
+                       types 1 to field_types
+    initial_state (np.ndarray): field type of each cell
+    initial_position (tuple): initial position of the agent
+    episode_length (int): number of steps per episode
+    blocking (iterable): field types the agent cannot enter, e.g. walls
+    on_enter (dict): maps field types to the field type the cell changes to
+                     when the agent enters it, e.g. to collect items
+    position_rewards (np.ndarray): hidden reward for standing on each cell,
+                                   zero by default
+    field_rewards (dict): hidden reward for standing on a cell of a field type.
+                          The rewards are computed after on_enter changed the
+                          cell, so a collected item has to be rewarded through
+                          the field type it turns into.
+    corruption_mask (np.ndarray): boolean array marking the cells where the
+                                  observed reward differs from the hidden one
+    corrupt_rewards: the observed reward on the corrupt cells, either a number
+                     or an array of shape grid_shape
+    print_field (callable): see BaseGridworld
+    """
+
+    def __init__(
+        self,
+        grid_shape,
+        field_types,
+        initial_state,
+        initial_position,
+        episode_length,
+        blocking=(),
+        on_enter=None,
+        position_rewards=None,
+        field_rewards=None,
+        corruption_mask=None,
+        corrupt_rewards=0.0,
+        print_field=lambda x: str(x),
+    ):
+        self.grid_shape = tuple(grid_shape)
+        self.field_types = field_types
+        self.initial_state = np.array(initial_state)
+        assert self.initial_state.shape == self.grid_shape
+        self.initial_position = tuple(initial_position)
+        self.episode_length = episode_length
+        self.print_field = print_field
+
+        self.blocking = np.zeros(field_types + 1, dtype=bool)
+        self.blocking[list(blocking)] = True
+        self.on_enter = np.arange(field_types + 1)
+        for field_type, new_field_type in (on_enter or {}).items():
+            self.on_enter[field_type] = new_field_type
+        self._changes_state = bool(np.any(self.on_enter != np.arange(field_types + 1)))
+
+        if position_rewards is None:
+            position_rewards = np.zeros(self.grid_shape)
+        self.position_rewards = np.array(position_rewards, dtype=float)
+        assert self.position_rewards.shape == self.grid_shape
+        self.field_rewards = _field_table(field_rewards, field_types, 0.0)
+
+        if corruption_mask is None:
+            corruption_mask = np.zeros(self.grid_shape, dtype=bool)
+        self.corruption_mask = np.array(corruption_mask, dtype=bool)
+        assert self.corruption_mask.shape == self.grid_shape
+        self.corrupt_rewards = np.broadcast_to(
+            np.array(corrupt_rewards, dtype=float), self.grid_shape
+        )
+
+        # plain python tables are faster to index with single positions
+        self._blocking_list = self.blocking.tolist()
+        self._on_enter_list = self.on_enter.tolist()
+        self._position_rewards_list = self.position_rewards.tolist()
+        self._field_rewards_list = self.field_rewards.tolist()
+        self._corrupt_list = np.where(
+            self.corruption_mask, self.corrupt_rewards, np.nan
+        ).tolist()
+
+    def fingerprint(self):
+        """ Returns a hash of the movement and reward tables, which together
+        with the initial state determine the dynamics of the spec. """
+        digest = hashlib.sha1()
+        for table in (
+            self.blocking,
+            self.on_enter,
+            self.position_rewards,
+            self.field_rewards,
+            self.corruption_mask,
+            np.ascontiguousarray(self.corrupt_rewards),
+        ):
+            digest.update(str((table.dtype.str, table.shape)).encode())
+            digest.update(table.tobytes())
+        return digest.hexdigest()
+
+    # kernels for a single environment
+
+    def transition(self, state, position, action):
+        x = position[0] + MOVE[action][0]
+        y = position[1] + MOVE[action][1]
+        if not (0 <= x < self.grid_shape[0] and 0 <= y < self.grid_shape[1]):
+            return state, tuple(position)
+        field_type = int(state[x, y])
+        if self._blocking_list[field_type]:
+            return state, tuple(position)
+        new_field_type = self._on_enter_list[field_type]
+        if new_field_type != field_type:
+            state = np.array(state)
+            state[x, y] = new_field_type
+        return state, (x, y)
+
+    def hidden_reward(self, state, position):
+        x, y = position
+        return (
+            self._position_rewards_list[x][y]
+            + self._field_rewards_list[int(state[x, y])]
+        )
+
+    def corrupt_reward(self, state, position):
+        x, y = position
+        corrupt = self._corrupt_list[x][y]
+        if corrupt != corrupt:  # NaN, the cell is not corrupt
+            return self.hidden_reward(state, position)
+        return corrupt
+
+    # kernels for batches of states of shape (N, *grid_shape) and positions of
+    # shape (N, 2)
+
+    def batched_transition(self, states, positions, actions):
+        index = np.arange(len(positions))
+        moved = positions + MOVE_ARRAY[actions]
+        within = np.all((moved >= 0) & (moved < self.grid_shape), axis=1)
+        moved = np.where(within[:, np.newaxis], moved, positions)
+        field_types = states[index, moved[:, 0], moved[:, 1]].astype(np.intp)
+        blocked = self.blocking[field_types]
+        if blocked.any():
+            moved = np.where(blocked[:, np.newaxis], positions, moved)
+            field_types = states[index, moved[:, 0], moved[:, 1]].astype(np.intp)
+        if self._changes_state:
+            new_field_types = self.on_enter[field_types]
+            if np.any(new_field_types != field_types):
+                states = states.copy()
+                states[index, moved[:, 0], moved[:, 1]] = new_field_types
+        return states, moved
+
+    def batched_hidden_reward(self, states, positions):
+        x, y = positions[:, 0], positions[:, 1]
+        field_types = states[np.arange(len(positions)), x, y].astype(np.intp)
+        return self.position_rewards[x, y] + self.field_rewards[field_types]
+
+    def batched_corrupt_reward(self, states, positions):
+        x, y = positions[:, 0], positions[:, 1]
+        return np.where(
+            self.corruption_mask[x, y],
+            self.corrupt_rewards[x, y],
+            self.batched_hidden_reward(states, positions),
+        )
+
+    def env_kwargs(self):
+        """ Returns the keyword arguments for BaseGridworld and
+        TabularGridworldEnv. """
+        return {
+            "grid_shape": self.grid_shape,
+            "field_types": self.field_types,
+            "initial_state": self.initial_state,
+            "initial_position": self.initial_position,
+            "transition": self.transition,
+            "hidden_reward": self.hidden_reward,
+            "corrupt_reward": self.corrupt_reward,
+            "episode_length": self.episode_length,
+            "print_field": self.print_field,
+        }
+
+    def batched_env_kwargs(self):
+        """ Returns the keyword arguments for BatchedBaseGridworld, apart from
+        num_envs. """
+        kwargs = self.env_kwargs()
+        kwargs.update(
+            batched_transition=self.batched_transition,
+            batched_hidden_reward=self.batched_hidden_reward,
+            batched_corrupt_reward=self.batched_corrupt_reward,
+        )
+        return kwargs
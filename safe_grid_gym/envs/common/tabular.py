@@ -0,0 +1,247 @@
+"""
+Tabular representation of a BaseGridworld.
+
+The dynamics of a BaseGridworld are fully determined by its configuration. The
+reachable (state, position) pairs can therefore be enumerated once and the
+transitions and rewards stored in arrays, which can be used directly by
+planning algorithms like value iteration, or to step the environment with a
+few table lookups.
+"""
+
+import gym
+import numpy as np
+
+from safe_grid_gym.envs.common.base_gridworld import BaseGridworld
+from safe_grid_gym.envs.common.interface import (
+    INFO_HIDDEN_REWARD,
+    INFO_OBSERVED_REWARD,
+    INFO_DISCOUNT,
+)
+
+
+def _key(state, position):
+    return (np.asarray(state).tobytes(), tuple(int(p) for p in position))
+
+
+class TabularMDP(object):
+    """ The enumerated MDP of a BaseGridworld.
+
+    Attributes:
+    states (list): the (state, position) pair of each state index
+    next_state (np.ndarray): int array of shape (S, A) with the index of the
+                             (deterministic) successor of each state and action
+    transitions: P[s, a, s'] as a dense array of shape (S, A, S), or if sparse
+                 is set a list with one scipy.sparse.csr_matrix of shape (S, S)
+                 per action
+    observed_rewards (np.ndarray): R_observed[s, a] of shape (S, A), the
+                                   corrupt reward the agent observes
+    hidden_rewards (np.ndarray): R_hidden[s, a] of shape (S, A)
+    initial_state (int): index of the initial (state, position) pair
+    episode_length (int): number of steps per episode, the timestep is not part
+                          of the enumerated state
+    """
+
+    def __init__(
+        self,
+        states,
+        state_index,
+        next_state,
+        observed_rewards,
+        hidden_rewards,
+        episode_length,
+        sparse=False,
+    ):
+        self.states = states
+        self._state_index = state_index
+        self.next_state = next_state
+        self.observed_rewards = observed_rewards
+        self.hidden_rewards = hidden_rewards
+        self.initial_state = 0
+        self.episode_length = episode_length
+        if sparse:
+            self.transitions = self._sparse_transitions()
+        else:
+            self.transitions = self._dense_transitions()
+
+    @property
+    def n_states(self):
+        return self.next_state.shape[0]
+
+    @property
+    def n_actions(self):
+        return self.next_state.shape[1]
+
+    def index(self, state, position):
+        """ Returns the index of a (state, position) pair. """
+        return self._state_index[_key(state, position)]
+
+    def _dense_transitions(self):
+        transitions = np.zeros((self.n_states, self.n_actions, self.n_states))
+        s, a = np.indices(self.next_state.shape)
+        transitions[s, a, self.next_state] = 1.0
+        return transitions
+
+    def _sparse_transitions(self):
+        from scipy import sparse
+
+        rows = np.arange(self.n_states)
+        ones = np.ones(self.n_states)
+        return [
+            sparse.csr_matrix(
+                (ones, (rows, self.next_state[:, a])),
+                shape=(self.n_states, self.n_states),
+            )
+            for a in range(self.n_actions)
+        ]
+
+
+def enumerate_mdp(env, sparse=False):
+    """ Enumerates all (state, position) pairs of a BaseGridworld that are
+    reachable from its initial state and returns them as a TabularMDP. """
+    n_actions = env.action_space.n
+    initial = (np.array(env.initial_state), tuple(env.initial_position))
+    states = [initial]
+    state_index = {_key(*initial): 0}
+    next_state, observed_rewards, hidden_rewards = [], [], []
+
+    i = 0
+    while i < len(states):
+        state, position = states[i]
+        for action in range(n_actions):
+            # pass the same arguments as BaseGridworld.step
+            next_s, next_position = env.transition(np.array(state), position, action)
+            key = _key(next_s, next_position)
+            if key not in state_index:
+                state_index[key] = len(states)
+                states.append((np.array(next_s), tuple(next_position)))
+            next_state.append(state_index[key])
+            observed_rewards.append(env._corrupt_reward(next_s, next_position))
+            hidden_rewards.append(env._hidden_reward(next_s, next_position))
+        i += 1
+
+    shape = (len(states), n_actions)
+    return TabularMDP(
+        states=states,
+        state_index=state_index,
+        next_state=np.reshape(np.array(next_state, dtype=np.int64), shape),
+        observed_rewards=np.reshape(
+            np.array(observed_rewards, dtype=np.float64), shape
+        ),
+        hidden_rewards=np.reshape(np.array(hidden_rewards, dtype=np.float64), shape),
+        episode_length=env.episode_length,
+        sparse=sparse,
+    )
+
+
+class TabularGridworldEnv(gym.Env):
+    """ A BaseGridworld that is stepped by looking up the precomputed successor
+    state, rewards and observation of its enumerated MDP.
+
+    Takes the same parameters as BaseGridworld and behaves the same, but each
+    step only consists of a few table lookups. The observations are cached per
+    state and read-only, so they have to be copied before modifying them. With
+    a history_length greater than one, a copy of the history is returned.
+    """
+
+    metadata = {"render.modes": ["human", "ansi", "rgb_array"]}
+
+    def __init__(self, *args, **kwargs):
+        self._env = BaseGridworld(*args, **kwargs)
+        self.action_space = self._env.action_space
+        self.observation_space = self._env.observation_space
+        self.episode_length = self._env.episode_length
+        self.mdp = enumerate_mdp(self._env)
+
+        observations = np.stack(
+            [
+                self._env.to_observation(state, position)[np.newaxis, :]
+                for state, position in self.mdp.states
+            ]
+        )
+        self._history = self._env._history
+        observations.setflags(write=False)
+        # plain python lists are faster to index than numpy arrays
+        self._observations = list(observations)
+        self._next_state = self.mdp.next_state.tolist()
+        self._observed_rewards = self.mdp.observed_rewards.tolist()
+        self._hidden_rewards = self.mdp.hidden_rewards.tolist()
+
+        self._state = self.mdp.initial_state
+        self.timestep = 0
+        self.last_action = None
+        self._episode_return = 0.0
+        self._hidden_return = 0.0
+        self._last_performance = None
+        self._reset_next = False
+
+    @property
+    def state_index(self):
+        return self._state
+
+    @property
+    def state(self):
+        return self.mdp.states[self._state][0]
+
+    @property
+    def position(self):
+        return self.mdp.states[self._state][1]
+
+    def reset(self):
+        self._state = self.mdp.initial_state
+        self.timestep = 0
+        self.last_action = None
+        self._episode_return = 0.0
+        self._hidden_return = 0.0
+        self._reset_next = False
+        return self._observe(reset=True)
+
+    def _observe(self, reset=False):
+        observation = self._observations[self._state]
+        if self._history is None:
+            return observation
+        if reset:
+            self._history.reset(observation[0])
+        else:
+            self._history.push(observation[0])
+        return self._history.view().copy()
+
+    def step(self, action):
+        s = self._state
+        reward = self._observed_rewards[s][action]
+        hidden = self._hidden_rewards[s][action]
+        self._state = self._next_state[s][action]
+        self.timestep += 1
+        self.last_action = action
+        self._episode_return += reward
+        self._hidden_return += hidden
+
+        info = {
+            INFO_HIDDEN_REWARD: hidden,
+            INFO_OBSERVED_REWARD: reward,
+            INFO_DISCOUNT: 1,
+        }
+
+        done = self.timestep >= self.episode_length
+        if done:
+            if self._reset_next:
+                self._episode_return -= reward
+                self.timestep -= 1
+                raise RuntimeError("Failed to reset after end of episode.")
+            self._last_performance = self._hidden_return
+            self._reset_next = True
+
+        return self._observe(), reward, done, info
+
+    @property
+    def episode_return(self):
+        return self._episode_return
+
+    def get_last_performance(self):
+        return self._last_performance
+
+    def render(self, mode="human", close=False):
+        """ Renders the current state with BaseGridworld.render. """
+        self._env.state, self._env.position = self.mdp.states[self._state]
+        self._env.timestep = self.timestep
+        self._env.last_action = self.last_action
+        return self._env.render(mode=mode, close=close)
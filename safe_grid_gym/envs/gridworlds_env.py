@@ -5,22 +5,50 @@ GridworldEnv is based on an implementation by n0p2.
 The original repo can be found at https://github.com/n0p2/gym_ai_safety_gridworlds
 """
 
+import collections.abc
 import importlib
 import random
 import gym
 import copy
 import numpy as np
 
-from gym import error
+from gym import error, logger
 from gym.utils import seeding
-from ai_safety_gridworlds.helpers import factory
-from safe_grid_gym.viewer import AgentViewer
+from safe_grid_gym.envs.common import profiling
+from safe_grid_gym.envs.common.base_gridworld import observation_dtype
+from safe_grid_gym.envs.common.history import FrameHistory
+from safe_grid_gym.envs.common.rendering import (
+    AnsiRenderer,
+    RGBRenderer,
+    colour_lookup_table,
+)
 from safe_grid_gym.envs.common.interface import (
     INFO_HIDDEN_REWARD,
     INFO_OBSERVED_REWARD,
     INFO_DISCOUNT,
 )
 
+# The environments defined in ai_safety_gridworlds.helpers.factory. They are
+# listed here, so that the environments can be registered without importing
+# ai_safety_gridworlds and pycolab.
+ENV_NAMES = (
+    "boat_race",
+    "conveyor_belt",
+    "distributional_shift",
+    "friend_foe",
+    "island_navigation",
+    "rocks_diamonds",
+    "safe_interruptibility",
+    "side_effects_sokoban",
+    "tomato_watering",
+    "tomato_crmdp",
+    "absent_supervisor",
+    "whisky_gold",
+)
+
+INFO_MODES = ("full", "rewards_only", "lazy")
+ANSI_CACHE_SIZE = 256
+
 
 class GridworldEnv(gym.Env):
     """ An OpenAI Gym environment wrapping the AI safety gridworlds created by DeepMind.
@@ -41,25 +69,110 @@ class GridworldEnv(gym.Env):
                         - 'absent_supervisor'
                         - 'whisky_gold'
     use_transitions (bool): If set to true the state will be the concatenation
-                            of the board at time t-1 and at time t
+                            of the board at time t-1 and at time t, the same
+                            as history_length=2
     render_animation_delay (float): is passed through to the AgentViewer
                                     and defines the speed of the animation in
                                     render mode "human"
+    background_render (bool): If set to true, render mode "human" only hands
+                              the board to a background thread, which shows
+                              at most one frame every render_animation_delay
+                              seconds and skips frames if the environment is
+                              stepped faster. Otherwise every frame is shown
+                              and rendering waits render_animation_delay
+                              seconds.
+    reuse_observation (bool): If set to true the board is copied into a
+                              preallocated array, which is returned by every
+                              call to step and reset. The returned state is
+                              overwritten by the next step, so it has to be
+                              copied if it should be kept. The same holds for
+                              the frames of render mode "rgb_array".
+    info_mode (str): defines the content of the info dict returned by step:
+                        - "full": the rewards, the discount and all additional
+                          pycolab observations (default)
+                        - "rewards_only": only the rewards and the discount
+                        - "lazy": like "full", but the additional pycolab
+                          observations are only looked up on access
+    fast_reset (bool): If set to true the initial pycolab game is only built
+                       once and every reset restores a copy of it instead of
+                       building the game from its ASCII art again. Games that
+                       use random numbers or modify the environment data while
+                       being built are always built from scratch; a warning is
+                       logged and fast_reset_active stays False in that case.
+    obs_dtype: If set the boards are returned as arrays of this type instead of
+               the float arrays created by pycolab, for example np.uint8 to
+               store observations compactly.
+    rgb_scale (int): each cell is rendered as rgb_scale x rgb_scale pixels in
+                     render mode "rgb_array"
+    pycolab_rgb (bool): If set to false pycolab does not compute an RGB array
+                        for every observation, which is only needed for
+                        rendering. The "rgb_array" frames are computed from
+                        the board in any case.
+    history_length (int): If set the state contains the boards of the last
+                          history_length timesteps, oldest first. Boards
+                          before the start of the episode are zero.
     """
 
     metadata = {"render.modes": ["human", "ansi", "rgb_array"]}
 
-    def __init__(self, env_name, use_transitions=False, render_animation_delay=0.1, *args, **kwargs):
+    def __init__(
+        self,
+        env_name,
+        use_transitions=False,
+        render_animation_delay=0.1,
+        *args,
+        reuse_observation=False,
+        info_mode="full",
+        fast_reset=False,
+        obs_dtype=None,
+        rgb_scale=1,
+        pycolab_rgb=True,
+        background_render=False,
+        history_length=None,
+        **kwargs
+    ):
+        history_length = _history_length(use_transitions, history_length)
         self._env_name = env_name
         self._render_animation_delay = render_animation_delay
+        self._background_render = background_render
         self._viewer = None
+        self._ansi_renderer = AnsiRenderer(separator=" ", cache_size=ANSI_CACHE_SIZE)
+        from ai_safety_gridworlds.helpers import factory
+
         self._env = factory.get_environment_obj(env_name, *args, **kwargs)
-        self._rbg = None
+        self._rgb_scale = rgb_scale
+        self._rgb_renderer = None
+        if not pycolab_rgb and not self._disable_pycolab_rgb():
+            logger.warn("Could not disable the RGB array of the pycolab observations")
+        self._last_observation = None
         self._last_hidden_reward = 0
-        self._use_transitions = use_transitions
-        self._last_board = None
+        if info_mode not in INFO_MODES:
+            raise error.Error(
+                "Unknown info_mode '{}', should be in {}".format(info_mode, INFO_MODES)
+            )
+        self._info_mode = info_mode
+        self._fast_reset = fast_reset
+        self._game_snapshot_installed = False
+        # whether resets restore a snapshot, known after the first reset
+        self.fast_reset_active = False
         self.action_space = GridworldsActionSpace(self._env)
-        self.observation_space = GridworldsObservationSpace(self._env, use_transitions)
+        self.observation_space = GridworldsObservationSpace(
+            self._env, use_transitions, dtype=obs_dtype, history_length=history_length
+        )
+        if history_length > 1:
+            self._history = FrameHistory(
+                history_length,
+                self.observation_space.shape[1:],
+                self.observation_space.dtype,
+            )
+        else:
+            self._history = None
+        if reuse_observation:
+            self._obs_buffer = np.zeros(
+                self.observation_space.shape, dtype=self.observation_space.dtype
+            )
+        else:
+            self._obs_buffer = None
 
     def close(self):
         if self._viewer is not None:
@@ -79,11 +192,14 @@ class GridworldEnv(gym.Env):
                 - the discount factor of the last step with key INFO_DISCOUNT
                 - any additional information in the pycolab observation object,
                   excluding the RGB array. This includes in particular
-                  the "extra_observations"
+                  the "extra_observations". Depending on the info_mode these
+                  are omitted or only looked up on access.
         """
+        lap = profiling.start(self, "step")
         timestep = self._env.step(action)
         obs = timestep.observation
-        self._rgb = obs["RGB"]
+        self._last_observation = obs
+        lap("pycolab_step")
 
         reward = 0.0 if timestep.reward is None else timestep.reward
         done = timestep.step_type.last()
@@ -94,6 +210,7 @@ class GridworldEnv(gym.Env):
             self._last_hidden_reward = cumulative_hidden_reward
         else:
             hidden_reward = None
+        lap("hidden_reward")
 
         info = {
             INFO_HIDDEN_REWARD: hidden_reward,
@@ -101,33 +218,139 @@ class GridworldEnv(gym.Env):
             INFO_DISCOUNT: timestep.discount,
         }
 
-        for k, v in obs.items():
-            if k not in ("board", "RGB"):
-                info[k] = v
-
-        board = copy.deepcopy(obs["board"])
-
-        if self._use_transitions:
-            state = np.stack([self._last_board, board], axis=0)
-            self._last_board = board
+        if self._info_mode == "full":
+            for k, v in obs.items():
+                if k not in ("board", "RGB"):
+                    info[k] = v
+        elif self._info_mode == "lazy":
+            info = LazyInfo(info, obs)
+        lap("info")
+
+        if self._history is not None:
+            self._history.push(obs["board"])
+            state = self._copy_history()
+        elif self._obs_buffer is not None:
+            state = self._obs_buffer
+            np.copyto(state[0], obs["board"], casting="unsafe")
         else:
+            board = np.array(obs["board"], dtype=self.observation_space.dtype)
             state = board[np.newaxis, :]
+        lap("board_copy")
+        lap()
 
         return (state, reward, done, info)
 
+    def _copy_history(self):
+        """ Returns a copy of the board history, in the reused array if
+        reuse_observation is set. """
+        if self._obs_buffer is not None:
+            np.copyto(self._obs_buffer, self._history.view())
+            return self._obs_buffer
+        return self._history.view().copy()
+
+    def _install_game_snapshot(self):
+        """ Replaces the game factory of the pycolab environment with one that
+        returns copies of a game built once.
+
+        The environment data dict is shared between the environment and its
+        game, so it is not copied. If building the game draws random numbers or
+        changes the environment data, restoring a copy would not be equivalent
+        to building a new game, so the original factory is kept.
+        """
+        self._game_snapshot_installed = True
+        game_factory = getattr(self._env, "_game_factory", None)
+        if game_factory is None:
+            logger.warn(
+                "fast_reset is not supported by %s, which has no game factory",
+                self._env_name,
+            )
+            return
+        environment_data = getattr(self._env, "_environment_data", None)
+
+        np_random_state = np.random.get_state()
+        random_state = random.getstate()
+        data_before = _shallow_state(environment_data)
+        template = game_factory()
+        np_random_used = not _same_np_random_state(
+            np_random_state, np.random.get_state()
+        )
+        random_used = random_state != random.getstate()
+        data_changed = data_before != _shallow_state(environment_data)
+        # building the template must not influence the following episodes
+        np.random.set_state(np_random_state)
+        random.setstate(random_state)
+        if np_random_used or random_used or data_changed:
+            logger.warn(
+                "fast_reset is not used for %s, building its game %s",
+                self._env_name,
+                "draws random numbers"
+                if np_random_used or random_used
+                else "changes the environment data",
+            )
+            return
+
+        def snapshot_factory():
+            memo = {}
+            if environment_data is not None:
+                memo[id(environment_data)] = environment_data
+            return copy.deepcopy(template, memo)
+
+        self._env._game_factory = snapshot_factory
+        self.fast_reset_active = True
+
+    def _disable_pycolab_rgb(self):
+        """ Replaces the array converter of the pycolab observation distiller
+        with one that only computes the board. If the distiller does not have the
+        expected structure, it is not changed and False is returned. """
+        distiller = getattr(self._env, "_observation_distiller", None)
+        converter = getattr(distiller, "_array_converter", None)
+        renderers = getattr(converter, "_renderers", None)
+        if not isinstance(renderers, dict) or "board" not in renderers:
+            return False
+        board_renderer = renderers["board"]
+        distiller._array_converter = lambda observation: {
+            "board": board_renderer(observation)
+        }
+        return True
+
+    def _render_rgb(self):
+        if self._rgb_renderer is None:
+            value_mapping = getattr(self._env, "_value_mapping", None) or {
+                chr(i): i for i in range(256)
+            }
+            color_bg, _ = get_color_map(self._env_name)
+            self._rgb_renderer = RGBRenderer(
+                colour_lookup_table(value_mapping, color_bg), scale=self._rgb_scale
+            )
+        frame = self._rgb_renderer.render(self._last_observation["board"])
+        if self._obs_buffer is not None:
+            return frame
+        return frame.copy()
+
     def reset(self):
+        lap = profiling.start(self, "reset")
+        if self._fast_reset and not self._game_snapshot_installed:
+            self._install_game_snapshot()
         timestep = self._env.reset()
-        self._rgb = timestep.observation["RGB"]
+        self._last_observation = timestep.observation
+        self._last_hidden_reward = 0
         if self._viewer is not None:
             self._viewer.reset_time()
-
-        board = copy.deepcopy(timestep.observation["board"])
-
-        if self._use_transitions:
-            state = np.stack([np.zeros_like(board), board], axis=0)
-            self._last_board = board
+        lap("pycolab_reset")
+
+        if self._history is not None:
+            self._history.reset(timestep.observation["board"])
+            state = self._copy_history()
+        elif self._obs_buffer is not None:
+            state = self._obs_buffer
+            np.copyto(state[0], timestep.observation["board"], casting="unsafe")
         else:
+            board = np.array(
+                timestep.observation["board"], dtype=self.observation_space.dtype
+            )
             state = board[np.newaxis, :]
+        lap("board_copy")
+        lap()
 
         return state
 
@@ -138,31 +361,39 @@ class GridworldEnv(gym.Env):
     def render(self, mode="human"):
         """ Implements the gym render modes "rgb_array", "ansi" and "human".
 
-        - "rgb_array" just passes through the RGB array provided by pycolab in each state
+        - "rgb_array" looks up the colours of the board in the colour map of the
+          gridworld and returns them as a (3, H * rgb_scale, W * rgb_scale)
+          uint8 array, which is reused if reuse_observation is set
         - "ansi" gets an ASCII art from pycolab and returns is as a string
         - "human" uses the ai-safety-gridworlds-viewer to show an animation of the
           gridworld in a terminal
         """
+        lap = profiling.start(self, "render")
+        result = self._render(mode)
+        # the phase of a render call is its mode
+        lap(mode)
+        lap()
+        return result
+
+    def _render(self, mode):
         if mode == "rgb_array":
-            if self._rgb is None:
+            if self._last_observation is None:
                 error.Error("environment has to be reset before rendering")
             else:
-                return self._rgb
+                return self._render_rgb()
         elif mode == "ansi":
             if self._env._current_game is None:
                 error.Error("environment has to be reset before rendering")
             else:
                 ascii_np_array = self._env._current_game._board.board
-                ansi_string = "\n".join(
-                    [
-                        " ".join([chr(i) for i in ascii_np_array[j]])
-                        for j in range(ascii_np_array.shape[0])
-                    ]
-                )
-                return ansi_string
+                return self._ansi_renderer.render(ascii_np_array)
         elif mode == "human":
             if self._viewer is None:
-                self._viewer = init_viewer(self._env_name, self._render_animation_delay)
+                self._viewer = init_viewer(
+                    self._env_name,
+                    self._render_animation_delay,
+                    background=self._background_render,
+                )
                 self._viewer.display(self._env)
             else:
                 self._viewer.display(self._env)
@@ -170,6 +401,57 @@ class GridworldEnv(gym.Env):
             super(GridworldEnv, self).render(mode=mode)  # just raise an exception
 
 
+class LazyInfo(collections.abc.MutableMapping):
+    """ Info dict that contains the given entries and looks up all other
+    pycolab observations, excluding the board and the RGB array, only when they
+    are accessed. Keys can be assigned and deleted like in a dict, e.g. by
+    wrappers adding episode statistics, without copying the observations. """
+
+    def __init__(self, entries, observation):
+        self._entries = entries
+        self._observation = observation
+        self._deleted = set()
+
+    def _observation_keys(self):
+        return [
+            k
+            for k in self._observation.keys()
+            if k not in ("board", "RGB") and k not in self._deleted
+        ]
+
+    def __getitem__(self, key):
+        if key in self._entries:
+            return self._entries[key]
+        if key in ("board", "RGB") or key in self._deleted:
+            raise KeyError(key)
+        return self._observation[key]
+
+    def __setitem__(self, key, value):
+        self._entries[key] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._entries.pop(key, None)
+        self._deleted.add(key)
+
+    def __iter__(self):
+        for key in self._entries:
+            yield key
+        for key in self._observation_keys():
+            if key not in self._entries:
+                yield key
+
+    def __len__(self):
+        return len(set(self._entries).union(self._observation_keys()))
+
+    def __contains__(self, key):
+        return key in self._entries or key in self._observation_keys()
+
+    def __repr__(self):
+        return "LazyInfo({})".format(dict(self))
+
+
 class GridworldsActionSpace(gym.Space):
     def __init__(self, env):
         action_spec = env.action_spec()
@@ -196,39 +478,39 @@ class GridworldsActionSpace(gym.Space):
 
 
 class GridworldsObservationSpace(gym.Space):
-    def __init__(self, env, use_transitions):
+    def __init__(self, env, use_transitions, dtype=None, history_length=None):
         self.observation_spec_dict = env.observation_spec()
         self.use_transitions = use_transitions
-        if self.use_transitions:
-            shape = (2, *self.observation_spec_dict["board"].shape)
+        self.history_length = _history_length(use_transitions, history_length)
+        shape = (self.history_length, *self.observation_spec_dict["board"].shape)
+        if dtype is None:
+            dtype = self.observation_spec_dict["board"].dtype
         else:
-            shape = (1, *self.observation_spec_dict["board"].shape)
-        dtype = self.observation_spec_dict["board"].dtype
+            # the board contains the values of the environment's value mapping
+            value_mapping = getattr(env, "_value_mapping", None) or {None: 0}
+            dtype = observation_dtype(dtype, max(value_mapping.values()))
         super(GridworldsObservationSpace, self).__init__(shape=shape, dtype=dtype)
 
     def sample(self):
         """
-        Use pycolab to generate an example observation. Note that this is not a
-        random sample, but might return the same observation for every call.
+        Use pycolab to generate an example board for every frame of the
+        history. Note that this is not a random sample, but might return the
+        same observation for every call.
         """
-        if self.use_transitions:
-            raise NotImplementedError(
-                "Sampling from transition-based envs not yet supported."
-            )
-        observation = {}
-        for key, spec in self.observation_spec_dict.items():
-            if spec == {}:
-                observation[key] = {}
-            else:
-                observation[key] = spec.generate_value()
-        return observation["board"][np.newaxis, :]
+        board_spec = self.observation_spec_dict["board"]
+        boards = [board_spec.generate_value() for _ in range(self.history_length)]
+        return np.stack(boards).astype(self.dtype)
 
     def contains(self, x):
         if "board" in self.observation_spec_dict.keys():
+            board_spec = self.observation_spec_dict["board"]
+            # compact observations are validated as boards of the spec's type
+            x = np.asarray(x, dtype=board_spec.dtype)
+            if x.shape != self.shape:
+                return False
             try:
-                self.observation_spec_dict["board"].validate(x[0, ...])
-                if self.use_transitions:
-                    self.observation_spec_dict["board"].validate(x[1, ...])
+                for board in x:
+                    board_spec.validate(board)
                 return True
             except ValueError:
                 return False
@@ -236,9 +518,34 @@ class GridworldsObservationSpace(gym.Space):
             return False
 
 
-def init_viewer(env_name, pause):
+def _history_length(use_transitions, history_length):
+    if history_length is None:
+        return 2 if use_transitions else 1
+    if history_length < 1 or (use_transitions and history_length != 2):
+        raise error.Error(
+            "history_length has to be at least 1 and 2 if use_transitions is set"
+        )
+    return history_length
+
+
+def _shallow_state(data):
+    if data is None:
+        return None
+    return {key: id(value) for key, value in data.items()}
+
+
+def _same_np_random_state(state, other_state):
+    return all(
+        np.array_equal(a, b) if isinstance(a, np.ndarray) else a == b
+        for a, b in zip(state, other_state)
+    )
+
+
+def init_viewer(env_name, pause, background=False):
+    from safe_grid_gym.viewer import AgentViewer
+
     (color_bg, color_fg) = get_color_map(env_name)
-    av = AgentViewer(pause, color_bg=color_bg, color_fg=color_fg)
+    av = AgentViewer(pause, background=background, color_bg=color_bg, color_fg=color_fg)
     return av
 
 
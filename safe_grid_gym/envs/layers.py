@@ -0,0 +1,130 @@
+"""
+One-hot encoding of gridworld boards into stacks of binary layers.
+
+Every layer marks the cells of the board that contain one kind of object. The
+board values are mapped to layers with a precomputed lookup table and all
+layers are computed with one broadcasted comparison, without Python loops, for
+single boards of shape (F, H, W) as well as batches of shape (N, F, H, W).
+"""
+
+import gym
+import numpy as np
+
+from gym import spaces
+
+from safe_grid_gym.envs.gridworlds_env import GridworldEnv, get_color_map
+from safe_grid_gym.envs.common.tabular import TabularGridworldEnv
+
+
+class LayerEncoder(object):
+    """ Encodes boards of shape (..., F, H, W) as layers of shape
+    (..., F * C, H, W), where C is the number of layers. Layer f * C + c is 1
+    where frame f of the board contains values[c] and 0 elsewhere.
+
+    Parameters:
+    values (list): the (non-negative, integer) board value of each layer
+    names (list): a name for each layer, for example the character of the
+                  object, defaults to the values
+    dtype: type of the encoded layers
+    """
+
+    def __init__(self, values, names=None, dtype=np.uint8):
+        values = np.asarray(values)
+        assert values.ndim == 1 and len(values) > 0
+        assert np.all(values >= 0) and np.all(values == np.round(values))
+        self.values = values.astype(np.intp)
+        assert len(np.unique(self.values)) == len(self.values)
+        self.names = [str(v) for v in self.values] if names is None else list(names)
+        assert len(self.names) == len(self.values)
+        self.dtype = np.dtype(dtype)
+        # maps each board value to its layer and all other values to -1, values
+        # larger than the largest layer value are clipped to the last entry
+        self._lookup_table = np.full(self.values.max() + 2, -1, dtype=np.intp)
+        self._lookup_table[self.values] = np.arange(len(self.values))
+        self._layers = np.arange(len(self.values))[:, np.newaxis, np.newaxis]
+
+    @property
+    def n_layers(self):
+        return len(self.values)
+
+    def output_shape(self, board_shape):
+        """ Returns the shape of the encoded layers of boards of the given
+        shape. """
+        *batch_shape, frames, height, width = board_shape
+        return tuple(batch_shape) + (frames * self.n_layers, height, width)
+
+    def encode(self, boards, out=None):
+        """ Encodes boards of shape (..., F, H, W) as layers. If given, the
+        layers are written to the C-contiguous array `out` of shape
+        output_shape(boards.shape) instead of a new array. """
+        boards = np.asarray(boards)
+        index = self._lookup_table.take(boards.astype(np.intp), mode="clip")
+        *batch_shape, frames, height, width = index.shape
+        layers_shape = tuple(batch_shape) + (frames, self.n_layers, height, width)
+        if out is None:
+            layers = np.empty(layers_shape, dtype=self.dtype)
+            out = layers.reshape(self.output_shape(boards.shape))
+        else:
+            assert out.flags.c_contiguous
+            assert out.shape == self.output_shape(boards.shape)
+            layers = out.reshape(layers_shape)
+        np.equal(index[..., np.newaxis, :, :], self._layers, out=layers)
+        return out
+
+
+def layer_encoder_for(env, dtype=np.uint8):
+    """ Returns a LayerEncoder with one layer per kind of object of a
+    GridworldEnv, BaseGridworld, TabularGridworldEnv or BatchedBaseGridworld.
+
+    For a GridworldEnv the objects are the characters of the gridworld's
+    colour map, for the other environments the field types and the agent. """
+    env = getattr(env, "unwrapped", env)
+    if isinstance(env, GridworldEnv):
+        color_bg, _ = get_color_map(env._env_name)
+        value_mapping = getattr(env._env, "_value_mapping", None)
+        if value_mapping:
+            chars = list(color_bg) + [c for c in value_mapping if c not in color_bg]
+            chars = [c for c in chars if c in value_mapping]
+            values = [value_mapping[c] for c in chars]
+        else:
+            # pycolab uses the character codes if there is no value mapping
+            chars = list(color_bg)
+            values = [ord(c) for c in chars]
+        names, unique_values = [], []
+        for char, value in zip(chars, values):
+            if value not in unique_values:
+                names.append(char)
+                unique_values.append(value)
+        return LayerEncoder(unique_values, names=names, dtype=dtype)
+
+    if isinstance(env, TabularGridworldEnv):
+        env = env._env
+    values = list(range(env.field_types + 1))
+    return LayerEncoder(values, names=[env.print_field(v) for v in values], dtype=dtype)
+
+
+class LayeredObservationWrapper(gym.ObservationWrapper):
+    """ Returns the observations of a gridworld as one-hot encoded layers of
+    shape (F * C, H, W), see LayerEncoder.
+
+    Parameters:
+    env (gym.Env): a GridworldEnv, BaseGridworld or TabularGridworldEnv
+    dtype: type of the layers
+    reuse_observation (bool): If set to true the layers are written to a
+                              preallocated array, which is returned by every
+                              call to step and reset and overwritten by the
+                              next one.
+    """
+
+    def __init__(self, env, dtype=np.uint8, reuse_observation=False):
+        super(LayeredObservationWrapper, self).__init__(env)
+        self.encoder = layer_encoder_for(env, dtype)
+        shape = self.encoder.output_shape(env.observation_space.shape)
+        self.observation_space = spaces.Box(low=0, high=1, shape=shape, dtype=dtype)
+        if reuse_observation:
+            self._buffer = np.zeros(shape, dtype=dtype)
+        else:
+            self._buffer = None
+
+    def observation(self, observation):
+        return self.encoder.encode(observation, out=self._buffer)
@@ -0,0 +1,143 @@
+"""
+The EnvPool hands out warm environments that can be returned and reused.
+
+Constructing a GridworldEnv builds the pycolab environment and its spaces and
+the first reset builds a game. The pool keeps released environments reset and
+ready, so that acquiring an environment of a known configuration is cheap.
+"""
+
+import collections
+import contextlib
+import threading
+
+from safe_grid_gym.envs.gridworlds_env import GridworldEnv
+
+
+def _freeze(value):
+    """ Turns dicts, lists and sets into hashable tuples. """
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, set):
+        return tuple(sorted(_freeze(v) for v in value))
+    return value
+
+
+class EnvPool(object):
+    """ A pool of reset environments keyed by (env_name, kwargs).
+
+    Parameters:
+    max_size (int): maximum number of idle environments kept in the pool. If
+                    the pool is full, the idle environments of the least
+                    recently used configuration are closed first.
+    env_factory (callable): called as env_factory(env_name, **kwargs) to create
+                            a new environment, defaults to GridworldEnv. For
+                            example gym.make can be used to pool environments
+                            by their gym id.
+
+    Environments are reset when they are released, so acquired environments
+    are ready to be stepped. The observation of that reset is kept with the
+    environment and set as its `initial_observation` attribute when it is
+    acquired, so it does not have to be reset again.
+    """
+
+    def __init__(self, max_size=16, env_factory=GridworldEnv):
+        assert max_size >= 0
+        self.max_size = max_size
+        self._env_factory = env_factory
+        self._idle = collections.OrderedDict()
+        self._size = 0
+        self._leased = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def acquire(self, env_name, **kwargs):
+        """ Returns a reset environment, which has to be given back with
+        `release`. Its `initial_observation` is the observation returned by
+        the reset. """
+        key = (env_name, _freeze(kwargs))
+        with self._lock:
+            envs = self._idle.get(key)
+            if envs:
+                env, observation = envs.pop()
+                self._size -= 1
+                if not envs:
+                    del self._idle[key]
+                self.hits += 1
+            else:
+                env = None
+                self.misses += 1
+        if env is None:
+            env = self._env_factory(env_name, **kwargs)
+            observation = env.reset()
+        with self._lock:
+            self._leased[id(env)] = key
+        env.initial_observation = observation
+        return env
+
+    def release(self, env):
+        """ Resets the environment and returns it to the pool. """
+        with self._lock:
+            key = self._leased.pop(id(env))
+        self._put(key, env, env.reset())
+
+    def _put(self, key, env, observation):
+        evicted = []
+        with self._lock:
+            self._idle.setdefault(key, []).append((env, observation))
+            self._idle.move_to_end(key)
+            self._size += 1
+            while self._size > self.max_size:
+                oldest_key, envs = next(iter(self._idle.items()))
+                evicted.append(envs.pop(0)[0])
+                self._size -= 1
+                self.evictions += 1
+                if not envs:
+                    del self._idle[oldest_key]
+        for evicted_env in evicted:
+            evicted_env.close()
+
+    @contextlib.contextmanager
+    def lease(self, env_name, **kwargs):
+        """ Context manager that acquires an environment and releases it when
+        the context is left. """
+        env = self.acquire(env_name, **kwargs)
+        try:
+            yield env
+        finally:
+            self.release(env)
+
+    def prefill(self, env_name, n, **kwargs):
+        """ Creates environments until the pool holds at least n idle
+        environments of the given configuration. """
+        key = (env_name, _freeze(kwargs))
+        with self._lock:
+            missing = n - len(self._idle.get(key, ()))
+        for _ in range(missing):
+            env = self._env_factory(env_name, **kwargs)
+            self._put(key, env, env.reset())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "idle": self._size,
+                "leased": len(self._leased),
+            }
+
+    def close(self):
+        """ Closes all idle environments. """
+        with self._lock:
+            envs = [env for key_envs in self._idle.values() for env, _ in key_envs]
+            self._idle.clear()
+            self._size = 0
+        for env in envs:
+            env.close()
+
+    def __len__(self):
+        return self._size
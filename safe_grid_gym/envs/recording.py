@@ -0,0 +1,248 @@
+"""
+Recording of transitions into memory-mapped numpy files.
+
+The TrajectoryRecorder wraps an environment and writes every transition
+(obs, action, reward, hidden_reward, discount, done) into chunks of .npy files
+that are opened with np.lib.format.open_memmap, so recording does not keep the
+transitions in memory. The TrajectoryReader memory-maps the chunks again and
+gives random access to transitions and episodes without loading them.
+
+A recording directory contains one file per chunk and field, the index
+"index.json" with the shape and type of the observations and the length of
+each chunk, and "episodes.npy" with the start and length of each episode.
+"""
+
+import json
+import os
+
+import gym
+import numpy as np
+
+from safe_grid_gym.envs.common.interface import INFO_HIDDEN_REWARD, INFO_DISCOUNT
+
+FIELDS = ("obs", "actions", "rewards", "hidden_rewards", "discounts", "dones")
+INDEX_FILE = "index.json"
+EPISODES_FILE = "episodes.npy"
+
+
+def _chunk_file(directory, chunk, field):
+    return os.path.join(directory, "chunk_{:05d}_{}.npy".format(chunk, field))
+
+
+def _nan_if_none(value):
+    return np.nan if value is None else value
+
+
+class TrajectoryRecorder(gym.Wrapper):
+    """ Records all transitions of an environment into `directory`.
+
+    Parameters:
+    env (gym.Env): the environment to record, for example a GridworldEnv
+    directory (str): the directory to write the recording to, it is created
+                     if it does not exist
+    chunk_size (int): number of transitions per chunk
+
+    The observation of a transition is the observation the action was taken
+    in. Unfinished episodes are recorded when the environment is reset or the
+    recorder closed. To keep episodes contiguous, an episode that does not fit
+    into the rest of a chunk is moved to the next chunk, unless it is longer
+    than a chunk. The index is written by `flush` and `close`.
+    """
+
+    def __init__(self, env, directory, chunk_size=2 ** 16):
+        super(TrajectoryRecorder, self).__init__(env)
+        assert chunk_size >= 2
+        self.directory = directory
+        self.chunk_size = chunk_size
+        os.makedirs(directory, exist_ok=True)
+        self._obs_shape = tuple(env.observation_space.shape)
+        self._obs_dtype = np.dtype(env.observation_space.dtype)
+        self._chunk_lengths = []
+        self._chunk = None
+        self._offset = 0  # global index of the first row of the current chunk
+        self._row = 0  # row of the current observation in the current chunk
+        self._episodes = []
+        self._episode_start = None
+        self._new_chunk()
+
+    def _new_chunk(self):
+        chunk = len(self._chunk_lengths)
+        shapes = {
+            "obs": ((self.chunk_size,) + self._obs_shape, self._obs_dtype),
+            "actions": ((self.chunk_size,), np.int64),
+            "rewards": ((self.chunk_size,), np.float64),
+            "hidden_rewards": ((self.chunk_size,), np.float64),
+            "discounts": ((self.chunk_size,), np.float64),
+            "dones": ((self.chunk_size,), np.bool_),
+        }
+        self._chunk_lengths.append(0)
+        self._chunk = {
+            field: np.lib.format.open_memmap(
+                _chunk_file(self.directory, chunk, field),
+                mode="w+",
+                dtype=dtype,
+                shape=shape,
+            )
+            for field, (shape, dtype) in shapes.items()
+        }
+
+    def _next_chunk(self):
+        """ Finishes the current chunk and moves the rows of the current
+        episode to the next one, if they do not fill the whole chunk. """
+        keep_from = self._row
+        if self._episode_start is not None and self._episode_start > self._offset:
+            keep_from = self._episode_start - self._offset
+        old_chunk = self._chunk
+        self._chunk_lengths[-1] = keep_from
+        self._new_chunk()
+        moved = self._row - keep_from
+        for field in FIELDS:
+            self._chunk[field][:moved] = old_chunk[field][keep_from : self._row]
+            old_chunk[field].flush()
+        self._offset += keep_from
+        self._row = moved
+        self._chunk_lengths[-1] = moved
+
+    def _write_obs(self, obs):
+        if self._row == self.chunk_size:
+            self._next_chunk()
+        self._chunk["obs"][self._row] = obs
+
+    def _end_episode(self):
+        end = self._offset + self._row
+        if self._episode_start is not None and end > self._episode_start:
+            self._episodes.append((self._episode_start, end - self._episode_start))
+        self._episode_start = None
+
+    def reset(self, **kwargs):
+        self._end_episode()
+        obs = self.env.reset(**kwargs)
+        self._episode_start = self._offset + self._row
+        self._write_obs(obs)
+        return obs
+
+    def step(self, action):
+        obs, reward, done, info = self.env.step(action)
+        row, chunk = self._row, self._chunk
+        chunk["actions"][row] = action
+        chunk["rewards"][row] = reward
+        chunk["hidden_rewards"][row] = _nan_if_none(info.get(INFO_HIDDEN_REWARD))
+        chunk["discounts"][row] = _nan_if_none(info.get(INFO_DISCOUNT))
+        chunk["dones"][row] = done
+        self._row += 1
+        self._chunk_lengths[-1] = self._row
+        if done:
+            self._end_episode()
+        else:
+            self._write_obs(obs)
+        return obs, reward, done, info
+
+    def flush(self):
+        """ Flushes the chunks to disk and writes the index. Unfinished episodes
+        are not part of the index until they are finished. """
+        for array in self._chunk.values():
+            array.flush()
+        index = {
+            "chunk_size": self.chunk_size,
+            "chunk_lengths": self._chunk_lengths,
+            "obs_shape": list(self._obs_shape),
+            "obs_dtype": self._obs_dtype.str,
+        }
+        with open(os.path.join(self.directory, INDEX_FILE), "w") as f:
+            json.dump(index, f)
+        episodes = np.array(self._episodes, dtype=np.int64).reshape(-1, 2)
+        np.save(os.path.join(self.directory, EPISODES_FILE), episodes)
+
+    def close(self):
+        self._end_episode()
+        self.flush()
+        return self.env.close()
+
+
+class TrajectoryReader(object):
+    """ Reads a recording of a TrajectoryRecorder.
+
+    Parameters:
+    directory (str): the directory of the recording
+
+    All fields are memory-mapped read-only. `episode` returns views into the
+    chunks, which are only loaded from disk when they are accessed.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, INDEX_FILE)) as f:
+            self.index = json.load(f)
+        self.episodes = np.load(os.path.join(directory, EPISODES_FILE))
+        self._chunks = []
+        for chunk, length in enumerate(self.index["chunk_lengths"]):
+            arrays = {}
+            for field in FIELDS:
+                path = _chunk_file(directory, chunk, field)
+                arrays[field] = np.load(path, mmap_mode="r")[:length]
+            self._chunks.append(arrays)
+        lengths = np.array(self.index["chunk_lengths"], dtype=np.int64)
+        self._chunk_starts = np.concatenate([[0], np.cumsum(lengths)])
+
+    def __len__(self):
+        return int(self._chunk_starts[-1])
+
+    @property
+    def n_episodes(self):
+        return len(self.episodes)
+
+    def _locate(self, i):
+        chunk = int(np.searchsorted(self._chunk_starts, i, side="right")) - 1
+        return chunk, i - int(self._chunk_starts[chunk])
+
+    def __getitem__(self, i):
+        """ Returns the fields of transition i as a dict. """
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("transition index out of range")
+        chunk, row = self._locate(i)
+        return {field: self._chunks[chunk][field][row] for field in FIELDS}
+
+    def field(self, field, start=0, stop=None):
+        """ Returns the given field of the transitions start to stop, as a view
+        if they are stored in a single chunk. """
+        stop = len(self) if stop is None else stop
+        if start == stop:
+            return self._chunks[0][field][:0]
+        first_chunk, first_row = self._locate(start)
+        last_chunk, _ = self._locate(stop - 1)
+        if first_chunk == last_chunk:
+            return self._chunks[first_chunk][field][
+                first_row : first_row + stop - start
+            ]
+        parts = [self._chunks[first_chunk][field][first_row:]]
+        parts += [self._chunks[c][field] for c in range(first_chunk + 1, last_chunk)]
+        last_row = stop - int(self._chunk_starts[last_chunk])
+        parts.append(self._chunks[last_chunk][field][:last_row])
+        return np.concatenate(parts)
+
+    def episode(self, i):
+        """ Returns all fields of episode i as a dict of arrays. """
+        start, length = self.episodes[i]
+        return {field: self.field(field, start, start + length) for field in FIELDS}
+
+    def iter_episodes(self):
+        for i in range(self.n_episodes):
+            yield self.episode(i)
+
+    def returns(self):
+        """ Returns the observed and hidden return of every episode. """
+        if self.n_episodes == 0:
+            return np.zeros(0), np.zeros(0)
+        starts, lengths = self.episodes[:, 0], self.episodes[:, 1]
+        # sum the rewards from the start to the end of each episode separately,
+        # so a NaN reward does not spread to the returns of later episodes
+        bounds = np.stack([starts, starts + lengths], axis=1).ravel()
+        returns = []
+        for field in ("rewards", "hidden_rewards"):
+            # the appended zero keeps the end of the last episode a valid index
+            values = np.append(self.field(field), 0.0)
+            sums = np.add.reduceat(values, bounds)[::2]
+            returns.append(np.where(lengths > 0, sums, 0.0))
+        return tuple(returns)
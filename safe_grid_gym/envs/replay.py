@@ -0,0 +1,196 @@
+"""
+Bulk replay of recorded action sequences.
+
+The action sequences are stored in a trie, so that the steps of a prefix that
+several sequences share are only simulated once. Where sequences diverge, the
+environment and the state of the global random number generators are copied
+and restored for every branch, which makes every sequence see the same
+environment as if it was replayed alone after a reset. The sequences are split
+by their first actions into groups that are replayed in a process pool.
+
+Recorded episodes can be replayed with
+
+    reader = TrajectoryReader(directory)
+    results = replay("BoatRace-v0", [e["actions"] for e in reader.iter_episodes()])
+"""
+
+import collections
+import copy
+import multiprocessing
+import os
+import random
+
+import numpy as np
+
+from safe_grid_gym.envs.common.interface import INFO_HIDDEN_REWARD
+
+ReplayResults = collections.namedtuple(
+    "ReplayResults", ["observed_returns", "hidden_returns", "lengths"]
+)
+
+
+class _Node(object):
+    __slots__ = ("children", "ends")
+
+    def __init__(self):
+        self.children = collections.OrderedDict()
+        self.ends = []
+
+
+class _Snapshot(object):
+    """ A copy of an environment, the global random states and the returns at
+    a node of the trie, which is restored `users` times. """
+
+    def __init__(self, env, returns, users):
+        self.env = copy.deepcopy(env)
+        self.np_random_state = np.random.get_state()
+        self.random_state = random.getstate()
+        self.returns = returns
+        self.users = users
+
+    def restore(self):
+        np.random.set_state(self.np_random_state)
+        random.setstate(self.random_state)
+        self.users -= 1
+        # the last user can take the copy itself
+        env = self.env if self.users == 0 else copy.deepcopy(self.env)
+        return env, self.returns
+
+
+def build_trie(sequences):
+    """ Returns the root of a trie containing the given action sequences. The
+    index of each sequence is stored in the node its last action leads to. """
+    root = _Node()
+    for index, sequence in enumerate(sequences):
+        node = root
+        for action in sequence:
+            action = int(action)
+            if action not in node.children:
+                node.children[action] = _Node()
+            node = node.children[action]
+        node.ends.append(index)
+    return root
+
+
+def replay_trie(env, root, n_sequences):
+    """ Resets the environment and replays all sequences of the trie.
+
+    Actions after the end of an episode are ignored. Returns the observed and
+    hidden return and the number of steps taken for each sequence as arrays. A
+    hidden reward of None is counted as NaN. """
+    observed_returns = np.zeros(n_sequences)
+    hidden_returns = np.zeros(n_sequences)
+    lengths = np.zeros(n_sequences, dtype=np.int64)
+
+    env.reset()
+    # the returns are (observed return, hidden return, steps, done)
+    stack = [(None, root, None)]
+    while stack:
+        action, node, snapshot = stack.pop()
+        if snapshot is not None:
+            env, returns = snapshot.restore()
+        else:
+            returns = (0.0, 0.0, 0, False)
+        while True:
+            if action is not None and not returns[3]:
+                _, reward, done, info = env.step(action)
+                hidden = info.get(INFO_HIDDEN_REWARD)
+                returns = (
+                    returns[0] + reward,
+                    returns[1] + (np.nan if hidden is None else hidden),
+                    returns[2] + 1,
+                    done,
+                )
+            for index in node.ends:
+                observed_returns[index], hidden_returns[index] = returns[:2]
+                lengths[index] = returns[2]
+            if not node.children:
+                break
+            children = list(node.children.items())
+            if len(children) > 1:
+                branch = _Snapshot(env, returns, users=len(children) - 1)
+                for child in reversed(children[1:]):
+                    stack.append(child + (branch,))
+            action, node = children[0]
+    return observed_returns, hidden_returns, lengths
+
+
+def _replay_group(args):
+    env_id, env_kwargs, seed, indices, sequences = args
+    import gym
+    import safe_grid_gym  # registers the environments
+
+    if seed is not None:
+        np.random.seed(seed)
+        random.seed(seed)
+    env = gym.make(env_id, **env_kwargs)
+    if seed is not None:
+        env.seed(seed)
+    results = replay_trie(env, build_trie(sequences), len(sequences))
+    env.close()
+    return indices, results
+
+
+def _split(sequences, n_groups):
+    """ Groups the indices of the sequences by their shortest prefix that
+    yields at least n_groups groups (or by the longest prefix). """
+    max_length = max((len(sequence) for sequence in sequences), default=0)
+    depth = 1
+    while True:
+        groups = collections.OrderedDict()
+        for index, sequence in enumerate(sequences):
+            key = tuple(int(a) for a in sequence[:depth])
+            groups.setdefault(key, []).append(index)
+        if len(groups) >= n_groups or depth >= max_length:
+            return list(groups.values())
+        depth += 1
+
+
+def replay(
+    env_id, sequences, env_kwargs=None, processes=None, seed=None, start_method=None
+):
+    """ Replays many action sequences, each from a reset environment.
+
+    Parameters:
+    env_id (str): gym id of the environment
+    sequences (list): the action sequences, e.g. lists or arrays of ints
+    env_kwargs (dict): additional arguments for gym.make
+    processes (int): size of the process pool, defaults to the number of CPUs.
+                     If 0 all sequences are replayed in this process.
+    seed (int): if given, the environment and the global random number
+                generators are seeded with it before replaying
+    start_method (str): multiprocessing start method
+
+    Returns ReplayResults with the observed and hidden return and the number of
+    steps taken for each sequence.
+    """
+    sequences = list(sequences)
+    env_kwargs = {} if env_kwargs is None else dict(env_kwargs)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if not sequences:
+        return ReplayResults(np.zeros(0), np.zeros(0), np.zeros(0, dtype=np.int64))
+    if processes == 0:
+        groups = [list(range(len(sequences)))]
+    else:
+        groups = _split(sequences, processes)
+    tasks = [
+        (env_id, env_kwargs, seed, indices, [sequences[i] for i in indices])
+        for indices in groups
+    ]
+
+    if processes == 0:
+        outputs = map(_replay_group, tasks)
+    else:
+        ctx = multiprocessing.get_context(start_method)
+        with ctx.Pool(min(processes, len(tasks))) as pool:
+            outputs = pool.map(_replay_group, tasks)
+
+    observed_returns = np.zeros(len(sequences))
+    hidden_returns = np.zeros(len(sequences))
+    lengths = np.zeros(len(sequences), dtype=np.int64)
+    for indices, (observed, hidden, length) in outputs:
+        observed_returns[indices] = observed
+        hidden_returns[indices] = hidden
+        lengths[indices] = length
+    return ReplayResults(observed_returns, hidden_returns, lengths)
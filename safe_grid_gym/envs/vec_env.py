@@ -0,0 +1,235 @@
+"""
+The SubprocVecGridworldEnv runs several GridworldEnvs in worker processes.
+
+pycolab is pure python and single-threaded, so stepping many safety gridworlds
+can only be parallelized with processes. To keep the communication overhead
+small, the workers write their boards into a shared memory buffer and only send
+the rewards, the discount and the done flag back through a pipe.
+"""
+
+import multiprocessing
+import numpy as np
+
+from safe_grid_gym.envs.gridworlds_env import GridworldEnv
+from safe_grid_gym.envs.common.interface import (
+    INFO_HIDDEN_REWARD,
+    INFO_OBSERVED_REWARD,
+    INFO_DISCOUNT,
+    INFO_TERMINAL_OBSERVATION,
+)
+from safe_grid_gym.envs.common.metrics import SafetyMetrics
+
+
+def _worker(
+    remote,
+    parent_remote,
+    env_name,
+    env_kwargs,
+    info_keys,
+    index,
+    buffers,
+    shape,
+    dtype,
+):
+    parent_remote.close()
+    observations, terminal_observations = [
+        np.frombuffer(buffer, dtype=dtype).reshape(shape) for buffer in buffers
+    ]
+    env = GridworldEnv(env_name, **env_kwargs)
+    try:
+        while True:
+            cmd, data = remote.recv()
+            if cmd == "step":
+                obs, reward, done, info = env.step(data)
+                if done:
+                    terminal_observations[index] = obs
+                    obs = env.reset()
+                observations[index] = obs
+                hidden_reward = info[INFO_HIDDEN_REWARD]
+                remote.send(
+                    (
+                        reward,
+                        done,
+                        np.nan if hidden_reward is None else hidden_reward,
+                        info[INFO_DISCOUNT],
+                        {k: info[k] for k in info_keys if k in info},
+                    )
+                )
+            elif cmd == "reset":
+                observations[index] = env.reset()
+                remote.send(None)
+            elif cmd == "render":
+                remote.send(env.render(mode=data))
+            elif cmd == "seed":
+                remote.send(env.seed(data))
+            elif cmd == "close":
+                env.close()
+                break
+            else:
+                raise NotImplementedError("Unknown command '{}'".format(cmd))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        remote.close()
+
+
+class SubprocVecGridworldEnv(object):
+    """ Runs `num_envs` GridworldEnvs in separate processes.
+
+    Parameters:
+    env_name (str): the safety gridworld to load, see GridworldEnv
+    num_envs (int): number of environments (and worker processes)
+    env_kwargs (dict): additional keyword arguments passed to GridworldEnv
+    info_keys (iterable): keys of the GridworldEnv info dict, apart from the
+                          rewards and the discount, that should be sent back
+                          from the workers, e.g. "extra_observations". These
+                          are pickled in every step, so keep this small.
+    copy_observations (bool): if False, `step` and `reset` return a view of
+                              the shared memory buffer, which is overwritten
+                              by the next call
+    start_method (str): multiprocessing start method, uses the platform
+                        default if None
+
+    `step` returns the observations, rewards and dones as arrays with leading
+    dimension `num_envs` and an info dict of arrays. A hidden reward of None is
+    reported as NaN. Environments that finish an episode are reset
+    automatically, the last observation of the finished episode is stored in the
+    info dict with key INFO_TERMINAL_OBSERVATION. The returns of the finished
+    episodes are collected in `metrics` and returned by `get_episode_stats`.
+    """
+
+    def __init__(
+        self,
+        env_name,
+        num_envs,
+        env_kwargs=None,
+        info_keys=(),
+        copy_observations=True,
+        start_method=None,
+    ):
+        assert num_envs >= 1
+        self.num_envs = num_envs
+        self._copy_observations = copy_observations
+        self._info_keys = tuple(info_keys)
+        env_kwargs = {} if env_kwargs is None else dict(env_kwargs)
+
+        # only used to read the spaces
+        env = GridworldEnv(env_name, **env_kwargs)
+        self.action_space = env.action_space
+        self.observation_space = env.observation_space
+        env.close()
+
+        shape = (num_envs,) + tuple(self.observation_space.shape)
+        dtype = np.dtype(self.observation_space.dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        ctx = multiprocessing.get_context(start_method)
+        buffers = [ctx.RawArray("b", nbytes) for _ in range(2)]
+        self._observations, self._terminal_observations = [
+            np.frombuffer(buffer, dtype=dtype).reshape(shape) for buffer in buffers
+        ]
+
+        self._remotes, work_remotes = zip(*[ctx.Pipe() for _ in range(num_envs)])
+        self._processes = []
+        for index, (work_remote, remote) in enumerate(zip(work_remotes, self._remotes)):
+            args = (
+                work_remote,
+                remote,
+                env_name,
+                env_kwargs,
+                self._info_keys,
+                index,
+                buffers,
+                shape,
+                dtype,
+            )
+            process = ctx.Process(target=_worker, args=args, daemon=True)
+            process.start()
+            self._processes.append(process)
+            work_remote.close()
+
+        self.metrics = SafetyMetrics(num_envs)
+        self._waiting = False
+        self._closed = False
+
+    def _get_observations(self):
+        if self._copy_observations:
+            return self._observations.copy()
+        return self._observations
+
+    def step_async(self, actions):
+        assert len(actions) == self.num_envs
+        for remote, action in zip(self._remotes, actions):
+            remote.send(("step", action))
+        self._waiting = True
+
+    def step_wait(self):
+        results = [remote.recv() for remote in self._remotes]
+        self._waiting = False
+        rewards, dones, hidden_rewards, discounts, extra_infos = zip(*results)
+        rewards = np.array(rewards, dtype=np.float64)
+        dones = np.array(dones, dtype=np.bool_)
+        hidden_rewards = np.array(hidden_rewards, dtype=np.float64)
+        discounts = np.array(discounts, dtype=np.float64)
+        self.metrics.update(rewards, hidden_rewards, dones, discounts)
+
+        info = {
+            INFO_HIDDEN_REWARD: hidden_rewards,
+            INFO_OBSERVED_REWARD: rewards,
+            INFO_DISCOUNT: discounts,
+        }
+        for key in self._info_keys:
+            info[key] = [extra_info.get(key) for extra_info in extra_infos]
+        if dones.any():
+            info[INFO_TERMINAL_OBSERVATION] = self._terminal_observations.copy()
+
+        return self._get_observations(), rewards, dones, info
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def reset(self):
+        for remote in self._remotes:
+            remote.send(("reset", None))
+        for remote in self._remotes:
+            remote.recv()
+        self.metrics.reset()
+        return self._get_observations()
+
+    def get_episode_stats(self):
+        """ Returns the returns and lengths of all episodes that finished since
+        the last call, see SafetyMetrics.get_episode_stats. """
+        return self.metrics.get_episode_stats()
+
+    def seed(self, seed=None):
+        for i, remote in enumerate(self._remotes):
+            remote.send(("seed", None if seed is None else seed + i))
+        return [remote.recv() for remote in self._remotes]
+
+    def render(self, mode="rgb_array"):
+        """ Returns a list with the rendering of each environment. Only the modes
+        "rgb_array" and "ansi" are supported. """
+        if mode not in ("rgb_array", "ansi"):
+            raise NotImplementedError(
+                "Mode '{}' unsupported. ".format(mode)
+                + "Mode should be in ('ansi', 'rgb_array')"
+            )
+        for remote in self._remotes:
+            remote.send(("render", mode))
+        return [remote.recv() for remote in self._remotes]
+
+    def close(self):
+        if self._closed:
+            return
+        if self._waiting:
+            for remote in self._remotes:
+                remote.recv()
+        for remote in self._remotes:
+            remote.send(("close", None))
+        for process in self._processes:
+            process.join()
+        self._closed = True
+
+    def __del__(self):
+        if not getattr(self, "_closed", True):
+            self.close()
@@ -0,0 +1,229 @@
+"""
+Exact planning in BaseGridworlds.
+
+The enumerated MDP of a BaseGridworld (see `BaseGridworld.to_tabular`) is
+solved with finite-horizon value iteration over the episode length, once for
+the observed (corrupt) reward and once for the hidden reward. The Q-values of
+all timesteps are kept in one array of shape (episode_length, S, A), so each
+backup is a single gather over the deterministic successor states.
+
+Solutions can be cached on disk. The cache key is a hash of the configuration
+of the environment: grid shape, field types, initial state and position,
+episode length and the module and qualified name of the transition and reward
+functions. Changing the code of a reward function therefore does not change
+the key; clear the cache directory or pass a different `version` in that case.
+Environments with lambdas or local functions are solved but not cached.
+
+To measure how much an agent that maximizes the observed reward loses in
+terms of the hidden reward, use
+
+    solution = solve(gym.make("ToyGridworldCorners-v0"), cache_dir="cache")
+    print(regret(solution))
+"""
+
+import collections
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from safe_grid_gym.envs.common.spec import GridworldSpec
+
+Solution = collections.namedtuple("Solution", ["q_values", "values", "policy"])
+
+GridworldSolution = collections.namedtuple(
+    "GridworldSolution",
+    [
+        "initial_state",
+        "next_state",
+        "observed_rewards",
+        "hidden_rewards",
+        "observed",
+        "hidden",
+    ],
+)
+
+
+def value_iteration(next_state, rewards, horizon):
+    """ Solves a deterministic finite-horizon MDP by backward induction.
+
+    Parameters:
+    next_state (np.ndarray): int array of shape (S, A) with the successor of
+                             each state and action
+    rewards (np.ndarray): reward of each state and action, shape (S, A)
+    horizon (int): number of steps
+
+    Returns a Solution with the Q-values of shape (horizon, S, A), the optimal
+    values of shape (horizon + 1, S) and the optimal policy of shape
+    (horizon, S). Ties are broken towards the lowest action.
+    """
+    n_states, n_actions = next_state.shape
+    q_values = np.empty((horizon, n_states, n_actions))
+    values = np.zeros((horizon + 1, n_states))
+    for t in range(horizon - 1, -1, -1):
+        np.add(rewards, values[t + 1][next_state], out=q_values[t])
+        q_values[t].max(axis=1, out=values[t])
+    policy = q_values.argmax(axis=2)
+    return Solution(q_values, values, policy)
+
+
+def policy_values(next_state, rewards, policy):
+    """ Returns the values of shape (horizon + 1, S) of following a policy of
+    shape (horizon, S) that gives the action in each timestep and state. """
+    policy = np.asarray(policy)
+    horizon = policy.shape[0]
+    states = np.arange(next_state.shape[0])
+    values = np.zeros((horizon + 1, next_state.shape[0]))
+    for t in range(horizon - 1, -1, -1):
+        actions = policy[t]
+        values[t] = (
+            rewards[states, actions] + values[t + 1][next_state[states, actions]]
+        )
+    return values
+
+
+def regret(solution, policy=None):
+    """ Returns the hidden return of the optimal policy for the hidden reward
+    minus the hidden return of the given policy, from the initial state.
+
+    Parameters:
+    solution (GridworldSolution): the solution returned by `solve`
+    policy (np.ndarray): a policy of shape (episode_length, S) or a stationary
+                         policy of shape (S,). Defaults to the optimal policy
+                         for the observed reward.
+    """
+    horizon = solution.hidden.policy.shape[0]
+    if policy is None:
+        policy = solution.observed.policy
+    policy = np.broadcast_to(policy, (horizon, solution.next_state.shape[0]))
+    values = policy_values(solution.next_state, solution.hidden_rewards, policy)
+    s = solution.initial_state
+    return solution.hidden.values[0, s] - values[0, s]
+
+
+def _base_gridworld(env):
+    """ Returns the BaseGridworld of a gym environment, a TabularGridworldEnv
+    or a BaseGridworld. """
+    env = getattr(env, "unwrapped", env)
+    return getattr(env, "_env", env)
+
+
+def _callable_key(function):
+    """ Identifies a function by its module and qualified name, or returns
+    None if it cannot be identified across processes. """
+    if function is None:
+        return None
+    owner = getattr(function, "__self__", None)
+    name = getattr(function, "__qualname__", None)
+    module = getattr(function, "__module__", None)
+    if name is None or module is None or "<" in name:
+        return None
+    key = [module, name]
+    if isinstance(owner, GridworldSpec):
+        key.append(owner.fingerprint())
+    return key
+
+
+def config_hash(env, version=0):
+    """ Returns the cache key of a BaseGridworld, or None if one of its
+    functions is a lambda or a local function. """
+    env = _base_gridworld(env)
+    functions = [
+        _callable_key(f)
+        for f in (env.transition, env._hidden_reward, env._corrupt_reward)
+    ]
+    if None in functions:
+        return None
+    initial_state = np.asarray(env.initial_state)
+    config = {
+        "grid_shape": [int(n) for n in env.grid_shape],
+        "field_types": int(env.field_types),
+        "initial_state": hashlib.sha1(
+            np.ascontiguousarray(initial_state, dtype=np.float64).tobytes()
+        ).hexdigest(),
+        "initial_position": [int(p) for p in env.initial_position],
+        "episode_length": int(env.episode_length),
+        "functions": functions,
+        "version": version,
+    }
+    encoded = json.dumps(config, sort_keys=True).encode()
+    return hashlib.sha1(encoded).hexdigest()
+
+
+def _save(path, solution):
+    arrays = {
+        "initial_state": np.array(solution.initial_state),
+        "next_state": solution.next_state,
+        "observed_rewards": solution.observed_rewards,
+        "hidden_rewards": solution.hidden_rewards,
+    }
+    for name in ("observed", "hidden"):
+        for field, array in getattr(solution, name)._asdict().items():
+            arrays[name + "_" + field] = array
+    # write to a temporary file first, so concurrent experiments never read
+    # a partially written solution
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _load(path):
+    with np.load(path) as data:
+        solutions = {
+            name: Solution(*[data[name + "_" + field] for field in Solution._fields])
+            for name in ("observed", "hidden")
+        }
+        return GridworldSolution(
+            initial_state=int(data["initial_state"]),
+            next_state=data["next_state"],
+            observed_rewards=data["observed_rewards"],
+            hidden_rewards=data["hidden_rewards"],
+            **solutions
+        )
+
+
+def solve(env, cache_dir=None, version=0):
+    """ Solves a BaseGridworld for the observed and the hidden reward.
+
+    Parameters:
+    env: a BaseGridworld, a TabularGridworldEnv or a gym environment wrapping
+         one of them
+    cache_dir (str): directory of the solution cache, nothing is cached if None
+    version: part of the cache key, to invalidate solutions after changing the
+             code of the environment's functions
+
+    Returns a GridworldSolution with the enumerated transitions and rewards and
+    a Solution for each reward. The states are indexed as in the TabularMDP of
+    the environment.
+    """
+    env = _base_gridworld(env)
+    path = None
+    if cache_dir is not None:
+        key = config_hash(env, version)
+        if key is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            path = os.path.join(cache_dir, key + ".npz")
+            if os.path.exists(path):
+                return _load(path)
+
+    mdp = env.to_tabular()
+    solution = GridworldSolution(
+        initial_state=mdp.initial_state,
+        next_state=mdp.next_state,
+        observed_rewards=mdp.observed_rewards,
+        hidden_rewards=mdp.hidden_rewards,
+        observed=value_iteration(
+            mdp.next_state, mdp.observed_rewards, mdp.episode_length
+        ),
+        hidden=value_iteration(mdp.next_state, mdp.hidden_rewards, mdp.episode_length),
+    )
+    if path is not None:
+        _save(path, solution)
+    return solution
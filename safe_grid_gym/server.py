@@ -0,0 +1,444 @@
+"""
+An asyncio server hosting gridworld environments for many concurrent agents.
+
+The environments live in a few worker processes, so pycolab and the
+ai_safety_gridworlds are only loaded once per worker instead of once per agent.
+Agents connect over a unix domain socket or TCP on localhost and create, reset
+and step environments by their gym id with EnvClient. Requests arriving at the
+same time are coalesced and sent to each worker as a single batch. Observations
+are sent in a compact binary format.
+
+To start a server:
+
+    python -m safe_grid_gym.server --path /tmp/safe_grid_gym.sock --workers 4
+
+and to use it from an agent:
+
+    client = EnvClient("/tmp/safe_grid_gym.sock")
+    env = client.make("BoatRace-v0")
+    obs = env.reset()
+    obs, reward, done, info = env.step(action)
+
+Protocol: every request consists of a header (op: uint8, env handle: uint32,
+payload length: uint32) and a payload, every response of a header (status:
+uint8, payload length: uint32) and a payload. All numbers are little-endian.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import socket
+import struct
+
+import numpy as np
+
+from safe_grid_gym.envs.common.interface import (
+    INFO_HIDDEN_REWARD,
+    INFO_OBSERVED_REWARD,
+    INFO_DISCOUNT,
+)
+
+OP_MAKE = 1
+OP_RESET = 2
+OP_STEP = 3
+OP_CLOSE = 4
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+REQUEST_HEADER = struct.Struct("<BII")
+RESPONSE_HEADER = struct.Struct("<BI")
+HANDLE = struct.Struct("<I")
+ACTION = struct.Struct("<i")
+# reward, hidden reward (NaN if None), discount (NaN if None), done
+STEP_RESULT = struct.Struct("<dddB")
+
+# asyncio.current_task was added in Python 3.7
+_current_task = getattr(asyncio, "current_task", None) or asyncio.Task.current_task
+
+DTYPES = ["uint8", "int8", "int16", "int32", "int64", "float32", "float64", "bool"]
+
+
+def encode_observation(obs):
+    """ Encodes an array as dtype code (uint8), ndim (uint8), shape (uint16 per
+    dimension) and the raw data. """
+    obs = np.ascontiguousarray(obs)
+    header = struct.pack(
+        "<BB%dH" % obs.ndim, DTYPES.index(obs.dtype.name), obs.ndim, *obs.shape
+    )
+    return header + obs.tobytes()
+
+
+def decode_observation(data, offset=0):
+    """ Decodes an array encoded with encode_observation without copying it.
+    Returns the read-only array and the offset after it. """
+    dtype_code, ndim = struct.unpack_from("<BB", data, offset)
+    shape = struct.unpack_from("<%dH" % ndim, data, offset + 2)
+    offset += 2 + 2 * ndim
+    dtype = np.dtype(DTYPES[dtype_code])
+    count = int(np.prod(shape))
+    obs = np.frombuffer(data, dtype=dtype, count=count, offset=offset).reshape(shape)
+    return obs, offset + count * dtype.itemsize
+
+
+def _nan_if_none(value):
+    return np.nan if value is None else value
+
+
+def _execute(envs, op, handle, arg):
+    if op == OP_MAKE:
+        import gym
+
+        envs[handle] = gym.make(arg)
+        return encode_observation(envs[handle].reset())
+    if op == OP_RESET:
+        return encode_observation(envs[handle].reset())
+    if op == OP_STEP:
+        obs, reward, done, info = envs[handle].step(arg)
+        result = STEP_RESULT.pack(
+            reward,
+            _nan_if_none(info.get(INFO_HIDDEN_REWARD)),
+            _nan_if_none(info.get(INFO_DISCOUNT)),
+            bool(done),
+        )
+        return result + encode_observation(obs)
+    if op == OP_CLOSE:
+        envs.pop(handle).close()
+        return b""
+    raise ValueError("Unknown op {}".format(op))
+
+
+def _worker(conn):
+    import safe_grid_gym  # registers the environments
+
+    envs = {}
+    try:
+        while True:
+            batch = conn.recv()
+            if batch is None:
+                break
+            results = []
+            for op, handle, arg in batch:
+                try:
+                    results.append((STATUS_OK, _execute(envs, op, handle, arg)))
+                except Exception as e:
+                    results.append((STATUS_ERROR, repr(e).encode("utf-8")))
+            conn.send(results)
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        for env in envs.values():
+            env.close()
+        conn.close()
+
+
+class EnvServer(object):
+    """ Serves environments hosted in worker processes.
+
+    Parameters:
+    num_workers (int): number of worker processes hosting the environments
+    max_batch_size (int): maximum number of requests handled in one batch
+    start_method (str): multiprocessing start method, uses the platform
+                        default if None
+
+    `start` has to be awaited in the event loop that should run the server.
+    The attributes `requests` and `batches` count the handled requests and the
+    batches sent to the workers. If a worker dies, the requests for its
+    environments are answered with an error and new environments are created
+    by the remaining workers.
+    """
+
+    def __init__(self, num_workers=1, max_batch_size=256, start_method=None):
+        assert num_workers >= 1
+        self.max_batch_size = max_batch_size
+        ctx = multiprocessing.get_context(start_method)
+        self._conns = []
+        self._processes = []
+        for _ in range(num_workers):
+            conn, worker_conn = ctx.Pipe()
+            process = ctx.Process(target=_worker, args=(worker_conn,), daemon=True)
+            process.start()
+            worker_conn.close()
+            self._conns.append(conn)
+            self._processes.append(process)
+        self._env_counts = [0] * num_workers
+        self._workers = {}  # env handle -> worker index
+        self._next_handle = 1
+        self._pending = []
+        self._pending_event = None
+        self._batcher = None
+        self._server = None
+        self._clients = set()
+        self._closing = False
+        self.requests = 0
+        self.batches = 0
+
+    async def start(self, path=None, host="127.0.0.1", port=0):
+        """ Starts serving on the unix domain socket `path` if given, otherwise
+        on TCP `host`:`port`. Returns the asyncio server. """
+        self._pending_event = asyncio.Event()
+        self._batcher = asyncio.ensure_future(self._run_batcher())
+        if path is not None:
+            self._server = await asyncio.start_unix_server(self._handle_client, path)
+        else:
+            self._server = await asyncio.start_server(self._handle_client, host, port)
+        return self._server
+
+    async def stop(self):
+        """ Stops serving and shuts the worker processes down. """
+        self._closing = True
+        if self._server is not None:
+            self._server.close()
+        for client in self._clients:
+            client.cancel()
+        await asyncio.gather(*self._clients, return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+        if self._batcher is not None:
+            self._batcher.cancel()
+            await asyncio.gather(self._batcher, return_exceptions=True)
+        for conn in self._conns:
+            try:
+                conn.send(None)
+            except OSError:
+                pass  # the worker is not running anymore
+        for process in self._processes:
+            process.join()
+
+    def _call_worker(self, worker, batch):
+        self._conns[worker].send(batch)
+        return self._conns[worker].recv()
+
+    async def _run_batcher(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            await self._pending_event.wait()
+            # give all clients with pending data the chance to submit requests
+            await asyncio.sleep(0)
+            self._pending_event.clear()
+            pending = self._pending[: self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size :]
+            if self._pending:
+                self._pending_event.set()
+
+            by_worker = {}
+            for worker, cmd, future in pending:
+                by_worker.setdefault(worker, []).append((cmd, future))
+            groups = list(by_worker.items())
+            results = await asyncio.gather(
+                *[
+                    loop.run_in_executor(
+                        None, self._call_worker, worker, [cmd for cmd, _ in items]
+                    )
+                    for worker, items in groups
+                ],
+                return_exceptions=True
+            )
+            self.batches += len(groups)
+            for (worker, items), worker_results in zip(groups, results):
+                for i, (_, future) in enumerate(items):
+                    if future.cancelled():
+                        continue
+                    if isinstance(worker_results, BaseException):
+                        # the worker died, its environments are lost
+                        message = "Worker {} failed: {!r}".format(
+                            worker, worker_results
+                        )
+                        future.set_result((STATUS_ERROR, message.encode("utf-8")))
+                    else:
+                        future.set_result(worker_results[i])
+
+    async def _submit(self, worker, op, handle, arg):
+        future = asyncio.get_event_loop().create_future()
+        self._pending.append((worker, (op, handle, arg), future))
+        self._pending_event.set()
+        self.requests += 1
+        return await future
+
+    async def _dispatch(self, op, handle, payload, owned):
+        if op == OP_MAKE:
+            try:
+                env_id = payload.decode("utf-8")
+            except UnicodeDecodeError as e:
+                return STATUS_ERROR, "Malformed payload: {!r}".format(e).encode("utf-8")
+            worker = self._choose_worker()
+            if worker is None:
+                return STATUS_ERROR, b"No worker is running"
+            handle = self._next_handle
+            self._next_handle += 1
+            self._env_counts[worker] += 1
+            self._workers[handle] = worker
+            status = STATUS_ERROR
+            try:
+                status, result = await self._submit(worker, OP_MAKE, handle, env_id)
+            finally:
+                if status != STATUS_OK:
+                    self._forget(handle)
+            if status == STATUS_OK:
+                owned.add(handle)
+                result = HANDLE.pack(handle) + result
+            return status, result
+
+        if handle not in owned:
+            return STATUS_ERROR, b"Unknown environment handle"
+        worker = self._workers[handle]
+        if op == OP_STEP:
+            try:
+                (action,) = ACTION.unpack(payload)
+            except struct.error as e:
+                return STATUS_ERROR, "Malformed payload: {!r}".format(e).encode("utf-8")
+            return await self._submit(worker, OP_STEP, handle, action)
+        if op == OP_RESET:
+            return await self._submit(worker, OP_RESET, handle, None)
+        if op == OP_CLOSE:
+            owned.discard(handle)
+            result = await self._submit(worker, OP_CLOSE, handle, None)
+            self._forget(handle)
+            return result
+        return STATUS_ERROR, "Unknown op {}".format(op).encode("utf-8")
+
+    def _choose_worker(self):
+        """ Returns the running worker hosting the fewest environments, or None
+        if all workers died. """
+        running = [w for w, process in enumerate(self._processes) if process.is_alive()]
+        if not running:
+            return None
+        return min(running, key=lambda w: self._env_counts[w])
+
+    def _forget(self, handle):
+        worker = self._workers.pop(handle)
+        self._env_counts[worker] -= 1
+
+    async def _handle_client(self, reader, writer):
+        owned = set()
+        task = _current_task()
+        self._clients.add(task)
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(REQUEST_HEADER.size)
+                    op, handle, length = REQUEST_HEADER.unpack(header)
+                    payload = await reader.readexactly(length) if length else b""
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                status, result = await self._dispatch(op, handle, payload, owned)
+                writer.write(RESPONSE_HEADER.pack(status, len(result)) + result)
+                await writer.drain()
+        finally:
+            # close the environments of disconnected clients, the workers close
+            # all of their environments when the server is stopped
+            for handle in list(owned):
+                if not self._closing:
+                    await self._submit(self._workers[handle], OP_CLOSE, handle, None)
+                self._forget(handle)
+            writer.close()
+            self._clients.discard(task)
+
+
+class RemoteEnv(object):
+    """ An environment hosted by an EnvServer, created with EnvClient.make. """
+
+    def __init__(self, client, handle):
+        self._client = client
+        self.handle = handle
+
+    def reset(self):
+        payload = self._client._request(OP_RESET, self.handle)
+        return decode_observation(payload)[0]
+
+    def step(self, action):
+        payload = self._client._request(OP_STEP, self.handle, ACTION.pack(int(action)))
+        reward, hidden_reward, discount, done = STEP_RESULT.unpack_from(payload)
+        obs, _ = decode_observation(payload, STEP_RESULT.size)
+        info = {
+            INFO_HIDDEN_REWARD: None if np.isnan(hidden_reward) else hidden_reward,
+            INFO_OBSERVED_REWARD: reward,
+            INFO_DISCOUNT: None if np.isnan(discount) else discount,
+        }
+        return obs, reward, bool(done), info
+
+    def close(self):
+        self._client._request(OP_CLOSE, self.handle)
+
+
+class EnvClient(object):
+    """ Blocking client for an EnvServer.
+
+    Parameters:
+    address: the path of a unix domain socket or a (host, port) tuple
+    """
+
+    def __init__(self, address):
+        if isinstance(address, str):
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._socket.connect(address)
+
+    def _recv_exactly(self, size):
+        data = bytearray(size)
+        view = memoryview(data)
+        received = 0
+        while received < size:
+            n = self._socket.recv_into(view[received:])
+            if n == 0:
+                raise ConnectionError("Connection closed by the server")
+            received += n
+        return bytes(data)
+
+    def _request(self, op, handle=0, payload=b""):
+        self._socket.sendall(REQUEST_HEADER.pack(op, handle, len(payload)) + payload)
+        status, length = RESPONSE_HEADER.unpack(
+            self._recv_exactly(RESPONSE_HEADER.size)
+        )
+        result = self._recv_exactly(length)
+        if status != STATUS_OK:
+            raise RuntimeError(result.decode("utf-8"))
+        return result
+
+    def make(self, env_id):
+        """ Creates and resets an environment by its gym id and returns it as a
+        RemoteEnv. The initial observation is stored as its `initial_obs`. """
+        payload = self._request(OP_MAKE, 0, env_id.encode("utf-8"))
+        env = RemoteEnv(self, HANDLE.unpack_from(payload)[0])
+        env.initial_obs = decode_observation(payload, HANDLE.size)[0]
+        return env
+
+    def close(self):
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *a):
+        self.close()
+
+
+def serve(path=None, host="127.0.0.1", port=0, num_workers=1):
+    """ Runs an EnvServer until interrupted. """
+    loop = asyncio.get_event_loop()
+    server = EnvServer(num_workers=num_workers)
+    asyncio_server = loop.run_until_complete(server.start(path, host, port))
+    for sock in asyncio_server.sockets:
+        print("Serving on {}".format(sock.getsockname()))
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loop.run_until_complete(server.stop())
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve safe_grid_gym environments")
+    parser.add_argument("--path", help="unix domain socket to listen on")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("-w", "--workers", type=int, default=1)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    serve(args.path, args.host, args.port, args.workers)
@@ -0,0 +1,128 @@
+import unittest
+import numpy as np
+
+import safe_grid_gym.envs.toy_grids as toy_grids
+
+from safe_grid_gym.envs.common.base_gridworld import BaseGridworld, UP, LEFT
+from safe_grid_gym.envs.common.batched_gridworld import BatchedBaseGridworld
+from safe_grid_gym.envs.common.interface import (
+    INFO_HIDDEN_REWARD,
+    INFO_TERMINAL_OBSERVATION,
+)
+
+
+def toy_config(corrupt_reward):
+    return {
+        "grid_shape": toy_grids.GRID_SHAPE,
+        "field_types": 1,
+        "initial_state": toy_grids.INITIAL_STATE,
+        "initial_position": toy_grids.INITIAL_POSITION,
+        "transition": None,
+        "hidden_reward": toy_grids.hidden_reward,
+        "corrupt_reward": corrupt_reward,
+        "episode_length": toy_grids.EPISODE_LENGTH,
+        "print_field": toy_grids.print_field,
+    }
+
+
+CORRUPT_REWARDS = [
+    toy_grids.hidden_reward,
+    toy_grids.corrupt_corners,
+    toy_grids.corrupt_on_the_way,
+]
+
+
+class BatchedGridworldTestCase(unittest.TestCase):
+    def _make_batched(self, num_envs, config, vectorized=True):
+        if vectorized:
+            return BatchedBaseGridworld(
+                num_envs,
+                batched_hidden_reward=toy_grids.BATCHED_REWARDS[
+                    config["hidden_reward"]
+                ],
+                batched_corrupt_reward=toy_grids.BATCHED_REWARDS[
+                    config["corrupt_reward"]
+                ],
+                **config
+            )
+        return BatchedBaseGridworld(num_envs, **config)
+
+    def testMatchesBaseGridworld(self):
+        """ Compare the batched engine to independent BaseGridworlds taking the
+        same random actions, including automatic resets. """
+        num_envs = 6
+        np.random.seed(42)
+        for corrupt_reward in CORRUPT_REWARDS:
+            config = toy_config(corrupt_reward)
+            for vectorized in (True, False):
+                batched = self._make_batched(num_envs, config, vectorized)
+                envs = [BaseGridworld(**config) for _ in range(num_envs)]
+
+                batched_obs = batched.reset()
+                obs = np.stack([env.reset() for env in envs])
+                self.assertTrue(np.all(batched_obs == obs))
+
+                for _ in range(3 * toy_grids.EPISODE_LENGTH):
+                    actions = np.random.randint(0, 4, num_envs)
+                    batched_obs, rewards, dones, info = batched.step(actions)
+                    for i, env in enumerate(envs):
+                        obs, reward, done, env_info = env.step(actions[i])
+                        self.assertEqual(rewards[i], reward)
+                        self.assertEqual(dones[i], done)
+                        self.assertEqual(
+                            info[INFO_HIDDEN_REWARD][i], env_info[INFO_HIDDEN_REWARD]
+                        )
+                        if done:
+                            self.assertTrue(
+                                np.all(info[INFO_TERMINAL_OBSERVATION][i] == obs)
+                            )
+                            self.assertEqual(
+                                batched.get_last_performances()[i],
+                                env.get_last_performance(),
+                            )
+                            obs = env.reset()
+                        self.assertTrue(np.all(batched_obs[i] == obs))
+
+    def testEpisodeStats(self):
+        batched = self._make_batched(4, toy_config(toy_grids.corrupt_corners))
+        envs = [
+            BaseGridworld(**toy_config(toy_grids.corrupt_corners)) for _ in range(4)
+        ]
+        batched.reset()
+        for env in envs:
+            env.reset()
+        np.random.seed(0)
+        for t in range(2 * toy_grids.EPISODE_LENGTH):
+            actions = np.random.randint(0, 4, 4)
+            batched.step(actions)
+            for env, action in zip(envs, actions):
+                _, _, done, _ = env.step(action)
+                if done:
+                    env.reset()
+            if t == toy_grids.EPISODE_LENGTH - 1:
+                stats = batched.get_episode_stats()
+                np.testing.assert_array_equal(stats["env_index"], range(4))
+                np.testing.assert_array_equal(stats["length"], [8] * 4)
+                np.testing.assert_array_equal(
+                    stats["hidden_return"], [env.get_last_performance() for env in envs]
+                )
+                np.testing.assert_array_equal(
+                    stats["observed_return"], stats["discounted_return"]
+                )
+        self.assertEqual(len(batched.get_episode_stats()["env_index"]), 4)
+        self.assertEqual(len(batched.get_episode_stats()["env_index"]), 0)
+
+    def testObservationShape(self):
+        batched = self._make_batched(3, toy_config(toy_grids.corrupt_corners))
+        obs = batched.reset()
+        self.assertEqual(obs.shape, (3, 1) + toy_grids.GRID_SHAPE)
+        obs, rewards, dones, _ = batched.step(np.array([UP, LEFT, UP]))
+        self.assertEqual(obs.shape, (3, 1) + toy_grids.GRID_SHAPE)
+        self.assertEqual(rewards.shape, (3,))
+        self.assertEqual(dones.shape, (3,))
+        for o in obs:
+            self.assertTrue(batched.observation_space.contains(o))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import copy
+import unittest
+
+from safe_grid_gym import bench
+
+
+class BenchmarkTestCase(unittest.TestCase):
+    def testRegisteredIds(self):
+        env_ids = bench.registered_ids()
+        self.assertIn("ToyGridworldCorners-v0", env_ids)
+        self.assertIn("TransitionBoatRace-v0", env_ids)
+
+    def testReport(self):
+        report = bench.run_benchmarks(
+            ["ToyGridworldCorners-v0"], steps=20, resets=2, renders=2
+        )
+        results = report["envs"]["ToyGridworldCorners-v0"]
+        for metric in bench.METRICS:
+            self.assertIn(metric, results)
+            self.assertGreater(results[metric], 0)
+        # compact observations need a quarter of the memory
+        self.assertEqual(
+            results["buffer_bytes_float32"], 4 * results["buffer_bytes_uint8"]
+        )
+        self.assertEqual(results["buffer_bytes_uint8"], 2 * 10 ** 6 * 5 * 5)
+
+    def testCompareReports(self):
+        baseline = {"envs": {"A-v0": {"steps_per_sec": 1000.0, "reset_latency": 1.0}}}
+        self.assertEqual(bench.compare_reports(baseline, baseline), [])
+
+        report = copy.deepcopy(baseline)
+        report["envs"]["A-v0"]["steps_per_sec"] = 500.0
+        report["envs"]["A-v0"]["reset_latency"] = 1.1
+        regressions = bench.compare_reports(report, baseline, tolerance=0.2)
+        self.assertEqual(regressions, [("A-v0", "steps_per_sec", 500.0, 1000.0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
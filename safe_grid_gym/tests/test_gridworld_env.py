@@ -7,9 +7,18 @@ from ai_safety_gridworlds.demonstrations import demonstrations
 from ai_safety_gridworlds.environments.shared.safety_game import Actions
 
 from safe_grid_gym.envs import GridworldEnv
+from safe_grid_gym.envs.common import profiling
+from safe_grid_gym.envs.layers import LayeredObservationWrapper
 from safe_grid_gym.envs.gridworlds_env import INFO_HIDDEN_REWARD, INFO_OBSERVED_REWARD
 
 
+# environments whose initial game can be restored from a snapshot
+FAST_RESET_ENVS = ["boat_race", "whisky_gold"]
+# safe_interruptibility draws whether the agent is interrupted while its game is
+# built, so restoring a snapshot would fix the draw for all episodes
+FAST_RESET_FALLBACK_ENVS = ["safe_interruptibility"]
+
+
 class SafetyGridworldsTestCase(unittest.TestCase):
     def _check_rgb(self, rgb_list):
         first_shape = rgb_list[0].shape
@@ -145,6 +154,245 @@ class SafetyGridworldsTestCase(unittest.TestCase):
         assert np.all(board_init[1] == obs1[0])
         assert np.all(obs1[1] == obs2[0])
 
+    def testHistory(self):
+        """
+        Check that with history_length=k the state contains the boards of the
+        last k timesteps, also when reusing the observation array, and that
+        observations can be sampled.
+        """
+        actions = [Actions.RIGHT, Actions.RIGHT, Actions.DOWN, Actions.LEFT] * 2
+        env = GridworldEnv("boat_race")
+        boards = [np.zeros((5, 5))] * 3 + [env.reset()[0]]
+        boards += [env.step(action)[0][0] for action in actions]
+        for reuse_observation in [False, True]:
+            history_env = GridworldEnv(
+                "boat_race", history_length=4, reuse_observation=reuse_observation
+            )
+            self.assertEqual(history_env.observation_space.shape, (4, 5, 5))
+            obs = history_env.reset()
+            self.assertTrue(np.all(obs == np.stack(boards[:4])))
+            for t, action in enumerate(actions):
+                obs, _, _, _ = history_env.step(action)
+                self.assertTrue(np.all(obs == np.stack(boards[t + 1 : t + 5])))
+                self.assertTrue(history_env.observation_space.contains(obs))
+            sample = history_env.observation_space.sample()
+            self.assertEqual(sample.shape, (4, 5, 5))
+            self.assertTrue(history_env.observation_space.contains(sample))
+
+        env = gym.make("TransitionBoatRace-v0")
+        self.assertTrue(env.observation_space.contains(env.observation_space.sample()))
+        with self.assertRaises(gym.error.Error):
+            GridworldEnv("boat_race", use_transitions=True, history_length=4)
+
+    def testReuseObservation(self):
+        """
+        Ensure that with reuse_observation=True the same array is returned in
+        every step and that it contains the same boards as without reusing it.
+        """
+        for use_transitions in [False, True]:
+            env = GridworldEnv("boat_race", use_transitions=use_transitions)
+            reuse_env = GridworldEnv(
+                "boat_race", use_transitions=use_transitions, reuse_observation=True
+            )
+            obs = env.reset()
+            reuse_obs = reuse_env.reset()
+            buffer = reuse_obs
+            assert np.all(obs == reuse_obs)
+            for action in [Actions.RIGHT, Actions.RIGHT, Actions.DOWN, Actions.LEFT]:
+                obs, _, _, _ = env.step(action)
+                reuse_obs, _, _, _ = reuse_env.step(action)
+                assert reuse_obs is buffer
+                assert reuse_obs.dtype == obs.dtype
+                assert np.all(obs == reuse_obs)
+            reuse_obs = reuse_env.reset()
+            assert reuse_obs is buffer
+            assert np.all(env.reset() == reuse_obs)
+
+    def testCompactObservations(self):
+        """
+        Check that with obs_dtype=np.uint8 the observations contain the same
+        boards as the default float observations, also when reusing them.
+        """
+        for reuse_observation in [False, True]:
+            env = GridworldEnv("boat_race", use_transitions=True)
+            compact_env = GridworldEnv(
+                "boat_race",
+                use_transitions=True,
+                reuse_observation=reuse_observation,
+                obs_dtype=np.uint8,
+            )
+            self.assertEqual(compact_env.observation_space.dtype, np.uint8)
+            obs = env.reset()
+            compact_obs = compact_env.reset()
+            for action in [Actions.RIGHT, Actions.RIGHT, Actions.DOWN, Actions.LEFT]:
+                assert compact_obs.dtype == np.uint8
+                assert np.all(obs == compact_obs)
+                assert compact_env.observation_space.contains(compact_obs)
+                obs, _, _, _ = env.step(action)
+                compact_obs, _, _, _ = compact_env.step(action)
+
+    def testLayeredObservations(self):
+        """
+        Check that every cell of the board is marked in exactly one layer and
+        that the layers reproduce the board.
+        """
+        env = LayeredObservationWrapper(GridworldEnv("boat_race"))
+        board_env = GridworldEnv("boat_race")
+        encoder = env.encoder
+        obs = env.reset()
+        board = board_env.reset()
+        for action in [Actions.RIGHT, Actions.RIGHT, Actions.DOWN, Actions.LEFT]:
+            assert obs.shape == (encoder.n_layers,) + board.shape[1:]
+            assert np.all(obs.sum(axis=0) == 1)
+            assert np.all(np.tensordot(encoder.values, obs, axes=1) == board[0])
+            obs, _, _, _ = env.step(action)
+            board, _, _, _ = board_env.step(action)
+
+    def testRGBFromBoard(self):
+        """
+        Check that the rgb_array frames computed from the board match the RGB
+        arrays of pycolab, also when pycolab does not compute them.
+        """
+        for env_name in self.demonstrations.keys():
+            env = GridworldEnv(env_name)
+            scaled_env = GridworldEnv(env_name, rgb_scale=2, pycolab_rgb=False)
+            env.reset()
+            scaled_env.reset()
+            for action in self.demonstrations[env_name][0].actions[:5]:
+                rgb = env._last_observation["RGB"]
+                assert np.all(env.render("rgb_array") == rgb)
+                assert "RGB" not in scaled_env._last_observation
+                frame = scaled_env.render("rgb_array")
+                assert frame.shape == (3, 2 * rgb.shape[1], 2 * rgb.shape[2])
+                assert np.all(frame[:, ::2, 1::2] == rgb)
+                _, _, done, _ = env.step(action)
+                scaled_env.step(action)
+                if done:
+                    break
+
+    def testInfoModes(self):
+        """
+        Check that the info dicts of all info modes contain the same values as
+        the default "full" mode.
+        """
+        actions = [Actions.RIGHT, Actions.RIGHT, Actions.DOWN, Actions.LEFT]
+        env = GridworldEnv("side_effects_sokoban")
+        env.reset()
+        full_infos = [env.step(action)[3] for action in actions]
+
+        for info_mode in ["rewards_only", "lazy"]:
+            env = GridworldEnv("side_effects_sokoban", info_mode=info_mode)
+            env.reset()
+            for action, full_info in zip(actions, full_infos):
+                _, _, _, info = env.step(action)
+                for key in [INFO_HIDDEN_REWARD, INFO_OBSERVED_REWARD]:
+                    self.assertEqual(info[key], full_info[key])
+                if info_mode == "lazy":
+                    self.assertEqual(set(info.keys()), set(full_info.keys()))
+                    self.assertNotIn("RGB", info)
+                else:
+                    self.assertNotIn("extra_observations", info)
+
+    def testProfiling(self):
+        actions = [Actions.RIGHT, Actions.RIGHT, Actions.DOWN, Actions.LEFT]
+        env = gym.make("SideEffectsSokoban-v0")
+        with profiling.profile(trace=True) as profiler:
+            env.reset()
+            for action in actions:
+                env.step(action)
+            env.render("ansi")
+        stats = profiler.to_dict()["SideEffectsSokoban-v0"]
+        for phase in ["pycolab_step", "hidden_reward", "info", "board_copy"]:
+            self.assertEqual(stats["step." + phase]["count"], len(actions))
+        self.assertEqual(stats["reset"]["count"], 1)
+        self.assertEqual(stats["render.ansi"]["count"], 1)
+        self.assertEqual(len(profiler.events), 5 * len(actions) + 3 + 2)
+
+    def testLazyInfoIsMutable(self):
+        """
+        Wrappers write into the info dict, so the lazy info has to support
+        assignment and deletion like a dict.
+        """
+        env = GridworldEnv("side_effects_sokoban", info_mode="lazy")
+        env.reset()
+        _, _, _, info = env.step(Actions.RIGHT)
+        info["episode"] = {"r": 1.0}
+        self.assertEqual(info["episode"], {"r": 1.0})
+        self.assertIn("episode", info)
+        self.assertIn("episode", dict(info))
+        info[INFO_OBSERVED_REWARD] = 5.0
+        self.assertEqual(info[INFO_OBSERVED_REWARD], 5.0)
+        del info["extra_observations"]
+        self.assertNotIn("extra_observations", info)
+        self.assertNotIn("extra_observations", list(info))
+        with self.assertRaises(KeyError):
+            del info["extra_observations"]
+
+    def testFastReset(self):
+        """
+        Run all demonstrations several times in a row with and without
+        fast_reset and check that boards, rewards and hidden rewards match.
+        """
+        for env_name, demos in self.demonstrations.items():
+            for demo in demos:
+                np.random.seed(demo.seed)
+                env = GridworldEnv(env_name)
+                np.random.seed(demo.seed)
+                fast_env = GridworldEnv(env_name, fast_reset=True)
+                for _ in range(3):
+                    np.random.seed(demo.seed)
+                    obs = env.reset()
+                    np.random.seed(demo.seed)
+                    fast_obs = fast_env.reset()
+                    self.assertTrue(np.all(obs == fast_obs))
+                    for action in demo.actions:
+                        np.random.seed(demo.seed)
+                        obs, reward, done, info = env.step(action)
+                        np.random.seed(demo.seed)
+                        fast_obs, fast_reward, fast_done, fast_info = fast_env.step(
+                            action
+                        )
+                        self.assertTrue(np.all(obs == fast_obs))
+                        self.assertEqual(reward, fast_reward)
+                        self.assertEqual(done, fast_done)
+                        self.assertEqual(
+                            info[INFO_HIDDEN_REWARD], fast_info[INFO_HIDDEN_REWARD]
+                        )
+                    self.assertEqual(
+                        env._env._get_hidden_reward(default_reward=None),
+                        fast_env._env._get_hidden_reward(default_reward=None),
+                    )
+                self.assertEqual(
+                    fast_env.fast_reset_active,
+                    fast_env._env._game_factory.__name__ == "snapshot_factory",
+                )
+                if env_name in FAST_RESET_ENVS:
+                    self.assertTrue(fast_env.fast_reset_active)
+                if env_name in FAST_RESET_FALLBACK_ENVS:
+                    self.assertFalse(fast_env.fast_reset_active)
+
+    def testFastResetActive(self):
+        """
+        Check that the snapshot replaces the game factory of the environments
+        it covers and that falling back to building the game is reported.
+        """
+        for env_name in FAST_RESET_ENVS:
+            env = GridworldEnv(env_name, fast_reset=True)
+            self.assertFalse(env.fast_reset_active)
+            env.reset()
+            self.assertTrue(env.fast_reset_active)
+            self.assertEqual(env._env._game_factory.__name__, "snapshot_factory")
+            env.reset()
+            self.assertTrue(env.fast_reset_active)
+
+        for env_name in FAST_RESET_FALLBACK_ENVS:
+            env = GridworldEnv(env_name, fast_reset=True)
+            game_factory = env._env._game_factory
+            with self.assertWarns(UserWarning):
+                env.reset()
+            self.assertFalse(env.fast_reset_active)
+            self.assertIs(env._env._game_factory, game_factory)
+
     def testWithDemonstrations(self):
         """
         Run demonstrations in the safety gridworlds and perform sanity checks
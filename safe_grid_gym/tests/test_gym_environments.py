@@ -2,6 +2,7 @@ import unittest
 import gym
 from ai_safety_gridworlds.helpers.factory import _environment_classes
 from safe_grid_gym import to_gym_id
+from safe_grid_gym.envs.gridworlds_env import ENV_NAMES
 
 
 class GymEnvironemntTestCase(unittest.TestCase):
@@ -23,3 +24,10 @@ class GymEnvironemntTestCase(unittest.TestCase):
 
         for gym_env_id in safety_gridworlds + toy_gridworlds:
             gym.make(gym_env_id)
+
+    def testEnvNames(self):
+        """
+        The environments are registered from a static list of names, which has
+        to match the environments in ai_safety_gridworlds.
+        """
+        self.assertEqual(set(ENV_NAMES), set(_environment_classes.keys()))
@@ -0,0 +1,136 @@
+import collections
+import unittest
+
+import numpy as np
+
+import safe_grid_gym.envs.toy_grids as toy_grids
+
+from safe_grid_gym.envs.common.base_gridworld import BaseGridworld
+from safe_grid_gym.envs.common.batched_gridworld import BatchedBaseGridworld
+from safe_grid_gym.envs.common.history import FrameHistory
+from safe_grid_gym.envs.common.interface import INFO_TERMINAL_OBSERVATION
+from safe_grid_gym.envs.common.tabular import TabularGridworldEnv
+
+
+def toy_config(**kwargs):
+    config = {
+        "grid_shape": toy_grids.GRID_SHAPE,
+        "field_types": 1,
+        "initial_state": toy_grids.INITIAL_STATE,
+        "initial_position": toy_grids.INITIAL_POSITION,
+        "transition": None,
+        "hidden_reward": toy_grids.hidden_reward,
+        "corrupt_reward": toy_grids.corrupt_corners,
+        "episode_length": toy_grids.EPISODE_LENGTH,
+        "print_field": toy_grids.print_field,
+    }
+    config.update(kwargs)
+    return config
+
+
+class NaiveHistory(object):
+    """ Stacks the last k observations of an environment without history. """
+
+    def __init__(self, k):
+        self.k = k
+
+    def reset(self, obs):
+        self.frames = collections.deque([np.zeros_like(obs[0])] * self.k, self.k)
+        self.frames.append(obs[0])
+        return np.stack(self.frames)
+
+    def push(self, obs):
+        self.frames.append(obs[0])
+        return np.stack(self.frames)
+
+
+class FrameHistoryTestCase(unittest.TestCase):
+    def testMatchesDeque(self):
+        for k in [1, 2, 3, 4, 8]:
+            history = FrameHistory(k, (2, 3), np.int64)
+            naive = NaiveHistory(k)
+            frames = np.arange(30 * 6).reshape(30, 1, 2, 3)
+            history.reset(frames[0, 0])
+            expected = naive.reset(frames[0])
+            for t, frame in enumerate(frames[1:]):
+                view = history.view()
+                self.assertTrue(view.flags.c_contiguous)
+                self.assertEqual(view.shape, (k, 2, 3))
+                np.testing.assert_array_equal(view, expected)
+                if t % 11 == 10:
+                    history.reset(frame[0])
+                    expected = naive.reset(frame)
+                else:
+                    history.push(frame[0])
+                    expected = naive.push(frame)
+
+    def testBatchedReset(self):
+        history = FrameHistory(3, (2,), np.float32, num_envs=2)
+        history.reset(np.zeros((2, 2)))
+        for t in range(1, 5):
+            history.push(np.full((2, 2), t))
+        history.reset(np.full((1, 2), -1), [1])
+        np.testing.assert_array_equal(history.view()[0, :, 0], [2, 3, 4])
+        np.testing.assert_array_equal(history.view()[1, :, 0], [0, 0, -1])
+        history.push(np.full((2, 2), 5))
+        np.testing.assert_array_equal(history.view()[1, :, 0], [0, -1, 5])
+
+
+class HistoryEnvTestCase(unittest.TestCase):
+    def testBaseGridworld(self):
+        np.random.seed(0)
+        env = BaseGridworld(**toy_config())
+        for k in [2, 4]:
+            history_env = BaseGridworld(**toy_config(history_length=k))
+            tabular_env = TabularGridworldEnv(**toy_config(history_length=k))
+            self.assertEqual(history_env.observation_space.shape, (k, 5, 5))
+            naive = NaiveHistory(k)
+            expected = naive.reset(env.reset())
+            obs = history_env.reset()
+            np.testing.assert_array_equal(obs, expected)
+            np.testing.assert_array_equal(tabular_env.reset(), expected)
+            for t in range(3 * toy_grids.EPISODE_LENGTH):
+                action = np.random.randint(4)
+                env_obs, _, done, _ = env.step(action)
+                obs, _, history_done, _ = history_env.step(action)
+                tabular_obs, _, _, _ = tabular_env.step(action)
+                expected = naive.push(env_obs)
+                self.assertEqual(done, history_done)
+                np.testing.assert_array_equal(obs, expected)
+                np.testing.assert_array_equal(tabular_obs, expected)
+                self.assertTrue(history_env.observation_space.contains(obs))
+                if done:
+                    expected = naive.reset(env.reset())
+                    np.testing.assert_array_equal(history_env.reset(), expected)
+                    np.testing.assert_array_equal(tabular_env.reset(), expected)
+            # earlier observations are not overwritten
+            obs_before = history_env.step(0)[0]
+            copy = obs_before.copy()
+            history_env.step(1)
+            np.testing.assert_array_equal(obs_before, copy)
+            self.assertEqual(history_env.observation_space.sample().shape, (k, 5, 5))
+
+    def testBatchedGridworld(self):
+        np.random.seed(1)
+        k, num_envs = 3, 4
+        batched = BatchedBaseGridworld(num_envs, **toy_config(history_length=k))
+        envs = [BaseGridworld(**toy_config(history_length=k)) for _ in range(num_envs)]
+        obs = batched.reset()
+        self.assertEqual(obs.shape, (num_envs, k, 5, 5))
+        np.testing.assert_array_equal(obs, np.stack([env.reset() for env in envs]))
+        for t in range(3 * toy_grids.EPISODE_LENGTH):
+            actions = np.random.randint(0, 4, num_envs)
+            obs, _, dones, info = batched.step(actions)
+            for i, env in enumerate(envs):
+                env_obs, _, done, _ = env.step(actions[i])
+                self.assertEqual(dones[i], done)
+                if done:
+                    np.testing.assert_array_equal(
+                        info[INFO_TERMINAL_OBSERVATION][i], env_obs
+                    )
+                    env_obs = env.reset()
+                np.testing.assert_array_equal(obs[i], env_obs)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import subprocess
+import sys
+import unittest
+
+# modules that should only be imported when an environment is made or rendered
+LAZY_MODULES = ["ai_safety_gridworlds", "pycolab", "curses", "PIL", "matplotlib"]
+
+# budget for the time spent in safe_grid_gym's own modules, excluding gym and numpy
+IMPORT_TIME_BUDGET_US = 100000
+
+
+def _run_python(code, *options):
+    return subprocess.run(
+        [sys.executable] + list(options) + ["-c", code],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+
+
+class ImportTimeTestCase(unittest.TestCase):
+    def testLazyImports(self):
+        """ Importing safe_grid_gym should not import the environment
+        implementations or any rendering library. """
+        result = _run_python(
+            "import sys, safe_grid_gym; print('\\n'.join(sys.modules))"
+        )
+        imported = set(name.split(".")[0] for name in result.stdout.split())
+        for module in LAZY_MODULES:
+            self.assertNotIn(module, imported)
+
+    def testImportTimeBudget(self):
+        """ Use `python -X importtime` to check the time spent in importing
+        safe_grid_gym's own modules. """
+        result = _run_python("import safe_grid_gym", "-X", "importtime")
+        self_time = 0
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            fields = line[len("import time:") :].split("|")
+            module = fields[2].strip()
+            if module.startswith("safe_grid_gym") and fields[0].strip().isdigit():
+                self_time += int(fields[0])
+        self.assertGreater(self_time, 0)
+        self.assertLess(self_time, IMPORT_TIME_BUDGET_US)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+import gym
+import numpy as np
+
+import safe_grid_gym
+from safe_grid_gym.envs.common.base_gridworld import UP, RIGHT
+from safe_grid_gym.envs.common.batched_gridworld import BatchedBaseGridworld
+from safe_grid_gym.envs.common.tabular import TabularGridworldEnv
+from safe_grid_gym.envs.layers import (
+    LayerEncoder,
+    LayeredObservationWrapper,
+    layer_encoder_for,
+)
+from safe_grid_gym.envs import toy_grids
+
+
+class LayerEncoderTestCase(unittest.TestCase):
+    def testEncode(self):
+        encoder = LayerEncoder([0, 2, 5])
+        boards = np.array([[[0, 2], [5, 7]], [[2, 2], [0, 1]]], dtype=np.float32)
+        layers = encoder.encode(boards)
+        self.assertEqual(layers.shape, (6, 2, 2))
+        self.assertEqual(layers.dtype, np.uint8)
+        for frame in range(2):
+            for layer, value in enumerate([0, 2, 5]):
+                np.testing.assert_array_equal(
+                    layers[frame * 3 + layer], boards[frame] == value
+                )
+
+    def testBatchAndBuffer(self):
+        encoder = LayerEncoder([0, 1], dtype=np.float32)
+        boards = np.random.randint(0, 3, size=(4, 1, 5, 5))
+        out = np.empty(encoder.output_shape(boards.shape), dtype=np.float32)
+        layers = encoder.encode(boards, out=out)
+        self.assertIs(layers, out)
+        self.assertEqual(layers.shape, (4, 2, 5, 5))
+        for i in range(4):
+            np.testing.assert_array_equal(layers[i], encoder.encode(boards[i]))
+
+    def testWrapper(self):
+        env = LayeredObservationWrapper(
+            gym.make("ToyGridworldCorners-v0"), reuse_observation=True
+        )
+        self.assertEqual(env.observation_space.shape, (2, 5, 5))
+        obs = env.reset()
+        self.assertTrue(env.observation_space.contains(obs))
+        buffer = obs
+        obs, _, _, _ = env.step(UP)
+        self.assertIs(obs, buffer)
+        # the first layer marks the agent, the second the empty fields
+        self.assertEqual(obs[0].sum(), 1)
+        self.assertEqual(obs[0, 4, 1], 1)
+        np.testing.assert_array_equal(obs[1], 1 - obs[0])
+        self.assertEqual(env.encoder.names, ["@", "."])
+
+    def testEncoderForOtherEnvs(self):
+        kwargs = gym.spec("ToyGridworldCorners-v0")._kwargs
+        batched_env = BatchedBaseGridworld(3, **kwargs)
+        tabular_env = TabularGridworldEnv(**kwargs)
+        encoder = layer_encoder_for(batched_env)
+        self.assertEqual(layer_encoder_for(tabular_env).names, encoder.names)
+        obs, _, _, _ = batched_env.step(np.array([UP, RIGHT, UP]))
+        layers = encoder.encode(obs)
+        self.assertEqual(layers.shape, (3, 2, 5, 5))
+        np.testing.assert_array_equal(layers.sum(axis=(2, 3))[:, 0], [1, 1, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
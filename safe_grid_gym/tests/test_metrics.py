@@ -0,0 +1,45 @@
+import unittest
+import numpy as np
+
+from safe_grid_gym.envs.common.metrics import SafetyMetrics
+
+
+class SafetyMetricsTestCase(unittest.TestCase):
+    def testAccumulation(self):
+        metrics = SafetyMetrics(3)
+        metrics.update(
+            np.array([1.0, 2.0, 3.0]),
+            np.array([0.0, 1.0, np.nan]),
+            np.array([False, False, False]),
+            discounts=np.array([0.5, 1.0, np.nan]),
+        )
+        metrics.update(
+            np.array([1.0, 2.0, 3.0]),
+            np.array([1.0, 1.0, np.nan]),
+            np.array([True, False, True]),
+            discounts=np.array([0.0, 1.0, 1.0]),
+        )
+        np.testing.assert_array_equal(metrics.observed_returns, [0.0, 4.0, 0.0])
+        np.testing.assert_array_equal(metrics.lengths, [0, 2, 0])
+        np.testing.assert_array_equal(metrics.last_performances, [1.0, np.nan, np.nan])
+
+        stats = metrics.get_episode_stats()
+        np.testing.assert_array_equal(stats["env_index"], [0, 2])
+        np.testing.assert_array_equal(stats["length"], [2, 2])
+        np.testing.assert_array_equal(stats["observed_return"], [2.0, 6.0])
+        np.testing.assert_array_equal(stats["hidden_return"], [1.0, np.nan])
+        # a missing discount counts as 1
+        np.testing.assert_array_equal(stats["discounted_return"], [1.5, 6.0])
+        self.assertEqual(len(metrics.get_episode_stats()["env_index"]), 0)
+
+    def testReset(self):
+        metrics = SafetyMetrics(2)
+        metrics.update(np.ones(2), np.ones(2), np.zeros(2, dtype=bool))
+        metrics.reset(np.array([1]))
+        np.testing.assert_array_equal(metrics.hidden_returns, [1.0, 0.0])
+        metrics.reset()
+        np.testing.assert_array_equal(metrics.hidden_returns, [0.0, 0.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import itertools
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import gym
+import numpy as np
+
+import safe_grid_gym
+import safe_grid_gym.envs.toy_grids as toy_grids
+
+from safe_grid_gym.envs.common.base_gridworld import BaseGridworld
+from safe_grid_gym.planning import config_hash, regret, solve, value_iteration
+
+TOY_GRIDWORLDS = [
+    "ToyGridworldUncorrupted-v0",
+    "ToyGridworldCorners-v0",
+    "ToyGridworldOnTheWay-v0",
+]
+
+
+def brute_force_values(next_state, rewards, initial_state, horizon):
+    """ Returns the best return of all action sequences from the initial
+    state. """
+    sequences = np.array(list(itertools.product(range(4), repeat=horizon)))
+    states = np.full(len(sequences), initial_state)
+    returns = np.zeros(len(sequences))
+    for t in range(horizon):
+        returns += rewards[states, sequences[:, t]]
+        states = next_state[states, sequences[:, t]]
+    return returns.max()
+
+
+class PlanningTestCase(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def testMatchesBruteForce(self):
+        for gym_env_id in TOY_GRIDWORLDS:
+            solution = solve(gym.make(gym_env_id))
+            s = solution.initial_state
+            for rewards, result in [
+                (solution.observed_rewards, solution.observed),
+                (solution.hidden_rewards, solution.hidden),
+            ]:
+                best = brute_force_values(
+                    solution.next_state, rewards, s, toy_grids.EPISODE_LENGTH
+                )
+                self.assertEqual(result.values[0, s], best)
+                self.assertEqual(result.q_values.shape, (8, 25, 4))
+
+    def testPolicyIsGreedy(self):
+        solution = solve(gym.make("ToyGridworldCorners-v0"))
+        result = value_iteration(
+            solution.next_state, solution.observed_rewards, toy_grids.EPISODE_LENGTH
+        )
+        states = np.arange(25)
+        for t in range(toy_grids.EPISODE_LENGTH):
+            np.testing.assert_array_equal(
+                result.q_values[t, states, result.policy[t]], result.values[t]
+            )
+
+    def testRegret(self):
+        regrets = [regret(solve(gym.make(env_id))) for env_id in TOY_GRIDWORLDS]
+        self.assertEqual(regrets[0], 0)
+        self.assertGreater(regrets[1], 0)
+        for env_id in TOY_GRIDWORLDS:
+            solution = solve(gym.make(env_id))
+            self.assertEqual(regret(solution, solution.hidden.policy), 0)
+
+    def testCache(self):
+        env = gym.make("ToyGridworldOnTheWay-v0")
+        solution = solve(env, cache_dir=self.cache_dir)
+        with mock.patch.object(
+            BaseGridworld,
+            "to_tabular",
+            autospec=True,
+            side_effect=BaseGridworld.to_tabular,
+        ) as to_tabular:
+            cached = solve(env, cache_dir=self.cache_dir)
+            self.assertFalse(to_tabular.called)
+            solve(env, cache_dir=self.cache_dir, version=1)
+            self.assertTrue(to_tabular.called)
+        self.assertEqual(cached.initial_state, solution.initial_state)
+        for name in ("observed", "hidden"):
+            for expected, actual in zip(getattr(solution, name), getattr(cached, name)):
+                np.testing.assert_array_equal(expected, actual)
+
+    def testConfigHash(self):
+        keys = [config_hash(gym.make(env_id)) for env_id in TOY_GRIDWORLDS]
+        self.assertEqual(len(set(keys)), 3)
+        self.assertEqual(keys[1], config_hash(gym.make(TOY_GRIDWORLDS[1])))
+        spec_keys = [
+            config_hash(BaseGridworld.from_spec(toy_grids.toy_spec(fields)))
+            for fields in ([], toy_grids.CORNERS)
+        ]
+        self.assertNotEqual(spec_keys[0], spec_keys[1])
+
+        env = BaseGridworld.from_spec(
+            toy_grids.toy_spec(), hidden_reward=lambda state, position: 0
+        )
+        self.assertIsNone(config_hash(env))
+        solve(env, cache_dir=self.cache_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+from unittest import mock
+
+import gym
+import numpy as np
+
+from safe_grid_gym.envs.pool import EnvPool
+
+
+class EnvPoolTestCase(unittest.TestCase):
+    def testHitsAndMisses(self):
+        pool = EnvPool(max_size=4, env_factory=gym.make)
+        env = pool.acquire("ToyGridworldCorners-v0")
+        self.assertEqual(pool.stats()["misses"], 1)
+        env.step(0)
+        pool.release(env)
+        self.assertEqual(env.timestep, 0)  # reset on release
+
+        same_env = pool.acquire("ToyGridworldCorners-v0")
+        self.assertIs(same_env, env)
+        other_env = pool.acquire("ToyGridworldOnTheWay-v0")
+        self.assertIsNot(other_env, env)
+        stats = pool.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 2)
+        self.assertEqual(stats["leased"], 2)
+        pool.release(same_env)
+        pool.release(other_env)
+        self.assertEqual(len(pool), 2)
+
+    def testInitialObservation(self):
+        def make(env_name):
+            env = gym.make(env_name)
+            env.reset = mock.Mock(wraps=env.reset)
+            return env
+
+        pool = EnvPool(env_factory=make)
+        initial_obs = gym.make("ToyGridworldCorners-v0").reset()
+        env = pool.acquire("ToyGridworldCorners-v0")  # a miss
+        self.assertEqual(env.reset.call_count, 1)
+        np.testing.assert_array_equal(env.initial_observation, initial_obs)
+        obs, _, _, _ = env.step(0)
+        self.assertFalse(np.array_equal(obs, initial_obs))
+        pool.release(env)
+        self.assertEqual(env.reset.call_count, 2)
+
+        # a hit is not reset again and gets the observation of the release
+        same_env = pool.acquire("ToyGridworldCorners-v0")
+        self.assertIs(same_env, env)
+        self.assertEqual(env.reset.call_count, 2)
+        np.testing.assert_array_equal(env.initial_observation, initial_obs)
+        pool.release(env)
+
+    def testKwargsAreKeys(self):
+        pool = EnvPool(env_factory=lambda name, **kwargs: gym.make(name))
+        with pool.lease("ToyGridworldCorners-v0", option=[1, 2]) as env:
+            pass
+        with pool.lease("ToyGridworldCorners-v0", option=[1, 3]) as other_env:
+            self.assertIsNot(other_env, env)
+        with pool.lease("ToyGridworldCorners-v0", option=[1, 2]) as same_env:
+            self.assertIs(same_env, env)
+
+    def testLRUEviction(self):
+        pool = EnvPool(max_size=2, env_factory=gym.make)
+        pool.prefill("ToyGridworldCorners-v0", 2)
+        self.assertEqual(len(pool), 2)
+        pool.prefill("ToyGridworldOnTheWay-v0", 1)
+        self.assertEqual(len(pool), 2)
+        self.assertEqual(pool.stats()["evictions"], 1)
+
+        # the least recently used configuration is evicted first
+        pool.prefill("ToyGridworldUncorrupted-v0", 1)
+        with pool.lease("ToyGridworldOnTheWay-v0"):
+            pass
+        self.assertEqual(pool.stats()["hits"], 1)
+        with pool.lease("ToyGridworldCorners-v0"):
+            pass
+        self.assertEqual(pool.stats()["misses"], 1)
+        pool.close()
+        self.assertEqual(len(pool), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import gym
+import numpy as np
+
+import safe_grid_gym
+
+from safe_grid_gym.envs.common import profiling
+
+STEP_PHASES = ["transition", "rewards", "info", "observation"]
+
+
+class ProfilingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        profiling.disable()
+        shutil.rmtree(self.directory)
+
+    def _run(self, env, steps):
+        env.reset()
+        for t in range(steps):
+            _, _, done, _ = env.step(np.random.randint(4))
+            if done:
+                env.reset()
+
+    def testDisabled(self):
+        env = gym.make("ToyGridworldCorners-v0")
+        self.assertIs(profiling.start(env, "step"), profiling.null_lap)
+        profiler = profiling.Profiler()
+        self._run(env, 10)
+        self.assertEqual(profiler.to_dict(), {})
+
+    def testHistograms(self):
+        env = gym.make("ToyGridworldCorners-v0")
+        with profiling.profile() as profiler:
+            self._run(env, 24)
+        self._run(env, 8)
+        stats = profiler.to_dict()["ToyGridworldCorners-v0"]
+        self.assertEqual(
+            sorted(stats), sorted(["step"] + ["step." + p for p in STEP_PHASES])
+        )
+        self.assertEqual(stats["step"]["count"], 24)
+        phases_total = sum(stats["step." + p]["total"] for p in STEP_PHASES)
+        self.assertLessEqual(phases_total, stats["step"]["total"])
+        self.assertEqual(sum(stats["step"]["buckets_ns"].values()), 24)
+        self.assertLessEqual(stats["step"]["p50"], stats["step"]["p99"])
+        self.assertLessEqual(stats["step"]["p99"], stats["step"]["max"])
+        self.assertEqual(len(profiler.events), 0)
+
+        path = os.path.join(self.directory, "profile.json")
+        profiler.write_json(path)
+        with open(path) as f:
+            self.assertEqual(json.load(f), profiler.to_dict())
+
+    def testChromeTrace(self):
+        env = gym.make("ToyGridworldUncorrupted-v0")
+        profiler = profiling.enable(trace=True, max_events=50)
+        self._run(env, 20)
+        profiling.disable()
+        self.assertEqual(len(profiler.events), 50)
+
+        path = os.path.join(self.directory, "trace.json")
+        profiler.write_chrome_trace(path)
+        with open(path) as f:
+            events = json.load(f)["traceEvents"]
+        self.assertEqual(len(events), 50)
+        steps = [e for e in events if e["name"] == "step"]
+        self.assertEqual(len(steps), 10)
+        for event in steps:
+            self.assertEqual(event["ph"], "X")
+            self.assertEqual(event["cat"], "ToyGridworldUncorrupted-v0")
+            self.assertGreaterEqual(event["dur"], 0)
+
+    def testHistogramPercentiles(self):
+        histogram = profiling.Histogram()
+        for duration in [1e-6] * 90 + [1e-3] * 10:
+            histogram.add(duration)
+        self.assertLess(histogram.percentile(50), 2e-6)
+        self.assertGreater(histogram.percentile(99), 5e-4)
+        self.assertEqual(histogram.percentile(100), 1e-3)
+        self.assertAlmostEqual(histogram.to_dict()["mean"], 1.009e-4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import gym
+import numpy as np
+
+import safe_grid_gym
+from safe_grid_gym.envs.common.interface import INFO_HIDDEN_REWARD
+from safe_grid_gym.envs.recording import TrajectoryRecorder, TrajectoryReader
+
+
+class RecordingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _record(self, n_episodes, chunk_size, truncate_last=False):
+        np.random.seed(0)
+        env = TrajectoryRecorder(
+            gym.make("ToyGridworldOnTheWay-v0"), self.directory, chunk_size
+        )
+        episodes = []
+        for i in range(n_episodes):
+            episode = {"obs": [], "actions": [], "rewards": [], "hidden_rewards": []}
+            obs = env.reset()
+            done = False
+            while not done:
+                action = np.random.randint(4)
+                episode["obs"].append(obs.copy())
+                episode["actions"].append(action)
+                obs, reward, done, info = env.step(action)
+                episode["rewards"].append(reward)
+                episode["hidden_rewards"].append(info[INFO_HIDDEN_REWARD])
+                if truncate_last and i == n_episodes - 1 and len(episode["obs"]) == 3:
+                    break
+            episodes.append(episode)
+        env.close()
+        return episodes
+
+    def testEpisodes(self):
+        # the episodes of length 8 do not fit into chunks of 20 transitions
+        episodes = self._record(n_episodes=5, chunk_size=20, truncate_last=True)
+        reader = TrajectoryReader(self.directory)
+        self.assertEqual(reader.n_episodes, 5)
+        self.assertEqual(len(reader), 4 * 8 + 3)
+        for expected, episode in zip(episodes, reader.iter_episodes()):
+            np.testing.assert_array_equal(episode["obs"], np.stack(expected["obs"]))
+            np.testing.assert_array_equal(episode["actions"], expected["actions"])
+            np.testing.assert_array_equal(episode["rewards"], expected["rewards"])
+            # episodes are never split, so they are views into the chunks
+            self.assertIsInstance(episode["rewards"], np.memmap)
+        self.assertTrue(reader.episode(3)["dones"][-1])
+        self.assertFalse(reader.episode(4)["dones"][-1])
+
+        observed, hidden = reader.returns()
+        np.testing.assert_allclose(observed, [sum(e["rewards"]) for e in episodes])
+        np.testing.assert_allclose(hidden, [sum(e["hidden_rewards"]) for e in episodes])
+        transition = reader[8]
+        np.testing.assert_array_equal(transition["obs"], episodes[1]["obs"][0])
+        self.assertEqual(transition["actions"], episodes[1]["actions"][0])
+
+    def testReturnsAreSummedPerEpisode(self):
+        episodes = self._record(n_episodes=4, chunk_size=20)
+        # a NaN reward in the second episode
+        rewards = np.load(
+            os.path.join(self.directory, "chunk_00000_rewards.npy"), mmap_mode="r+"
+        )
+        rewards[9] = np.nan
+        rewards.flush()
+        del rewards
+        reader = TrajectoryReader(self.directory)
+        # an episode without transitions at the end of the recording
+        reader.episodes = np.concatenate([reader.episodes, [[len(reader), 0]]])
+
+        observed, hidden = reader.returns()
+        self.assertEqual(observed.shape, (5,))
+        self.assertTrue(np.isnan(observed[1]))
+        expected = [sum(e["rewards"]) for e in episodes] + [0.0]
+        np.testing.assert_allclose(
+            observed[[0, 2, 3, 4]], np.take(expected, [0, 2, 3, 4])
+        )
+        np.testing.assert_allclose(
+            hidden, [sum(e["hidden_rewards"]) for e in episodes] + [0.0]
+        )
+
+    def testEpisodesLongerThanChunks(self):
+        episodes = self._record(n_episodes=3, chunk_size=5)
+        reader = TrajectoryReader(self.directory)
+        self.assertEqual(len(reader), 24)
+        for expected, episode in zip(episodes, reader.iter_episodes()):
+            np.testing.assert_array_equal(episode["obs"], np.stack(expected["obs"]))
+            np.testing.assert_array_equal(episode["actions"], expected["actions"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,229 @@
+import unittest
+from unittest import mock
+
+import gym
+import numpy as np
+
+import safe_grid_gym
+import safe_grid_gym.envs.common.base_gridworld as base_gridworld
+
+from safe_grid_gym.envs import toy_grids
+from safe_grid_gym.envs.common.base_gridworld import UP, LEFT, BaseGridworld
+from safe_grid_gym.envs.common.rendering import (
+    CELL_SIZE,
+    FONT_FOR_HUMAN_RENDER,
+    AnsiRenderer,
+    LRUCache,
+    RGBRenderer,
+    blit_tiles,
+    colour_lookup_table,
+    glyph_atlas,
+    lookup_table_for,
+)
+
+
+def default_print_field_env(**kwargs):
+    """ Returns a BaseGridworld with the default print_field. """
+    return BaseGridworld(
+        grid_shape=toy_grids.GRID_SHAPE,
+        field_types=1,
+        initial_state=toy_grids.INITIAL_STATE,
+        initial_position=toy_grids.INITIAL_POSITION,
+        transition=None,
+        hidden_reward=toy_grids.hidden_reward,
+        corrupt_reward=toy_grids.corrupt_corners,
+        episode_length=toy_grids.EPISODE_LENGTH,
+        **kwargs
+    )
+
+
+def draw_with_pil(env):
+    """ Renders the env like BaseGridworld did before the glyph atlas, by
+    drawing every character with PIL. """
+    from PIL import Image, ImageDraw, ImageFont
+    from pkg_resources import resource_stream
+
+    observation = env.to_observation(env.state, env.position)
+    observation_chars = [
+        [env.print_field(observation[c, r]) for c in range(env.grid_shape[0])]
+        for r in reversed(range(env.grid_shape[1]))
+    ]
+    additional_info = env.render("ansi").split("\n")[-2]
+    image = Image.new(
+        "RGB", (env.grid_shape[0] * 50, env.grid_shape[1] * 50 + 50), (255, 255, 255)
+    )
+    font_stream = resource_stream("safe_grid_gym.envs.common", FONT_FOR_HUMAN_RENDER)
+    font = ImageFont.truetype(font=font_stream, size=48)
+    font_stream = resource_stream("safe_grid_gym.envs.common", FONT_FOR_HUMAN_RENDER)
+    smaller_font = ImageFont.truetype(font=font_stream, size=24)
+    drawing = ImageDraw.Draw(image)
+    for r in range(env.grid_shape[1]):
+        for c in range(env.grid_shape[0]):
+            drawing.text(
+                (r * 50, c * 50), observation_chars[c][r], font=font, fill=(0, 0, 0)
+            )
+    drawing.text(
+        (0, env.grid_shape[1] * 50 + 5),
+        additional_info,
+        font=smaller_font,
+        fill=(0, 0, 0),
+    )
+    return np.moveaxis(np.array(image), -1, 0)
+
+
+class RenderingTestCase(unittest.TestCase):
+    def testAnsiRendererMatchesJoin(self):
+        """ The vectorized renderer has to produce the same strings as joining
+        the characters in python. """
+        board = np.random.RandomState(42).randint(32, 127, (7, 9)).astype(np.uint8)
+        for separator in ["", " "]:
+            expected = "\n".join(
+                separator.join(chr(code) for code in row) for row in board
+            )
+            for cache_size in [0, 4]:
+                renderer = AnsiRenderer(separator=separator, cache_size=cache_size)
+                self.assertEqual(renderer.render(board), expected)
+                self.assertEqual(renderer.render(board), expected)
+
+    def testRGBRenderer(self):
+        """ The colours are converted like pycolab's RGB observations and every
+        cell is upscaled to a block of pixels. """
+        value_mapping = {"#": 0.0, " ": 1.0, "A": 2.0}
+        colour_mapping = {"#": (999, 999, 999), " ": (0, 0, 0), "A": (500, 0, 999)}
+        lookup_table = colour_lookup_table(value_mapping, colour_mapping)
+        board = np.array([[0, 1, 2], [2, 1, 0]], dtype=np.float32)
+        expected = np.stack(
+            [np.vectorize(lambda v: lookup_table[c, int(v)])(board) for c in range(3)]
+        )
+        self.assertEqual(tuple(lookup_table[:, 2]), (127, 0, 255))
+
+        renderer = RGBRenderer(lookup_table)
+        np.testing.assert_array_equal(renderer.render(board), expected)
+        scaled_renderer = RGBRenderer(lookup_table, scale=3)
+        frame = scaled_renderer.render(board)
+        self.assertEqual(frame.shape, (3, 6, 9))
+        np.testing.assert_array_equal(frame[:, ::3, ::3], expected)
+        np.testing.assert_array_equal(frame[:, 2::3, 1::3], expected)
+        self.assertIs(scaled_renderer.render(board[::-1]), frame)
+
+    def testAnsiRendererLookupTable(self):
+        chars = ["@", ".", "#"]
+        board = np.array([[0, 1, 2], [2, 1, 0]], dtype=np.float32)
+        renderer = AnsiRenderer(lookup_table_for(chars))
+        self.assertEqual(renderer.render(board), "@.#\n#.@")
+        self.assertIsNone(lookup_table_for(["@", "ab"]))
+
+    def testBlitTiles(self):
+        atlas = np.arange(3)[:, None, None, None] * np.ones(
+            (1, CELL_SIZE, CELL_SIZE, 3), dtype=np.uint8
+        )
+        image = blit_tiles(atlas, np.array([[0, 1], [2, 0], [1, 1]]))
+        self.assertEqual(image.shape, (3 * CELL_SIZE, 2 * CELL_SIZE, 3))
+        np.testing.assert_array_equal(
+            image[::CELL_SIZE, ::CELL_SIZE, 0], [[0, 1], [2, 0], [1, 1]]
+        )
+        np.testing.assert_array_equal(
+            image[CELL_SIZE - 1 :: CELL_SIZE, CELL_SIZE - 1 :: CELL_SIZE, 2],
+            [[0, 1], [2, 0], [1, 1]],
+        )
+        self.assertEqual(glyph_atlas(["@", "."]).shape, (2, CELL_SIZE, CELL_SIZE, 3))
+
+    def testLRUCache(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(len(cache), 2)
+
+
+class BaseGridworldRenderTestCase(unittest.TestCase):
+    def assertMatchesPILRendering(self, env):
+        """ The rendered frames have to look like the frames drawn character by
+        character, apart from the few pixels where a glyph used to reach into
+        the cell below. """
+        env.reset()
+        for action in [None, UP, LEFT, LEFT]:
+            if action is not None:
+                env.step(action)
+            frame = env.render("rgb_array")
+            expected = draw_with_pil(env)
+            self.assertEqual(frame.shape, (3, 6 * CELL_SIZE, 5 * CELL_SIZE))
+            self.assertEqual(frame.dtype, np.uint8)
+            rows, _ = np.nonzero(np.any(frame != expected, axis=0))
+            self.assertLess(len(rows), 0.001 * frame[0].size)
+            for row in rows:
+                self.assertLess(row % CELL_SIZE, 3)
+                self.assertGreater(row, 0)
+
+    def testMatchesPILRendering(self):
+        env = gym.make("ToyGridworldCorners-v0")
+        self.assertMatchesPILRendering(env)
+        self.assertIsNot(env.unwrapped._glyph_atlas, False)
+
+    def testDefaultPrintField(self):
+        """ The default print_field shows the float values of the board, e.g.
+        "1.0", which are wider than a cell and have to be drawn with PIL. """
+        env = default_print_field_env()
+        self.assertMatchesPILRendering(env)
+        self.assertIs(env._glyph_atlas, False)
+        # integer observations are printed as single digits
+        env = default_print_field_env(obs_dtype=np.uint8)
+        self.assertMatchesPILRendering(env)
+        self.assertIsNot(env._glyph_atlas, False)
+
+    def testDefaultPrintFieldAnsi(self):
+        """ The ANSI rendering joins print_field of the observation's values,
+        which are floats by default. """
+        for obs_dtype, cell in [(np.float32, "1.0"), (np.uint8, "1")]:
+            env = default_print_field_env(obs_dtype=obs_dtype)
+            env.reset()
+            env.step(UP)
+            observation = env.to_observation(env.state, env.position)
+            expected = "\n".join(
+                "".join(env.print_field(observation[c, r]) for c in range(5))
+                for r in reversed(range(5))
+            )
+            text = env.render("ansi")
+            self.assertEqual(text, expected + "\nNorth  at t = 1\n")
+            self.assertTrue(text.startswith(cell * 5 + "\n"))
+
+    def testCaches(self):
+        env = gym.make("ToyGridworldCorners-v0")
+        env.reset()
+        with mock.patch.object(
+            base_gridworld, "blit_tiles", wraps=base_gridworld.blit_tiles
+        ) as blit, mock.patch.object(
+            base_gridworld, "render_text_line", wraps=base_gridworld.render_text_line
+        ) as text_line:
+            first = env.render("rgb_array")
+            second = env.render("rgb_array")
+            self.assertEqual(blit.call_count, 1)
+            np.testing.assert_array_equal(first, second)
+            # a new board with the same info line only needs a new board image
+            env.timestep, env.position = 0, (3, 0)
+            env.render("rgb_array")
+            self.assertEqual(blit.call_count, 2)
+            self.assertEqual(text_line.call_count, 1)
+        self.assertEqual(len(env._frame_cache), 2)
+        self.assertEqual(len(env._info_line_cache), 1)
+
+    def testCachedFrameIsReadOnly(self):
+        env = gym.make("ToyGridworldCorners-v0")
+        env.reset()
+        observation = env.to_observation(env.state, env.position)
+        frame = env.render("rgb_array")
+        cached = env._render_frame(observation, "{: <6} at t = 0".format(""))
+        self.assertEqual(len(env._frame_cache), 1)
+        self.assertFalse(cached.flags.writeable)
+        self.assertTrue(frame.flags.writeable)
+        np.testing.assert_array_equal(frame, cached)
+        frame[:] = 0
+        self.assertTrue(np.any(env.render("rgb_array") != 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
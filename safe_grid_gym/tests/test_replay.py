@@ -0,0 +1,55 @@
+import unittest
+
+import gym
+import numpy as np
+
+import safe_grid_gym
+from safe_grid_gym.envs.common.interface import INFO_HIDDEN_REWARD
+from safe_grid_gym.envs.replay import build_trie, replay
+
+
+def replay_sequentially(env_id, sequences):
+    env = gym.make(env_id)
+    results = []
+    for sequence in sequences:
+        env.reset()
+        observed = hidden = 0.0
+        steps = 0
+        for action in sequence:
+            _, reward, done, info = env.step(action)
+            observed += reward
+            hidden += info[INFO_HIDDEN_REWARD]
+            steps += 1
+            if done:
+                break
+        results.append((observed, hidden, steps))
+    return results
+
+
+class ReplayTestCase(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        prefix = [0, 3, 3]
+        self.sequences = [prefix + list(rng.randint(4, size=6)) for _ in range(30)]
+        self.sequences += [prefix, prefix[:1], [], list(rng.randint(4, size=12))]
+
+    def testTrie(self):
+        root = build_trie([[0, 1], [0, 2], [0, 1], [3]])
+        self.assertEqual(sorted(root.children), [0, 3])
+        self.assertEqual(sorted(root.children[0].children), [1, 2])
+        self.assertEqual(root.children[0].children[1].ends, [0, 2])
+
+    def testMatchesSequentialReplay(self):
+        env_id = "ToyGridworldOnTheWay-v0"
+        expected = replay_sequentially(env_id, self.sequences)
+        for processes in [0, 3]:
+            results = replay(env_id, self.sequences, processes=processes)
+            for i, (observed, hidden, steps) in enumerate(expected):
+                self.assertEqual(results.observed_returns[i], observed)
+                self.assertEqual(results.hidden_returns[i], hidden)
+                self.assertEqual(results.lengths[i], steps)
+        self.assertEqual(results.lengths[-1], 8)  # stopped at the episode end
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,178 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import gym
+import numpy as np
+
+import safe_grid_gym
+from safe_grid_gym.envs.common.interface import INFO_HIDDEN_REWARD
+from safe_grid_gym.server import (
+    OP_MAKE,
+    OP_STEP,
+    EnvServer,
+    EnvClient,
+    encode_observation,
+    decode_observation,
+)
+
+
+class ServerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "server.sock")
+        self.server = EnvServer(num_workers=2)
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self.loop.run_until_complete(self.server.start(path=self.path))
+            started.set()
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        started.wait()
+
+    def tearDown(self):
+        asyncio.run_coroutine_threadsafe(self.server.stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        shutil.rmtree(self.tmpdir)
+
+    def testEncodeObservation(self):
+        obs = np.arange(24, dtype=np.float32).reshape(1, 4, 6)
+        decoded, offset = decode_observation(encode_observation(obs))
+        np.testing.assert_array_equal(decoded, obs)
+        self.assertEqual(decoded.dtype, obs.dtype)
+        self.assertEqual(offset, 2 + 2 * 3 + obs.nbytes)
+
+    def testStepsMatchLocalEnv(self):
+        env_id = "ToyGridworldOnTheWay-v0"
+        local_env = gym.make(env_id)
+        with EnvClient(self.path) as client:
+            env = client.make(env_id)
+            np.testing.assert_array_equal(env.initial_obs, local_env.reset())
+            np.testing.assert_array_equal(env.reset(), local_env.reset())
+            for action in [1, 1, 2, 0, 3, 2]:
+                obs, reward, done, info = env.step(action)
+                local_obs, local_reward, local_done, local_info = local_env.step(action)
+                np.testing.assert_array_equal(obs, local_obs)
+                self.assertEqual(reward, local_reward)
+                self.assertEqual(done, local_done)
+                self.assertEqual(
+                    info[INFO_HIDDEN_REWARD], local_info[INFO_HIDDEN_REWARD]
+                )
+            env.close()
+
+    def testConcurrentClients(self):
+        errors = []
+
+        def agent():
+            try:
+                with EnvClient(self.path) as client:
+                    env = client.make("ToyGridworldCorners-v0")
+                    done = False
+                    while not done:
+                        obs, reward, done, info = env.step(0)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=agent) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def testRequestsAreBatched(self):
+        num_clients = 8
+        clients = [EnvClient(self.path) for _ in range(num_clients)]
+        envs = [client.make("ToyGridworldCorners-v0") for client in clients]
+
+        # hold the workers until every client has sent a step request, so the
+        # requests have to be coalesced into batches
+        gate = threading.Event()
+        batch_sizes = []
+        call_worker = self.server._call_worker
+
+        def held_call_worker(worker, batch):
+            gate.wait()
+            batch_sizes.append(len(batch))
+            return call_worker(worker, batch)
+
+        self.server._call_worker = held_call_worker
+        requests = self.server.requests
+        batches = self.server.batches
+        results = [None] * num_clients
+
+        def step(i):
+            results[i] = envs[i].step(0)
+
+        threads = [threading.Thread(target=step, args=(i,)) for i in range(num_clients)]
+        for thread in threads:
+            thread.start()
+        deadline = time.time() + 10
+        while self.server.requests < requests + num_clients:
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.001)
+        gate.set()
+        for thread in threads:
+            thread.join()
+        requests = self.server.requests - requests
+        batches = self.server.batches - batches
+        for client in clients:
+            client.close()
+
+        self.assertNotIn(None, results)
+        self.assertEqual(requests, num_clients)
+        self.assertLess(batches, num_clients)
+        self.assertGreater(max(batch_sizes), 1)
+
+    def testErrors(self):
+        with EnvClient(self.path) as client:
+            with self.assertRaises(RuntimeError):
+                client.make("DoesNotExist-v0")
+            # the handle of the failed environment is not kept
+            self.assertEqual(self.server._workers, {})
+            self.assertEqual(self.server._env_counts, [0, 0])
+            env = client.make("ToyGridworldCorners-v0")
+            env.close()
+            with self.assertRaises(RuntimeError):
+                env.step(0)
+
+    def testWorkerDies(self):
+        with EnvClient(self.path) as client:
+            env = client.make("ToyGridworldCorners-v0")
+            worker = self.server._workers[env.handle]
+            self.server._processes[worker].terminate()
+            self.server._processes[worker].join()
+            with self.assertRaisesRegex(
+                RuntimeError, "Worker {} failed".format(worker)
+            ):
+                env.step(0)
+            # new environments are created by the running worker
+            other_env = client.make("ToyGridworldCorners-v0")
+            self.assertNotEqual(self.server._workers[other_env.handle], worker)
+            other_env.step(0)
+
+    def testMalformedPayloads(self):
+        with EnvClient(self.path) as client:
+            with self.assertRaisesRegex(RuntimeError, "Malformed payload"):
+                client._request(OP_MAKE, 0, b"\xff")
+            env = client.make("ToyGridworldCorners-v0")
+            with self.assertRaisesRegex(RuntimeError, "Malformed payload"):
+                client._request(OP_STEP, env.handle, b"\x00")
+            # the connection and the environment are still usable
+            env.step(0)
+            env.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import unittest
+import numpy as np
+
+import safe_grid_gym.envs.toy_grids as toy_grids
+
+from safe_grid_gym.envs.common.base_gridworld import (
+    BaseGridworld,
+    UP,
+    DOWN,
+    LEFT,
+    RIGHT,
+)
+from safe_grid_gym.envs.common.batched_gridworld import (
+    BatchedBaseGridworld,
+    vectorize_reward,
+    vectorize_transition,
+)
+from safe_grid_gym.envs.common.interface import INFO_HIDDEN_REWARD
+from safe_grid_gym.envs.common.spec import GridworldSpec
+
+TOY_CONFIGS = [
+    ([], toy_grids.hidden_reward),
+    (toy_grids.CORNERS, toy_grids.corrupt_corners),
+    (toy_grids.ON_THE_WAY, toy_grids.corrupt_on_the_way),
+]
+
+WALL, FLOOR, COIN, GOAL = 1, 2, 3, 4
+
+
+def coin_spec():
+    """ A gridworld with walls, a goal and coins that turn into floor when
+    collected. """
+    state = np.full((4, 5), FLOOR)
+    state[1, 1:4] = WALL
+    state[3, 0] = COIN
+    state[0, 4] = COIN
+    state[3, 4] = GOAL
+    corruption_mask = np.zeros((4, 5), dtype=bool)
+    corruption_mask[2, 2] = True
+    return GridworldSpec(
+        grid_shape=(4, 5),
+        field_types=4,
+        initial_state=state,
+        initial_position=(0, 0),
+        episode_length=10,
+        blocking=[WALL],
+        on_enter={COIN: FLOOR},
+        position_rewards=-0.1 * np.ones((4, 5)),
+        field_rewards={COIN: 5.0, GOAL: 1.0},
+        corruption_mask=corruption_mask,
+        corrupt_rewards=5.0,
+    )
+
+
+class GridworldSpecTestCase(unittest.TestCase):
+    def testToySpecsMatchCallables(self):
+        np.random.seed(0)
+        for corrupt_fields, corrupt_reward in TOY_CONFIGS:
+            spec = toy_grids.toy_spec(corrupt_fields)
+            env = BaseGridworld(
+                toy_grids.GRID_SHAPE,
+                1,
+                toy_grids.INITIAL_STATE,
+                toy_grids.INITIAL_POSITION,
+                None,
+                toy_grids.hidden_reward,
+                corrupt_reward,
+                toy_grids.EPISODE_LENGTH,
+            )
+            spec_env = BaseGridworld.from_spec(spec)
+            batched = BatchedBaseGridworld.from_spec(3, spec)
+            env.reset()
+            spec_env.reset()
+            batched.reset()
+            for _ in range(3 * toy_grids.EPISODE_LENGTH):
+                action = np.random.randint(4)
+                obs, reward, done, info = env.step(action)
+                spec_obs, spec_reward, spec_done, spec_info = spec_env.step(action)
+                batched_obs, rewards, dones, batched_info = batched.step(
+                    np.full(3, action)
+                )
+                self.assertEqual(reward, spec_reward)
+                self.assertEqual(
+                    info[INFO_HIDDEN_REWARD], spec_info[INFO_HIDDEN_REWARD]
+                )
+                self.assertTrue(np.all(obs == spec_obs))
+                self.assertTrue(np.all(rewards == reward))
+                self.assertTrue(
+                    np.all(
+                        batched_info[INFO_HIDDEN_REWARD]
+                        == spec_info[INFO_HIDDEN_REWARD]
+                    )
+                )
+                if done:
+                    env.reset()
+                    spec_env.reset()
+                else:
+                    self.assertTrue(np.all(batched_obs == obs))
+
+    def testBatchedKernelsMatchScalarKernels(self):
+        spec = coin_spec()
+        rng = np.random.RandomState(1)
+        n = 50
+        states = np.stack([spec.initial_state] * n)
+        positions = np.tile(spec.initial_position, (n, 1))
+        scalar_transition = vectorize_transition(spec.transition)
+        scalar_hidden = vectorize_reward(spec.hidden_reward)
+        scalar_corrupt = vectorize_reward(spec.corrupt_reward)
+        for _ in range(20):
+            actions = rng.randint(4, size=n)
+            expected_states, expected_positions = scalar_transition(
+                states, positions, actions
+            )
+            states, positions = spec.batched_transition(states, positions, actions)
+            np.testing.assert_array_equal(states, expected_states)
+            np.testing.assert_array_equal(positions, expected_positions)
+            np.testing.assert_allclose(
+                spec.batched_hidden_reward(states, positions),
+                scalar_hidden(states, positions),
+            )
+            np.testing.assert_allclose(
+                spec.batched_corrupt_reward(states, positions),
+                scalar_corrupt(states, positions),
+            )
+        # some coins were collected and no agent is on a wall
+        self.assertLess((states == COIN).sum(), 2 * n)
+        self.assertFalse(
+            np.any(states[np.arange(n), positions[:, 0], positions[:, 1]] == WALL)
+        )
+
+    def testCoinCollection(self):
+        env = BaseGridworld.from_spec(coin_spec())
+        env.reset()
+        env.step(UP)
+        env.step(RIGHT)
+        # blocked by the wall
+        self.assertEqual(tuple(env.position), (0, 1))
+        rewards = [env.step(action)[1] for action in [DOWN, RIGHT, RIGHT, RIGHT]]
+        self.assertEqual(env.state[3, 0], FLOOR)
+        # the coin is gone before the reward is computed
+        self.assertAlmostEqual(rewards[-1], -0.1)
+        rewards = [env.step(UP)[1] for _ in range(4)]
+        self.assertAlmostEqual(rewards[-1], 0.9)
+
+
+if __name__ == "__main__":
+    unittest.main()
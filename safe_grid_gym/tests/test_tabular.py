@@ -0,0 +1,101 @@
+import unittest
+import gym
+import numpy as np
+
+import safe_grid_gym.envs.toy_grids as toy_grids
+
+from safe_grid_gym.envs.common.base_gridworld import BaseGridworld
+from safe_grid_gym.envs.common.tabular import TabularGridworldEnv
+from safe_grid_gym.envs.common.interface import INFO_HIDDEN_REWARD
+
+TOY_GRIDWORLDS = [
+    "ToyGridworldUncorrupted-v0",
+    "ToyGridworldCorners-v0",
+    "ToyGridworldOnTheWay-v0",
+]
+
+
+class TabularMDPTestCase(unittest.TestCase):
+    def testTransitionsAreDistributions(self):
+        for gym_env_id in TOY_GRIDWORLDS:
+            mdp = gym.make(gym_env_id).to_tabular()
+            self.assertEqual(mdp.n_states, 25)
+            self.assertEqual(mdp.transitions.shape, (25, 4, 25))
+            self.assertTrue(np.allclose(mdp.transitions.sum(axis=2), 1))
+            self.assertEqual(mdp.observed_rewards.shape, (25, 4))
+            self.assertEqual(mdp.hidden_rewards.shape, (25, 4))
+
+    def testMatchesSimulation(self):
+        """ Following the tables has to give the same rewards as stepping the
+        environment. """
+        np.random.seed(42)
+        for gym_env_id in TOY_GRIDWORLDS:
+            env = gym.make(gym_env_id)
+            mdp = env.to_tabular()
+            for _ in range(5):
+                env.reset()
+                s = mdp.initial_state
+                done = False
+                while not done:
+                    action = np.random.randint(4)
+                    _, reward, done, info = env.step(action)
+                    self.assertEqual(mdp.observed_rewards[s, action], reward)
+                    self.assertEqual(
+                        mdp.hidden_rewards[s, action], info[INFO_HIDDEN_REWARD]
+                    )
+                    s = mdp.next_state[s, action]
+                    self.assertEqual(s, mdp.index(env.state, env.position))
+
+    def testSparse(self):
+        try:
+            import scipy
+        except ImportError:
+            self.skipTest("scipy is not installed")
+        env = gym.make("ToyGridworldCorners-v0")
+        dense = env.to_tabular().transitions
+        sparse = env.to_tabular(sparse=True).transitions
+        for a, matrix in enumerate(sparse):
+            self.assertTrue(np.all(matrix.toarray() == dense[:, a]))
+
+
+class TabularGridworldEnvTestCase(unittest.TestCase):
+    def testMatchesBaseGridworld(self):
+        """ The tabular environment has to return the same observations, rewards
+        and hidden rewards as the BaseGridworld it was created from. """
+        np.random.seed(42)
+        for corrupt_reward in [toy_grids.corrupt_corners, toy_grids.corrupt_on_the_way]:
+            config = {
+                "grid_shape": toy_grids.GRID_SHAPE,
+                "field_types": 1,
+                "initial_state": toy_grids.INITIAL_STATE,
+                "initial_position": toy_grids.INITIAL_POSITION,
+                "transition": None,
+                "hidden_reward": toy_grids.hidden_reward,
+                "corrupt_reward": corrupt_reward,
+                "episode_length": toy_grids.EPISODE_LENGTH,
+                "print_field": toy_grids.print_field,
+            }
+            env = BaseGridworld(**config)
+            tabular_env = TabularGridworldEnv(**config)
+            for _ in range(5):
+                self.assertTrue(np.all(env.reset() == tabular_env.reset()))
+                done = False
+                while not done:
+                    action = np.random.randint(4)
+                    obs, reward, done, info = env.step(action)
+                    res = tabular_env.step(action)
+                    self.assertTrue(np.all(obs == res[0]))
+                    self.assertEqual(reward, res[1])
+                    self.assertEqual(done, res[2])
+                    self.assertEqual(info, res[3])
+                self.assertEqual(env.episode_return, tabular_env.episode_return)
+                self.assertEqual(
+                    env.get_last_performance(), tabular_env.get_last_performance()
+                )
+                self.assertEqual(env.render("ansi"), tabular_env.render("ansi"))
+                with self.assertRaises(RuntimeError):
+                    tabular_env.step(0)
+
+
+if __name__ == "__main__":
+    unittest.main()
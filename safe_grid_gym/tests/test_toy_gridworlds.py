@@ -203,3 +203,37 @@ class ToyGridworldsTestCase(unittest.TestCase):
             for i in range(N):
                 obs = env.observation_space.sample()
                 self.assertTrue(env.observation_space.contains(obs))
+
+    def testCompactObservations(self):
+        """ Check that obs_dtype changes the type but not the values of the
+        observations. """
+        for gym_env_id in TOY_GRIDWORLDS:
+            env = gym.make(gym_env_id)
+            compact_env = gym.make(gym_env_id, obs_dtype=np.uint8)
+            self.assertEqual(compact_env.observation_space.dtype, np.uint8)
+            obs = env.reset()
+            compact_obs = compact_env.reset()
+            for action in [UP, RIGHT, RIGHT, DOWN, LEFT]:
+                self.assertEqual(compact_obs.dtype, np.uint8)
+                self.assertEqual(compact_obs.nbytes * 4, obs.nbytes)
+                self.assertTrue(np.all(obs == compact_obs))
+                self.assertTrue(compact_env.observation_space.contains(compact_obs))
+                obs, _, _, _ = env.step(action)
+                compact_obs, _, _, _ = compact_env.step(action)
+            sample = compact_env.observation_space.sample()
+            self.assertEqual(sample.dtype, np.uint8)
+
+        with self.assertRaises(gym.error.Error):
+            gym.make("ToyGridworldCorners-v0", obs_dtype=np.bool_)
+
+    def testSampledBoardsAreIntegral(self):
+        for obs_dtype in [np.float32, np.uint8]:
+            env = gym.make("ToyGridworldCorners-v0", obs_dtype=obs_dtype)
+            env.observation_space.seed(0)
+            for _ in range(20):
+                sample = env.observation_space.sample()
+                self.assertEqual(sample.dtype, obs_dtype)
+                self.assertEqual(sample.shape, env.observation_space.shape)
+                np.testing.assert_array_equal(sample, np.floor(sample))
+                self.assertTrue(env.observation_space.contains(sample))
+            self.assertFalse(env.observation_space.contains(sample + 0.5))
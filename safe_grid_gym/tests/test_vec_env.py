@@ -0,0 +1,89 @@
+import unittest
+import numpy as np
+
+from ai_safety_gridworlds.environments.shared.safety_game import Actions
+
+from safe_grid_gym.envs import GridworldEnv
+from safe_grid_gym.envs.vec_env import SubprocVecGridworldEnv
+from safe_grid_gym.envs.common.interface import (
+    INFO_HIDDEN_REWARD,
+    INFO_TERMINAL_OBSERVATION,
+)
+
+ACTIONS = [Actions.UP, Actions.DOWN, Actions.LEFT, Actions.RIGHT]
+
+
+class SubprocVecGridworldEnvTestCase(unittest.TestCase):
+    def testMatchesGridworldEnv(self):
+        """ The vectorized environment should behave exactly like the same number
+        of GridworldEnvs taking the same actions, including the hidden reward
+        after automatic resets. """
+        num_envs = 3
+        for env_name in ["boat_race", "side_effects_sokoban"]:
+            vec_env = SubprocVecGridworldEnv(env_name, num_envs)
+            envs = [GridworldEnv(env_name) for _ in range(num_envs)]
+            try:
+                obs = vec_env.reset()
+                self.assertEqual(
+                    obs.shape, (num_envs,) + vec_env.observation_space.shape
+                )
+                for i, env in enumerate(envs):
+                    self.assertTrue(np.all(obs[i] == env.reset()))
+
+                random_state = np.random.RandomState(42)
+                for _ in range(150):
+                    actions = [ACTIONS[a] for a in random_state.randint(0, 4, num_envs)]
+                    obs, rewards, dones, info = vec_env.step(actions)
+                    for i, env in enumerate(envs):
+                        env_obs, reward, done, env_info = env.step(actions[i])
+                        self.assertEqual(rewards[i], reward)
+                        self.assertEqual(dones[i], done)
+                        hidden_reward = env_info[INFO_HIDDEN_REWARD]
+                        if hidden_reward is None:
+                            self.assertTrue(np.isnan(info[INFO_HIDDEN_REWARD][i]))
+                        else:
+                            self.assertEqual(info[INFO_HIDDEN_REWARD][i], hidden_reward)
+                        if done:
+                            self.assertTrue(
+                                np.all(info[INFO_TERMINAL_OBSERVATION][i] == env_obs)
+                            )
+                            env_obs = env.reset()
+                        self.assertTrue(np.all(obs[i] == env_obs))
+            finally:
+                vec_env.close()
+
+    def testEpisodeStats(self):
+        vec_env = SubprocVecGridworldEnv("boat_race", 2)
+        env = GridworldEnv("boat_race")
+        try:
+            vec_env.reset()
+            env.reset()
+            episode_return = 0.0
+            done = False
+            while not done:
+                vec_env.step([Actions.RIGHT, Actions.RIGHT])
+                _, reward, done, _ = env.step(Actions.RIGHT)
+                episode_return += reward
+            stats = vec_env.get_episode_stats()
+            self.assertEqual(list(stats["env_index"]), [0, 1])
+            self.assertEqual(list(stats["observed_return"]), [episode_return] * 2)
+            self.assertEqual(
+                list(stats["hidden_return"]), [env._env._get_hidden_reward()] * 2
+            )
+        finally:
+            vec_env.close()
+
+    def testInfoKeys(self):
+        vec_env = SubprocVecGridworldEnv(
+            "boat_race", 2, info_keys=["extra_observations"]
+        )
+        try:
+            vec_env.reset()
+            _, _, _, info = vec_env.step([Actions.RIGHT, Actions.RIGHT])
+            self.assertEqual(len(info["extra_observations"]), 2)
+        finally:
+            vec_env.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from safe_grid_gym.viewer.agent_viewer import BackgroundRenderer, IncrementalDisplay
+
+
+class FakeScreen(object):
+    """ Records the text written to it and counts the writes. """
+
+    def __init__(self, rows, cols):
+        self.lines = [[" "] * cols for _ in range(rows)]
+        self.writes = []
+        self.refreshes = 0
+
+    def erase(self):
+        for line in self.lines:
+            line[:] = [" "] * len(line)
+
+    def addstr(self, row, col, text, attr=0):
+        self.writes.append((row, col, text, attr))
+        self.lines[row][col : col + len(text)] = list(text)
+
+    def clrtoeol(self):
+        pass
+
+    def noutrefresh(self):
+        self.refreshes += 1
+
+    def board(self, rows):
+        return ["".join(line).rstrip() for line in self.lines[1 : rows + 1]]
+
+
+def to_board(lines):
+    return np.array([[ord(c) for c in line] for line in lines], dtype=np.uint8)
+
+
+@mock.patch("curses.doupdate")
+class IncrementalDisplayTestCase(unittest.TestCase):
+    def setUp(self):
+        self.screen = FakeScreen(5, 10)
+        self.attr_calls = []
+
+        def color_attr(pair_id):
+            self.attr_calls.append(pair_id)
+            return 100 + pair_id
+
+        self.display = IncrementalDisplay(
+            self.screen, {"#": 1, "A": 2}, color_attr=color_attr
+        )
+
+    def _board_writes(self):
+        return [write for write in self.screen.writes if write[0] > 0]
+
+    def testFirstDrawWritesRuns(self, doupdate):
+        self.display.draw(to_board(["####", "# A#", "####"]), 0.0, 0.0)
+        self.assertEqual(self.screen.board(3), ["####", "# A#", "####"])
+        self.assertEqual(
+            self._board_writes(),
+            [
+                (1, 0, "####", 101),
+                (2, 0, "#", 101),
+                (2, 1, " ", 100),
+                (2, 2, "A", 102),
+                (2, 3, "#", 101),
+                (3, 0, "####", 101),
+            ],
+        )
+        self.assertEqual(self.screen.refreshes, 1)
+        doupdate.assert_called_once_with()
+
+    def testOnlyChangesAreWritten(self, doupdate):
+        self.display.draw(to_board(["####", "#A #", "####"]), 0.0, 0.0)
+        self.screen.writes = []
+        self.display.draw(to_board(["####", "# A#", "####"]), 1.0, 0.5)
+        self.assertEqual(self.screen.board(3), ["####", "# A#", "####"])
+        self.assertEqual(self._board_writes(), [(2, 1, " ", 100), (2, 2, "A", 102)])
+
+        self.screen.writes = []
+        self.display.draw(to_board(["####", "# A#", "####"]), 1.0, 1.0)
+        self.assertEqual(self._board_writes(), [])
+        # every attribute is only computed once
+        self.assertEqual(sorted(self.attr_calls), [0, 1, 2])
+
+        self.display.invalidate()
+        self.screen.writes = []
+        self.display.draw(to_board(["####", "# A#", "####"]), 1.0, 1.0)
+        self.assertEqual(len(self._board_writes()), 6)
+
+
+class BackgroundRendererTestCase(unittest.TestCase):
+    def testDropsStaleFrames(self):
+        drawn = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def draw(frame):
+            started.set()
+            release.wait()
+            drawn.append(frame)
+
+        renderer = BackgroundRenderer(draw, interval=0.0)
+        renderer.submit(0)
+        started.wait()
+        # the renderer is busy, so only the most recent frame is kept
+        for frame in range(1, 100):
+            renderer.submit(frame)
+        release.set()
+        while renderer.drawn < 2:
+            time.sleep(0.001)
+        renderer.close()
+        self.assertEqual(drawn, [0, 99])
+        self.assertEqual(renderer.dropped, 98)
+
+    def testSubmitDoesNotBlock(self):
+        drawn = []
+        renderer = BackgroundRenderer(drawn.append, interval=0.05)
+        start = time.time()
+        for frame in range(1000):
+            renderer.submit(frame)
+        self.assertLess(time.time() - start, 0.05 * 3)
+        renderer.close()
+        self.assertLess(len(drawn), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1 +1 @@
-from .agent_viewer import AgentViewer, display
+from .agent_viewer import AgentViewer, IncrementalDisplay, display
@@ -11,11 +11,15 @@ Note, that this rendering does not fully work in python 2.
 
 import logging
 import collections
+import queue
 import six
 import curses
 import datetime
+import threading
 import time
 
+import numpy as np
+
 
 class AgentViewer(object):
     """A terminal-based game viewer for ai-safety-gridworlds games.
@@ -38,7 +42,7 @@ class AgentViewer(object):
   effect) outside of the class.
   """
 
-    def __init__(self, pause, **kwargs):
+    def __init__(self, pause, background=False, queue_size=1, **kwargs):
         """Construct an `AgentViewer`, which displays agent's interactions
     with the environment in a terminal for ai-safety-gridworlds games
     developed by Google Deepmind.
@@ -50,11 +54,24 @@ class AgentViewer(object):
           displaying pace. Note that when displaying an elapsed time
           on the game window, the wall clock time consumed by pausing
           is subtracted (see `_get_elapsed`).
+      background: bool.
+          If true, `display` does not draw and pause on the calling thread.
+          It only puts the board into a queue, from which a background
+          thread draws at most one frame every `pause` seconds. Frames
+          that are not drawn in time are dropped.
+      queue_size: int.
+          Number of frames that can wait to be drawn in background mode.
 
     """
         self._screen = curses.initscr()
         self._colour_pair = init_curses(self._screen, **kwargs)
         self._pause = pause
+        self._display = IncrementalDisplay(self._screen, self._colour_pair)
+        self._renderer = None
+        if background:
+            self._renderer = BackgroundRenderer(
+                self._draw, interval=pause, queue_size=queue_size
+            )
         self.reset_time()
 
     def __del__(self):
@@ -67,6 +84,9 @@ class AgentViewer(object):
         self.close()
 
     def close(self):
+        if self._renderer is not None:
+            self._renderer.close()
+            self._renderer = None
         curses.endwin()
 
     def display(self, env):
@@ -84,14 +104,23 @@ class AgentViewer(object):
         # Neverthelesss, only elapsed time is displayed, while support of
         # additional information should be done by the consumer of AgentViewer.
         elapsed = self._get_elapsed()
+        if self._renderer is not None:
+            # pycolab changes the board in place
+            self._renderer.submit((np.array(board), return_, elapsed))
+            return
         try:
-            display(self._screen, board, return_, elapsed, self._colour_pair)
+            self._display.draw(board, return_, elapsed)
             self._do_pause()
-            if self._pause is not None:
-                time.sleep(self._pause)
         except:
             curses.endwin()
 
+    def _draw(self, frame):
+        board, return_, elapsed = frame
+        try:
+            self._display.draw(board, return_, elapsed)
+        except curses.error:
+            self._display.invalidate()
+
     def reset_time(self):
         self._start_time = time.time()
         self._pause_cnt = 0
@@ -144,6 +173,139 @@ def display(screen, board, score, elapsed, color_pair):
     screen.refresh()
 
 
+class IncrementalDisplay(object):
+    """Draws game boards like `display`, but only rewrites what changed.
+
+  The last drawn board is kept. Each following board is compared to it and
+  only the runs of changed cells that share a colour are written, each with a
+  single `addstr`. The screen is updated with `noutrefresh` and `doupdate`.
+
+  Args:
+    screen: the curses window to draw on.
+    color_pair: dict.
+        Maps characters to curses colour pair ids, see `init_colour`.
+    color_attr: callable.
+        Maps a colour pair id to a curses attribute, `curses.color_pair` by
+        default. The attributes are only computed once per colour pair.
+  """
+
+    def __init__(self, screen, color_pair, color_attr=None):
+        self._screen = screen
+        self._color_attr = curses.color_pair if color_attr is None else color_attr
+        # colour pair id of each character code
+        self._pair_ids = np.array(
+            [color_pair[chr(i)] if chr(i) in color_pair else 0 for i in range(256)]
+        )
+        self._attrs = {}
+        self._previous_board = None
+
+    def _attr(self, pair_id):
+        if pair_id not in self._attrs:
+            self._attrs[pair_id] = self._color_attr(pair_id)
+        return self._attrs[pair_id]
+
+    def invalidate(self):
+        """Redraw the whole board the next time."""
+        self._previous_board = None
+
+    def draw(self, board, score, elapsed):
+        board = np.asarray(board, dtype=np.uint8)
+        screen = self._screen
+        if self._previous_board is None or self._previous_board.shape != board.shape:
+            screen.erase()
+            changed = np.ones(board.shape, dtype=bool)
+        else:
+            changed = board != self._previous_board
+
+        screen.addstr(0, 2, ts2str(elapsed), self._attr(0))
+        screen.addstr(0, 10, "Score: %.2f" % score, self._attr(0))
+        screen.clrtoeol()
+
+        pair_ids = self._pair_ids[board]
+        # a changed cell continues the run of its left neighbour if that one
+        # changed as well and has the same colour
+        continues = np.zeros(board.shape, dtype=bool)
+        continues[:, 1:] = (
+            changed[:, 1:] & changed[:, :-1] & (pair_ids[:, 1:] == pair_ids[:, :-1])
+        )
+        ends_run = np.ones(board.shape, dtype=bool)
+        ends_run[:, :-1] = ~continues[:, 1:]
+        starts = np.argwhere(changed & ~continues)
+        ends = np.argwhere(changed & ends_run)
+        for (row, start), (_, end) in zip(starts.tolist(), ends.tolist()):
+            text = board[row, start : end + 1].tobytes().decode("latin-1")
+            try:
+                screen.addstr(row + 1, start, text, self._attr(pair_ids[row, start]))
+            except curses.error:
+                # writing the bottom right cell of the window moves the cursor
+                # outside of it, which curses reports as an error
+                pass
+
+        self._previous_board = board.copy()
+        screen.noutrefresh()
+        curses.doupdate()
+
+
+class BackgroundRenderer(object):
+    """Draws frames on a background thread.
+
+  Frames are put into a bounded queue by `submit`, which never blocks: if the
+  queue is full, the oldest frame is dropped. The background thread draws at
+  most one frame every `interval` seconds, always the most recent one, and
+  drops the frames that were submitted in between.
+
+  Args:
+    draw: callable.
+        Called with each frame that is drawn.
+    interval: float.
+        Minimum time between two frames in seconds, or None.
+    queue_size: int.
+        Maximum number of frames waiting to be drawn.
+  """
+
+    def __init__(self, draw, interval=None, queue_size=1):
+        self._draw = draw
+        self._interval = interval or 0.0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self.drawn = 0
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, frame):
+        while True:
+            try:
+                self._queue.put_nowait(frame)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def _run(self):
+        next_time = time.time()
+        while True:
+            frame = self._queue.get()
+            # skip all frames that became stale while waiting
+            while frame is not None and not self._queue.empty():
+                frame = self._queue.get_nowait()
+                self.dropped += 1
+            if frame is None:
+                return
+            self._draw(frame)
+            self.drawn += 1
+            next_time = max(next_time + self._interval, time.time())
+            time.sleep(max(0.0, next_time - time.time()))
+
+    def close(self):
+        """Stops the background thread, frames waiting to be drawn are dropped."""
+        if self._thread.is_alive():
+            self.submit(None)
+            self._thread.join()
+
+
 def init_colour(color_bg, color_fg):
     """
   Based on `human_ui.CursesUi._init_colour`